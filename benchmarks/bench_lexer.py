@@ -0,0 +1,58 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+# Measures the throughput of the Clojure/FOPPL lexer on large, machine-generated sources. Run it from the root
+# folder of the project, e.g., as `python benchmarks/bench_lexer.py` or `python benchmarks/bench_lexer.py 1 10`,
+# where the arguments give the sizes of the synthetic sources in MB. Each size is lexed with both tokenizer
+# backends (`default` and `regex`).
+#
+import os.path
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyppl.fe_clojure.ppl_clojure_lexer import ClojureLexer
+
+
+def make_source(size: int, seed: int=42):
+    """
+    Creates a synthetic FOPPL-program of (approximately) `size` characters. The program consists mostly of numeric
+    data literals, spread over many lines, as is typical for generated models.
+    """
+    rnd = random.Random(seed)
+    lines = ["(let [data (vector"]
+    length = len(lines[0])
+    while length < size:
+        line = '  ' + ' '.join(['{:.6f}'.format(rnd.gauss(0, 10)) for _ in range(8)])
+        lines.append(line)
+        length += len(line) + 1
+    lines.append("  )]")
+    lines.append("  (observe (normal (sample (normal 0 1)) 1.0) (first data)))")
+    return '\n'.join(lines)
+
+
+def bench(size_mb: float, tokenizer: str):
+    source = make_source(int(size_mb * 1024 * 1024))
+    start = time.perf_counter()
+    forms = list(ClojureLexer(source, tokenizer=tokenizer))
+    elapsed = time.perf_counter() - start
+    size = len(source) / (1024 * 1024)
+    print("{:8}  {:6.1f} MB  {:8.3f} s  {:8.3f} MB/s  ({} top-level forms)".format(
+        tokenizer, size, elapsed, size / elapsed if elapsed > 0 else float('inf'), len(forms)))
+
+
+def main(args):
+    sizes = [float(arg) for arg in args] if len(args) > 0 else [1, 10]
+    for size in sizes:
+        for tokenizer in ('default', 'regex'):
+            bench(size, tokenizer)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
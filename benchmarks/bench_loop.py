@@ -0,0 +1,67 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+# Measures the compile time of hidden Markov models (in the style of `examples/hmm_model.clj`), whose steps are
+# expressed through FOPPL's `loop`. Run it from the root folder of the project, e.g., as
+# `python benchmarks/bench_loop.py` or `python benchmarks/bench_loop.py 100 10000`, where the arguments give the
+# numbers of steps.
+#
+import os.path
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pyppl
+
+
+def make_source(n: int, seed: int=42):
+    """
+    Creates a hidden Markov model with three states and `n` steps/observations in FOPPL.
+    """
+    rnd = random.Random(seed)
+    data = ' '.join(['{:.4f}'.format(rnd.gauss(0, 1)) for _ in range(n)])
+    return """
+(defn data [n]
+  (get (vector {}) n))
+
+(defn get-trans-params [k]
+  (nth (vector (vector 0.1  0.5  0.4 )
+               (vector 0.2  0.2  0.6 )
+               (vector 0.7 0.15 0.15 )) k))
+
+(defn get-obs-mean [k]
+  (nth (vector -1. 1. 0.) k))
+
+(defn hmm-step [n states]
+  (let [next-state (sample (categorical (get-trans-params (last states))))]
+    (observe (normal (get-obs-mean next-state) 1.) (data n))
+    (conj states next-state)))
+
+(let [init-state (sample (categorical (vector (/ 1. 3.) (/ 1. 3.) (/ 1. 3.))))]
+  (loop {} (vector init-state) hmm-step))
+""".format(data, n)
+
+
+def bench(n: int):
+    source = make_source(n)
+    start = time.perf_counter()
+    model = pyppl.compile_model(source, language='clj', tokenizer='regex', use_cache=False)
+    elapsed = time.perf_counter() - start
+    print("{:8}  {:8.3f} s  {:8.3f} ms/step  ({} vertices)".format(
+        n, elapsed, 1000 * elapsed / n, len(model.vertices)))
+
+
+def main(args):
+    sizes = [int(arg) for arg in args] if len(args) > 0 else [100, 1000, 10000]
+    for n in sizes:
+        bench(n)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,64 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+# Measures the compile time of a linear regression over `n` observations, whose loop is kept as a plate rather than
+# unrolled. Run it from the root folder of the project, e.g., as `python benchmarks/bench_plates.py` or
+# `python benchmarks/bench_plates.py 1000 100000`, where the arguments give the numbers of observations. The time
+# to parse the source and to execute the generated code (both of which contain the data) is reported separately from
+# the time spent building the graph, which should not depend on `n`.
+#
+import os.path
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyppl import distributions, parser
+from pyppl.backend import ppl_graph_generator, ppl_graph_factory
+
+
+def make_source(n: int, seed: int=42):
+    """
+    Creates a linear regression with `n` data points in FOPPL.
+    """
+    rnd = random.Random(seed)
+    xs = [rnd.uniform(-10, 10) for _ in range(n)]
+    ys = [2.0 * x + 1.0 + rnd.gauss(0, 1) for x in xs]
+    return "\n".join([
+        "(let [xs (vector {})".format(' '.join(['{:.6f}'.format(x) for x in xs])),
+        "      ys (vector {})".format(' '.join(['{:.6f}'.format(y) for y in ys])),
+        "      slope (sample (normal 0 10))",
+        "      bias (sample (normal 0 10))]",
+        "  (doseq [i (range {})]".format(n),
+        "    (observe (normal (+ (* slope (get xs i)) bias) 1) (get ys i)))",
+        "  [slope bias])",
+    ])
+
+
+def bench(n: int):
+    source = make_source(n)
+    start = time.perf_counter()
+    ast = parser.parse(source, language='clj', namespace=distributions.namespace, tokenizer='regex', plates=True)
+    parsed = time.perf_counter()
+    gg = ppl_graph_generator.GraphGenerator(ppl_graph_factory.GraphFactory())
+    gg.visit(ast)
+    built = time.perf_counter()
+    model = gg.generate_model(vectorize=True)
+    generated = time.perf_counter()
+    print("{:8}  parse: {:8.3f} s  graph: {:8.3f} s  code: {:8.3f} s  ({} vertices, {} lines of code)".format(
+        n, parsed - start, built - parsed, generated - built, len(model.vertices), model.code.count('\n') + 1))
+
+
+def main(args):
+    sizes = [int(arg) for arg in args] if len(args) > 0 else [100, 1000, 10000, 100000]
+    for n in sizes:
+        bench(n)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
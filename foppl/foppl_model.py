@@ -8,7 +8,7 @@
 #
 from . import runtime, Options
 from .basic_imports import *
-from .graphs import Vertex
+from .graphs import Vertex, ReachabilityIndex
 
 # We try to import `networkx` and `matplotlib`. If present, these packages can be used to get a visual
 # representation of the graph. But neither of these packages is actually needed.
@@ -44,6 +44,19 @@ class Model(object):
         self.nodes = { v.name: v for v in self.compute_nodes }
         self.debug_prints = debug_prints
         self.log_pdf_history = None
+        self.reachability = ReachabilityIndex(self.compute_nodes).attach()
+
+    def __getstate__(self):
+        # The result function and debug prints are lambdas, which cannot be pickled (see `imports`)
+        state = self.__dict__.copy()
+        state['result_function'] = None
+        state['debug_prints'] = None
+        state.pop('reachability', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.reachability = ReachabilityIndex(self.compute_nodes).attach()
 
     def __repr__(self):
         V = '  '.join(sorted([repr(v) for v in self.vertices]))
@@ -68,6 +68,7 @@ Both computations are facilitated by the methods `update` and `update_pdf` of th
 from . import Options, Config, runtime
 from . import distributions
 from .basic_imports import *
+import bisect
 
 ####################################################################################################
 
@@ -92,9 +93,30 @@ class GraphNode(object):
     """
 
     name = ""
-    ancestors = set()
     line_number = -1
 
+    # Set by `ReachabilityIndex.attach()` once the model is created
+    _reachability = None
+
+    _ancestors = frozenset()
+    _children = frozenset()
+
+    @property
+    def ancestors(self):
+        return self._ancestors
+
+    @ancestors.setter
+    def ancestors(self, value):
+        # The nodes also keep track of their children, so that we can find the descendants without a reachability
+        # index.
+        for a in self._ancestors:
+            a._children.discard(self)
+        self._ancestors = value
+        for a in value:
+            if '_children' not in a.__dict__:
+                a._children = set()
+            a._children.add(self)
+
     __symbol_counter__ = 30000
 
     @classmethod
@@ -135,6 +157,28 @@ class GraphNode(object):
         self._update(state)
         return 0.0
 
+    # The `evaluate`-functions cannot be pickled (for the import hook's cache, see `imports`). We therefore drop them
+    # and re-create them from their code when unpickling.
+    __lambda_fields__ = ()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for field in self.__lambda_fields__:
+            state.pop(field, None)
+        state.pop('_reachability', None)
+        state.pop('_children', None)
+        return state
+
+    def __setstate__(self, state):
+        # The children are registered anew, irrespective of whether the ancestors have already been restored
+        self.__dict__.update(state)
+        for a in self._ancestors:
+            a.__dict__.setdefault('_children', set()).add(self)
+        self._make_lambdas()
+
+    def _make_lambdas(self):
+        pass
+
 
 ####################################################################################################
 
@@ -142,8 +186,18 @@ class GraphNode(object):
 _LAMBDA_PATTERN_ = "lambda state: {}"
 # _LAMBDA_PATTERN_TF_ = "lambda state, transform_flag: {}"
 
+# Code objects for the lambdas, keyed by their source; filled by the import hook when loading a cached model, so that
+# the sources need not be compiled again.
+_code_objects = {}
+
+def _eval_lambda(source:str):
+    code = _code_objects.get(source, None)
+    if code is not None:
+        return eval(code)
+    return eval(source)
+
 def make_lambda(body:str):
-    return eval("lambda state: {}".format(body))
+    return _eval_lambda("lambda state: {}".format(body))
 
 
 class ConditionNode(GraphNode):
@@ -157,6 +211,8 @@ class ConditionNode(GraphNode):
     can also gain information about the 'distance' to the 'border'.
     """
 
+    __lambda_fields__ = ('evaluate', 'evaluate_function')
+
     def __init__(self, *, name:str=None, condition=None, ancestors:set=None, op:str='?', function=None,
                  line_number:int=-1):
         from .code_objects import CodeCompare, CodeValue
@@ -178,13 +234,16 @@ class ConditionNode(GraphNode):
         self.code = _LAMBDA_PATTERN_.format(code)
         self.full_code = "state['{}'] = {}".format(self.name, code)
         self.function_code = _LAMBDA_PATTERN_.format(function.to_py() if function else "None")
-        self.evaluate = eval(self.code)
-        self.evaluate_function = eval(self.function_code)
+        self._make_lambdas()
         self.line_number = line_number
         for a in ancestors:
             if isinstance(a, Vertex):
                 a._add_dependent_condition(self)
 
+    def _make_lambdas(self):
+        self.evaluate = _eval_lambda(self.code)
+        self.evaluate_function = _eval_lambda(self.function_code)
+
     def __repr__(self):
         if self.function is not None:
             result = "{f} {o} 0\n\tFunction: {f}".format(f=repr(self.function), o=self.op)
@@ -240,6 +299,8 @@ class DataNode(GraphNode):
     of the code, as large lists are replaced by symbols.
     """
 
+    __lambda_fields__ = ('evaluate',)
+
     def __init__(self, *, name:str=None, data, line_number:int=-1, source:str=None):
         if name is None:
             name = self.__class__.__gen_symbol__('data_')
@@ -248,7 +309,7 @@ class DataNode(GraphNode):
         self.source = source
         self.ancestors = set()
         self.code = name
-        self.evaluate = lambda state: self.data
+        self._make_lambdas()
         self.line_number = line_number
         if len(self.data) > 20:
             self.data_repr = "[{}, {}, {}, {}, {}, ..., {}, {}] <{} items>".format(
@@ -259,6 +320,9 @@ class DataNode(GraphNode):
             self.data_repr = repr(self.data)
         self.full_code = "state['{}'] = {}".format(self.name, self.data_repr)
 
+    def _make_lambdas(self):
+        self.evaluate = lambda state: self.data
+
     def __repr__(self):
         result = "{} = {}".format(self.name, self.data_repr)
         if self.source is not None:
@@ -289,7 +353,7 @@ class Vertex(GraphNode):
       code, or `None`.
     `ancestors`:
       The set of all parent vertices. This contains only the ancestors, which are in direct line, and not the parents
-      of parents. Use the `get_all_ancestors()`-method to retrieve a full list of all ancestors (including parents of
+      of parents. Use the `get_all_ancestors`-property to retrieve a full list of all ancestors (including parents of
       parents of parents of ...).
     `dist_ancestors`:
       The set of ancestors used for the distribution/sampling, without those used inside the conditions.
@@ -322,6 +386,8 @@ class Vertex(GraphNode):
       The original code for the `evaluate`-method as a string. This is mostly used for debugging.
     """
 
+    __lambda_fields__ = ('evaluate', 'evaluate_log_pdf')
+
     def __init__(self, *, name:str=None, ancestors:set=None, data:set=None, distribution=None, observation=None,
                  ancestor_graph=None, conditions:list=None, line_number:int=-1):
         from . import code_types
@@ -368,6 +434,9 @@ class Vertex(GraphNode):
             self.code_pdf = self.co_distribution.to_py_log_pdf(value="state['{}']".format(self.name))
         self.full_code = "state['{}'] = {}".format(self.name, self.code)
         self.full_code_pdf = self._get_cond_code("log_pdf += {}".format(self.code_pdf))
+        self._make_lambdas()
+
+    def _make_lambdas(self):
         self.evaluate = make_lambda(self.code)
         self.evaluate_log_pdf = make_lambda(self.code_pdf)
 
@@ -396,18 +465,25 @@ class Vertex(GraphNode):
         return result
 
     def _add_dependent_condition(self, cond: ConditionNode):
-        self.dependent_conditions.add(cond)
-        for a in self.ancestors:
-            a._add_dependent_condition(cond)
+        # If an ancestor already has the condition, so do all of its ancestors
+        stack = [self]
+        while len(stack) > 0:
+            v = stack.pop()
+            if cond not in v.dependent_conditions:
+                v.dependent_conditions.add(cond)
+                stack += [a for a in v.ancestors if isinstance(a, Vertex)]
 
     @property
     def get_all_ancestors(self):
-        result = []
-        for a in self.ancestors:
-            if a not in result:
-                result.append(a)
-                result += list(a.get_all_ancestors())
-        return set(result)
+        if self._reachability is not None:
+            return self._reachability.get_ancestors(self)
+        return _collect_ancestors([self]) - {self}
+
+    @property
+    def get_all_descendants(self):
+        if self._reachability is not None:
+            return self._reachability.get_descendants(self)
+        return _collect_descendants([self]) - {self}
 
     @property
     def is_conditional(self):
@@ -630,6 +706,7 @@ class Graph(object):
         return model
 
 
+
 Graph.EMPTY = Graph(vertices=set())
 
 
@@ -638,3 +715,167 @@ def merge(*graphs):
     for g in graphs:
         result = result.merge(g)
     return result
+
+
+####################################################################################################
+
+def _collect_ancestors(nodes):
+    result = set()
+    stack = list(nodes)
+    while len(stack) > 0:
+        node = stack.pop()
+        if node not in result:
+            result.add(node)
+            stack += node.ancestors
+    return result
+
+
+def _collect_descendants(nodes):
+    result = set()
+    stack = list(nodes)
+    while len(stack) > 0:
+        node = stack.pop()
+        if node not in result:
+            result.add(node)
+            stack += node._children
+    return result
+
+
+def _merge_intervals(intervals: list):
+    intervals.sort()
+    result = [intervals[0]]
+    for lo, hi in intervals[1:]:
+        last_lo, last_hi = result[-1]
+        if lo <= last_hi + 1:
+            if hi > last_hi:
+                result[-1] = (last_lo, hi)
+        else:
+            result.append((lo, hi))
+    return tuple(result)
+
+
+class ReachabilityIndex(object):
+    """
+    The reachability index answers queries about the ancestors, descendants and dependent conditions of the nodes in
+    a model, following the `ancestors`-fields of the nodes. It is created together with the model (see `Model`).
+
+    The index is built once, without any recursion. A depth-first search assigns each node its position in post-order,
+    and each node is then labelled with the list of position intervals covering all its ancestors (a second search
+    does the same for the descendants). Chains of nodes such as in HMMs need only a single interval per node, and
+    even for more general graphs, the number of intervals remains small in practice. Checking if a node is an ancestor
+    of another is then a binary search over the intervals, and retrieving all ancestors takes time linear in the
+    number of ancestors.
+
+    Usage:
+      ```
+      index = ReachabilityIndex(model.compute_nodes).attach()
+      ancestors = index.get_ancestors(vertex)    # or: vertex.get_all_ancestors
+      ```
+    """
+
+    def __init__(self, nodes):
+        nodes = list(nodes)
+        known_nodes = set(nodes)
+        nodes += [node for node in _collect_ancestors(nodes) if node not in known_nodes]
+        self.children = { node: [] for node in nodes }
+        for node in nodes:
+            for a in node.ancestors:
+                self.children[a].append(node)
+        self.topological_order = self._sort(nodes)
+        self._anc_order, self._anc_pos, self._anc_intervals = \
+            self._label(self.topological_order, lambda node: node.ancestors)
+        self._desc_order, self._desc_pos, self._desc_intervals = \
+            self._label(self.topological_order[::-1], lambda node: self.children[node])
+
+    def __contains__(self, node):
+        return node in self.children
+
+    def __len__(self):
+        return len(self.topological_order)
+
+    def _sort(self, nodes: list):
+        # Kahn's algorithm, keeping the given order of the nodes wherever possible
+        in_degree = { node: len(node.ancestors) for node in nodes }
+        ready = [node for node in reversed(nodes) if in_degree[node] == 0]
+        result = []
+        while len(ready) > 0:
+            node = ready.pop()
+            result.append(node)
+            for child in reversed(self.children[node]):
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    ready.append(child)
+        if len(result) != len(nodes):
+            raise ValueError("the graph contains a cycle")
+        return result
+
+    def _label(self, order: list, successors):
+        # `order` lists all successors of a node before the node itself. The depth-first search starts at the end of
+        # the order, so that long chains are numbered consecutively.
+        post_order = []
+        position = {}
+        low = {}
+        for root in reversed(order):
+            if root in position:
+                continue
+            low[root] = len(post_order)
+            position[root] = None
+            stack = [(root, iter(successors(root)))]
+            while len(stack) > 0:
+                node, it = stack[-1]
+                for succ in it:
+                    if succ not in position:
+                        low[succ] = len(post_order)
+                        position[succ] = None
+                        stack.append((succ, iter(successors(succ))))
+                        break
+                else:
+                    stack.pop()
+                    position[node] = len(post_order)
+                    post_order.append(node)
+        intervals = {}
+        for node in order:
+            items = [(low[node], position[node])]
+            for succ in successors(node):
+                items += intervals[succ]
+            intervals[node] = _merge_intervals(items)
+        return post_order, position, intervals
+
+    @staticmethod
+    def _contains(intervals: tuple, pos: int):
+        i = bisect.bisect_right(intervals, (pos, float('inf'))) - 1
+        return i >= 0 and intervals[i][0] <= pos <= intervals[i][1]
+
+    @staticmethod
+    def _read_intervals(order: list, intervals: tuple, node):
+        result = set()
+        for lo, hi in intervals:
+            result.update(order[lo:hi+1])
+        result.discard(node)
+        return result
+
+    def attach(self):
+        """
+        Registers the index with all its nodes, so that their `get_all_ancestors` etc. use the index.
+        """
+        for node in self.topological_order:
+            node._reachability = self
+        return self
+
+    def get_ancestors(self, node) -> set:
+        return self._read_intervals(self._anc_order, self._anc_intervals[node], node)
+
+    def get_descendants(self, node) -> set:
+        return self._read_intervals(self._desc_order, self._desc_intervals[node], node)
+
+    def get_children(self, node) -> set:
+        return set(self.children[node])
+
+    def get_dependent_conditions(self, node) -> set:
+        return { item for item in self.get_descendants(node) if isinstance(item, ConditionNode) }
+
+    def is_ancestor(self, ancestor, node) -> bool:
+        return ancestor is not node and self._contains(self._anc_intervals[node], self._anc_pos[ancestor])
+
+    def is_descendant(self, descendant, node) -> bool:
+        return descendant is not node and self._contains(self._desc_intervals[node], self._desc_pos[descendant])
@@ -5,13 +5,133 @@
 #
 # 18. Nov 2017, Tobias Kohn
 # 24. Jan 2018, Tobias Kohn
+# 16. Oct 2026
 #
 from importlib.abc import Loader as _Loader, MetaPathFinder as _MetaPathFinder
 from .compilers import compile
+import builtins
+import hashlib
+import importlib.util
+import io
+import marshal
+import os
+import pickle
 import sys
 
 _PATH = sys.path[0]
 
+# Compiled models are cached in a `__pycache__`-directory next to the source file. An artifact is only used if it was
+# written by the same version of the compiler for a source with the same size and hash. Since the format of marshalled
+# code objects might change with any version of Python, the artifact also records the magic number of the byte code.
+_CACHE_FORMAT = 2
+_CACHE_SUFFIX = '.{}.foppl-model'.format(sys.implementation.cache_tag)
+
+_compiler_version = None
+
+def get_compiler_version():
+    """
+    Returns a hash over the sources of the compiler, so that any change to the compiler invalidates the cache.
+    """
+    global _compiler_version
+    if _compiler_version is None:
+        h = hashlib.sha1(str(_CACHE_FORMAT).encode())
+        base = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(base)):
+            if name.endswith('.py'):
+                with open(os.path.join(base, name), 'rb') as f:
+                    h.update(f.read())
+        _compiler_version = h.hexdigest()
+    return _compiler_version
+
+def get_cache_path(source_path: str):
+    directory, name = os.path.split(source_path)
+    return os.path.join(directory, '__pycache__', name + _CACHE_SUFFIX)
+
+def _get_result_code(expr):
+    from .graphs import _LAMBDA_PATTERN_
+    if expr is None:
+        return None
+    if hasattr(expr, 'to_py'):
+        expr = expr.to_py()
+    return _LAMBDA_PATTERN_.format(expr)
+
+def _get_lambda_sources(model):
+    from .graphs import _LAMBDA_PATTERN_
+    result = []
+    for node in model.compute_nodes:
+        if hasattr(node, 'function_code'):
+            result += [node.code, node.function_code]
+        elif hasattr(node, 'code_pdf'):
+            result += [_LAMBDA_PATTERN_.format(node.code), _LAMBDA_PATTERN_.format(node.code_pdf)]
+    return result
+
+def save_cached_model(source_path: str, source: bytes, model, result_code: str=None):
+    """
+    Writes the compiled model, together with the marshalled code objects of its lambdas, to the cache. Just as
+    Python does with its byte code, we silently give up if the artifact cannot be written.
+    """
+    if model.debug_prints is not None:
+        return False
+    try:
+        st = os.stat(source_path)
+        code_objects = {}
+        for src in _get_lambda_sources(model) + ([result_code] if result_code is not None else []):
+            if src not in code_objects:
+                code_objects[src] = marshal.dumps(builtins.compile(src, '<string>', 'eval'))
+        artifact = {
+            'format': _CACHE_FORMAT,
+            'magic': importlib.util.MAGIC_NUMBER,
+            'compiler': get_compiler_version(),
+            'mtime': st.st_mtime,
+            'size': len(source),
+            'hash': hashlib.sha256(source).hexdigest(),
+            'code_objects': code_objects,
+            'result_code': result_code,
+            'model': pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL),
+        }
+        cache_path = get_cache_path(source_path)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+        return True
+    except Exception:
+        return False
+
+def load_cached_model(source_path: str, source: bytes):
+    """
+    Returns the cached model for the given source, or `None` if there is no valid artifact in the cache.
+    """
+    from . import graphs
+    try:
+        with open(get_cache_path(source_path), 'rb') as f:
+            artifact = pickle.load(f)
+        if artifact.get('format') != _CACHE_FORMAT or artifact.get('magic') != importlib.util.MAGIC_NUMBER or \
+                artifact.get('compiler') != get_compiler_version() or artifact.get('size') != len(source):
+            return None
+        # If the file has been touched, we accept the artifact as long as the contents have not changed
+        if artifact.get('mtime') != os.stat(source_path).st_mtime and \
+                artifact.get('hash') != hashlib.sha256(source).hexdigest():
+            return None
+        code_objects = { key: marshal.loads(value) for key, value in artifact['code_objects'].items() }
+    except Exception:
+        return None
+    graphs._code_objects.update(code_objects)
+    try:
+        model = pickle.loads(artifact['model'])
+        result_code = artifact['result_code']
+        if result_code is not None:
+            model.result_function = graphs._eval_lambda(result_code)
+        return model
+    finally:
+        for key in code_objects:
+            graphs._code_objects.pop(key, None)
+
+def _read_source(data: bytes):
+    # Decode the source just like reading the file in text mode would do
+    return io.TextIOWrapper(io.BytesIO(data)).read()
+
 def compile_module(module, input_text):
     graph, expr = compile(input_text)
     module.model = graph.create_model(result_expr=expr)
@@ -19,23 +139,76 @@ def compile_module(module, input_text):
 
 class Clojure_Loader(_Loader):
 
+    use_cache = True
+
     def create_module(self, spec):
         return None
 
     def exec_module(self, module):
-        with open(module.__name__) as input_file:
-            input_text = ''.join(input_file.readlines())
-            compile_module(module, input_text)
+        path = module.__name__
+        with open(path, 'rb') as input_file:
+            source = input_file.read()
+        if self.use_cache:
+            model = load_cached_model(path, source)
+            if model is not None:
+                module.model = model
+                return
+        graph, expr = compile(_read_source(source))
+        module.model = graph.create_model(result_expr=expr)
+        if self.use_cache:
+            save_cached_model(path, source, module.model, _get_result_code(expr))
+
+
+class _DirectoryIndex(object):
+    """
+    Caches the listings of directories, so that the finder does not need to probe every possible location of a file
+    separately. A listing is refreshed whenever the modification time of its directory changes.
+    """
+
+    def __init__(self):
+        self._listings = {}
+
+    def get_listing(self, directory: str):
+        path = directory if directory != '' else '.'
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            self._listings.pop(path, None)
+            return frozenset()
+        entry = self._listings.get(path, None)
+        if entry is None or entry[0] != mtime:
+            try:
+                entry = (mtime, frozenset(os.listdir(path)))
+            except OSError:
+                entry = (mtime, frozenset())
+            self._listings[path] = entry
+        return entry[1]
+
+    def clear(self):
+        self._listings.clear()
+
 
 class Clojure_Finder(_MetaPathFinder):
 
+    possible_locations = [
+        '',
+        'foppl-src/',
+        'foppl_src/',
+        'foppl-models/',
+        'foppl_models/',
+        'models',
+        'examples/'
+    ]
+
+    def __init__(self):
+        self.index = _DirectoryIndex()
+
     def find_module(self, fullname, path=None):
         if path is None:
             path = _PATH
         return self.find_spec(fullname, path)
 
     def find_spec(self, fullname, path, target = None):
-        import os.path
         from importlib.machinery import ModuleSpec
 
         fullname = fullname.split(sep='.')[-1]
@@ -43,21 +216,19 @@ class Clojure_Finder(_MetaPathFinder):
         if '.' in fullname:
             raise NotImplementedError()
 
-        possible_locations = [
-            '',
-            'foppl-src/',
-            'foppl_src/',
-            'foppl-models/',
-            'foppl_models/',
-            'models',
-            'examples/'
-        ]
+        listings = {}
         for ext in ['.foppl', '.foppl.clj', '.foppl.py', '.clj']:
-            for loc in possible_locations:
+            for loc in self.possible_locations:
                 name = loc + fullname + ext
-                if os.path.exists(name):
+                directory, filename = os.path.split(name)
+                if directory not in listings:
+                    listings[directory] = self.index.get_listing(directory)
+                if filename in listings[directory] and os.path.exists(name):
                     return ModuleSpec(os.path.realpath(name), Clojure_Loader())
         return None
 
+    def invalidate_caches(self):
+        self.index.clear()
+
 import sys
 sys.meta_path.append(Clojure_Finder())
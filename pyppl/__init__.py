@@ -8,35 +8,142 @@
 #
 from typing import Optional
 from . import distributions, parser
-from .backend import ppl_graph_generator
+from .backend import ppl_graph_generator, ppl_graph_factory
+from .backend.ppl_graph_codegen import GraphCodeGenerator
+from .ppl_hash_consing import HashConsTable
+from .ppl_profiler import CompileProfiler
+from .ppl_compile_cache import CompileCache
 
+# The cache used by `compile_model`; use `compile_cache.clear()` to empty it, and `compile_cache.stats()` for the
+# numbers of hits and misses.
+compile_cache = CompileCache()
 
 
 def compile_model(source, *,
                   language: Optional[str]=None,
                   imports=None,
                   base_class: Optional[str]=None,
-                  namespace: Optional[dict]=None):
+                  namespace: Optional[dict]=None,
+                  tokenizer: Optional[str]=None,
+                  hash_cons: bool=False,
+                  profile=False,
+                  opt_level: int=1,
+                  plates: bool=False,
+                  local_variables: bool=False,
+                  lazy_branches: bool=False,
+                  vectorize: bool=False,
+                  extra_methods=(),
+                  use_cache: bool=False):
+    """
+    Compiles the given source into a model.
+
+    The `imports` select the backend providing the distributions, which the generated code refers to as `dist`. Use
+    `imports='import pyppl.backend.ppl_numpy_distributions as dist'` for the built-in backend based on NumPy.
+
+    With `profile=True` (or an instance of `CompileProfiler`), each pass of the compiler is profiled, and the
+    `CompileProfiler` with the results is available as `model.compile_profile` (use `to_json()` to dump it).
+
+    The `opt_level` selects how the transformations are scheduled: `0` runs each pass once, `1` (the default)
+    re-runs passes only if the tree has changed, and `2` also iterates the simplifier until it reaches a fixpoint.
+
+    With `plates=True`, a loop over data, whose iterations only observe values (such as the observations of a
+    regression), is not unrolled, but kept as a plate: all iterations share a single vertex, whose value is the list
+    of the values of all iterations (or an array with `vectorize=True`).  The size of the graph and the code then no
+    longer depends on the number of iterations.
+
+    With `local_variables=True`, the methods `gen_log_pdf`, `gen_log_pdf_transformed`, `gen_log_pdf_terms` and
+    `gen_prior_samples` hold the values in local variables, and only access the state to read their inputs and to
+    write back their results.
+
+    With `lazy_branches=True`, the generated methods only evaluate the vertices (and their distributions) on the
+    branches that are actually taken.  In the state returned by `gen_prior_samples`, the vertices on the other
+    branches are set to `None`.
+
+    With `vectorize=True` (and NumPy available), observations that share the same distribution, such as those on
+    i.i.d. data in an unrolled loop, are evaluated by `gen_log_pdf` and `gen_log_pdf_transformed` as a single
+    distribution over arrays.  Likewise, independent samples with the same distribution, such as the weights of a
+    layer in a neural network, are stacked into a single vertex whose value is an array (`transform_state` maps the
+    entries back to the names of the individual samples).  The iterations of a plate are evaluated at once, with
+    array-valued parameters.  This requires a backend whose distributions work on NumPy-arrays, and there is no
+    `gen_log_pdf_grad` for stacked vertices.
+
+    Apart from the basic methods such as `gen_log_pdf` and `gen_prior_samples`, the model only has the methods
+    whose groups are named in `extra_methods` (or all of them with `extra_methods='all'`):
+      - `'terms'`: `gen_log_pdf_terms` and `get_vertex_index`,
+      - `'grad'`: `gen_log_pdf_grad`,
+      - `'flat'`: `pack`, `unpack`, `gen_log_pdf_flat`, `get_flat_index` and the slices of the flat vector,
+      - `'delta'`: `gen_log_pdf_factors` and `gen_log_pdf_delta`,
+      - `'batch'`: `gen_prior_samples_batch` and `gen_log_pdf_batch`,
+      - `'markov_blanket'`: `get_markov_blanket`.
+
+    With `use_cache=True`, compiled models are kept in the `compile_cache`: compiling the same source with the same
+    options again returns a new instance of the cached model class.  Profiling always bypasses the cache.
+    """
+    if profile is True:
+        profile = CompileProfiler()
+    elif profile is False:
+        profile = None
     if type(imports) in (list, set, tuple):
         imports = '\n'.join(imports)
+    if extra_methods == 'all':
+        extra_methods = tuple(sorted(GraphCodeGenerator.EXTRA_METHODS))
+    elif type(extra_methods) is str:
+        extra_methods = (extra_methods,)
+    if use_cache and profile is None:
+        key = compile_cache.make_key(source, language=language, namespace=namespace, imports=imports,
+                                     base_class=base_class, opt_level=opt_level, plates=plates,
+                                     local_variables=local_variables, lazy_branches=lazy_branches, vectorize=vectorize,
+                                     extra_methods=extra_methods)
+        result = compile_cache.get(key)
+        if result is None:
+            result = compile_model(source, language=language, imports=imports, base_class=base_class,
+                                   namespace=namespace, tokenizer=tokenizer, hash_cons=hash_cons, opt_level=opt_level,
+                                   plates=plates, local_variables=local_variables, lazy_branches=lazy_branches,
+                                   vectorize=vectorize, extra_methods=extra_methods, use_cache=False)
+            compile_cache.put(key, result)
+        return result
     if namespace is not None:
         ns = distributions.namespace.copy()
         ns.update(namespace)
         namespace = ns
     else:
         namespace = distributions.namespace
-    ast = parser.parse(source, language=language, namespace=namespace)
-    gg = ppl_graph_generator.GraphGenerator()
+    table = HashConsTable() if hash_cons else None
+    ast = parser.parse(source, language=language, namespace=namespace, tokenizer=tokenizer,
+                       hash_cons=table, profiler=profile, opt_level=opt_level, plates=plates)
+    gg = ppl_graph_generator.GraphGenerator(ppl_graph_factory.GraphFactory(hash_cons=table))
+    if profile is not None:
+        profile.run_pass('graph_generator', gg, ast)
+        profile.passes[-1].nodes_out = len(gg.nodes)
+        result = gg.generate_model(base_class=base_class, imports=imports, profiler=profile,
+                                   local_variables=local_variables, lazy_branches=lazy_branches, vectorize=vectorize,
+                                   extra_methods=extra_methods)
+        result.compile_profile = profile
+        return result
     gg.visit(ast)
-    return gg.generate_model(base_class=base_class, imports=imports)
+    return gg.generate_model(base_class=base_class, imports=imports, local_variables=local_variables,
+                             lazy_branches=lazy_branches, vectorize=vectorize, extra_methods=extra_methods)
 
 
 def compile_model_from_file(filename: str, *,
                             language: Optional[str]=None,
                             imports=None,
                             base_class: Optional[str]=None,
-                            namespace: Optional[dict]=None):
+                            namespace: Optional[dict]=None,
+                            tokenizer: Optional[str]=None,
+                            hash_cons: bool=False,
+                            profile=False,
+                            opt_level: int=1,
+                            plates: bool=False,
+                            local_variables: bool=False,
+                            lazy_branches: bool=False,
+                            vectorize: bool=False,
+                            extra_methods=(),
+                            use_cache: bool=False):
     with open(filename) as f:
         lines = ''.join(f.readlines())
         return compile_model(lines, language=language, imports=imports, base_class=base_class,
-                             namespace=namespace)
+                             namespace=namespace, tokenizer=tokenizer, hash_cons=hash_cons, profile=profile,
+                             opt_level=opt_level, plates=plates, local_variables=local_variables,
+                             lazy_branches=lazy_branches, vectorize=vectorize, extra_methods=extra_methods,
+                             use_cache=use_cache)
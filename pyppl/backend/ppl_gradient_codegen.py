@@ -0,0 +1,369 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import ast
+from ..graphs import *
+from .. import distributions
+
+
+class _Unsupported(Exception):
+    pass
+
+
+_BINARY_OPS = {
+    ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.FloorDiv: '//', ast.Mod: '%', ast.Pow: '**',
+    ast.BitAnd: '&', ast.BitOr: '|', ast.BitXor: '^', ast.LShift: '<<', ast.RShift: '>>',
+}
+
+_UNARY_OPS = {
+    ast.UAdd: '+', ast.USub: '-', ast.Not: 'not ', ast.Invert: '~',
+}
+
+_COMPARE_OPS = {
+    ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=',
+    ast.Is: 'is', ast.IsNot: 'is not', ast.In: 'in', ast.NotIn: 'not in',
+}
+
+
+def _get_slice(node: ast.Subscript):
+    # Up to Python 3.8, a simple index is wrapped inside an `Index`-node
+    s = node.slice
+    return s.value if s.__class__.__name__ == 'Index' else s
+
+def _to_source(node) -> str:
+    """
+    Turns the (expression) AST back into Python code.  We only need the expressions that occur in the code for the
+    graph nodes.
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    elif isinstance(node, ast.Attribute):
+        return "{}.{}".format(_to_source(node.value), node.attr)
+    elif isinstance(node, ast.Subscript):
+        return "{}[{}]".format(_to_source(node.value), _to_source(_get_slice(node)))
+    elif isinstance(node, ast.Slice):
+        result = "{}:{}".format(_to_source(node.lower) if node.lower is not None else '',
+                                _to_source(node.upper) if node.upper is not None else '')
+        if node.step is not None:
+            result += ':' + _to_source(node.step)
+        return result
+    elif isinstance(node, ast.Call):
+        args = [_to_source(arg) for arg in node.args]
+        args += ["{}={}".format(kw.arg, _to_source(kw.value)) for kw in node.keywords]
+        return "{}({})".format(_to_source(node.func), ', '.join(args))
+    elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        return "({} {} {})".format(_to_source(node.left), _BINARY_OPS[type(node.op)], _to_source(node.right))
+    elif isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return "({}{})".format(_UNARY_OPS[type(node.op)], _to_source(node.operand))
+    elif isinstance(node, ast.BoolOp):
+        op = ' and ' if isinstance(node.op, ast.And) else ' or '
+        return "({})".format(op.join([_to_source(item) for item in node.values]))
+    elif isinstance(node, ast.Compare) and all([type(op) in _COMPARE_OPS for op in node.ops]):
+        result = [_to_source(node.left)]
+        for op, item in zip(node.ops, node.comparators):
+            result.append(_COMPARE_OPS[type(op)])
+            result.append(_to_source(item))
+        return "({})".format(' '.join(result))
+    elif isinstance(node, ast.IfExp):
+        return "({} if {} else {})".format(_to_source(node.body), _to_source(node.test), _to_source(node.orelse))
+    elif isinstance(node, ast.List):
+        return "[{}]".format(', '.join([_to_source(item) for item in node.elts]))
+    elif isinstance(node, ast.Tuple):
+        items = [_to_source(item) for item in node.elts]
+        return "({},)".format(items[0]) if len(items) == 1 else "({})".format(', '.join(items))
+    elif hasattr(ast, 'Constant') and isinstance(node, ast.Constant):
+        return repr(node.value)
+    elif node.__class__.__name__ in ('Num', 'Str', 'NameConstant'):
+        return repr(getattr(node, node._fields[0]))
+    else:
+        raise _Unsupported("cannot handle '{}'".format(node.__class__.__name__))
+
+
+class GradientCodeGenerator(object):
+    """
+    Generates the code for the model's method `gen_log_pdf_grad(state)`, which returns the gradient of the log-pdf
+    with respect to all continuous sampled vertices as a dictionary.
+
+    The code of the graph nodes is straight-line code.  We parse the code for the parameters of each distribution and
+    emit a forward pass, which stores each intermediate value that depends on a continuous vertex in a temporary
+    variable `_tN`, followed by the backward pass of reverse-mode differentiation, which accumulates the adjoints in
+    `_gN`.  The derivatives of the log-pdfs themselves are given by the rules in `ppl_gradient_rules` (imported as
+    `_grad`).  Conditions are evaluated as in `gen_log_pdf`, so that we get the gradient of the branch taken; on the
+    boundary, the gradient is not defined, of course.
+
+    Array-valued vertices (vectors and stacked vertices) need NumPy: the adjoints of entries and of parameters that
+    have been broadcast or stacked are gathered by the helpers `add_at`, `take` and `unbroadcast` in
+    `ppl_gradient_rules`.
+
+    If the model contains an expression or distribution for which we have no rule, the generated method raises a
+    `NotImplementedError` when called.
+    """
+
+    # The derivatives of functions with one argument `a`, where `t` is the result, `g` the adjoint of the result and
+    # `p` the prefix/module of the function
+    functions = {
+        'exp':     "{g} * {t}",
+        'expm1':   "{g} * ({t} + 1)",
+        'log':     "{g} / {a}",
+        'log1p':   "{g} / (1 + {a})",
+        'sqrt':    "{g} * 0.5 / {t}",
+        'sin':     "{g} * {p}cos({a})",
+        'cos':     "-{g} * {p}sin({a})",
+        'tan':     "{g} * (1 + {t} * {t})",
+        'atan':    "{g} / (1 + {a} * {a})",
+        'sinh':    "{g} * {p}cosh({a})",
+        'cosh':    "{g} * {p}sinh({a})",
+        'tanh':    "{g} * (1 - {t} * {t})",
+        'sigmoid': "{g} * {t} * (1 - {t})",
+    }
+
+    def __init__(self, nodes: list, state_object: str='state'):
+        self.nodes = nodes
+        self.state_object = state_object
+        self.active = [node.name for node in nodes
+                       if isinstance(node, Vertex) and node.is_sampled and node.is_continuous]
+        self.forward = []
+        self.backward = []
+        self.leaves = {}
+        self.temp_counter = 0
+
+    def generate(self) -> str:
+        try:
+            return '\n'.join(self._generate())
+        except (_Unsupported, SyntaxError) as e:
+            return "raise NotImplementedError({})".format(repr("no gradient for this model: " + str(e)))
+
+    def _generate(self):
+        state = self.state_object
+        if state is None:
+            raise _Unsupported("the model has no state-object")
+        self.forward = []
+        self.backward = []
+        self.leaves = {}
+        self.temp_counter = 0
+        for node in self.nodes:
+            if isinstance(node, Vertex):
+                self._visit_vertex(node)
+            elif isinstance(node, ConditionNode):
+                self.forward.append("{}['{}'] = {}".format(state, node.name, node.get_code()))
+        result = ["grad = {{{}}}".format(', '.join(["'{}': 0.0".format(name) for name in self.active]))]
+        if any([isinstance(node, DataNode) for node in self.nodes]):
+            result.append("{}.update(self.constants)".format(state))
+        result += self.forward
+        for block in reversed(self.backward):
+            result += block
+        result.append("return grad")
+        return result
+
+    def _new_temp(self, code: str):
+        self.temp_counter += 1
+        name = "_t{}".format(self.temp_counter)
+        self.forward.append("{} = {}".format(name, code))
+        self.forward.append("_g{} = 0.0".format(self.temp_counter))
+        return name
+
+    def _get_state_key(self, node):
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == self.state_object:
+            key = _get_slice(node)
+            if hasattr(ast, 'Constant') and isinstance(key, ast.Constant) and type(key.value) is str:
+                return key.value
+            elif key.__class__.__name__ == 'Str':
+                return key.s
+        return None
+
+    def _is_active(self, node):
+        for item in ast.walk(node):
+            if self._get_state_key(item) in self.active:
+                return True
+        return False
+
+    def _visit(self, node):
+        """
+        Emits the forward code for the expression and registers the backward code.  Returns the code for the value
+        of the expression, together with the name of the temporary variable holding its value if it is active,
+        i.e. if it depends on a continuous vertex, and `None` otherwise.
+        """
+        if not self._is_active(node):
+            return _to_source(node), None
+
+        key = self._get_state_key(node)
+        if key is not None:
+            if key not in self.leaves:
+                t = self._new_temp("{}['{}']".format(self.state_object, key))
+                self.leaves[key] = t
+                self.backward.append(["grad['{}'] += {}".format(key, self._adjoint(t))])
+            return self.leaves[key], self.leaves[key]
+
+        if isinstance(node, ast.BinOp) and type(node.op) in (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow):
+            a, a_t = self._visit(node.left)
+            b, b_t = self._visit(node.right)
+            t = self._new_temp("{} {} {}".format(a, _BINARY_OPS[type(node.op)], b))
+            g = self._adjoint(t)
+            block = []
+            if isinstance(node.op, ast.Add):
+                ga, gb = g, g
+            elif isinstance(node.op, ast.Sub):
+                ga, gb = g, "-" + g
+            elif isinstance(node.op, ast.Mult):
+                ga, gb = "{} * {}".format(g, b), "{} * {}".format(g, a)
+            elif isinstance(node.op, ast.Div):
+                ga, gb = "{} / {}".format(g, b), "-{} * {} / {}".format(g, t, b)
+            else:
+                ga, gb = "{} * {} * {} ** ({} - 1)".format(g, b, a, b), "{} * {} * _grad.log({})".format(g, t, a)
+            if a_t is not None:
+                block.append("{} += {}".format(self._adjoint(a_t), ga))
+            if b_t is not None:
+                block.append("{} += {}".format(self._adjoint(b_t), gb))
+            self.backward.append(block)
+            return t, t
+
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in (ast.UAdd, ast.USub):
+            a, a_t = self._visit(node.operand)
+            t = self._new_temp("{}{}".format(_UNARY_OPS[type(node.op)], a))
+            op = '+=' if isinstance(node.op, ast.UAdd) else '-='
+            self.backward.append(["{} {} {}".format(self._adjoint(a_t), op, self._adjoint(t))])
+            return t, t
+
+        elif isinstance(node, ast.Call) and len(node.args) == 1 and len(node.keywords) == 0 and \
+                isinstance(node.args[0], (ast.List, ast.Tuple)) and isinstance(node.func, ast.Attribute) and \
+                node.func.attr == 'array':
+            # Stacking values into a NumPy-array, e.g., the parameters of a stacked vertex
+            items = [self._visit(item) for item in node.args[0].elts]
+            t = self._new_temp("{}([{}])".format(_to_source(node.func), ', '.join([item[0] for item in items])))
+            self.backward.append(["{} += _grad.take({}, {})".format(self._adjoint(a_t), self._adjoint(t), i)
+                                  for i, (_, a_t) in enumerate(items) if a_t is not None])
+            return t, t
+
+        elif isinstance(node, ast.Call) and len(node.args) == 1 and len(node.keywords) == 0:
+            func = _to_source(node.func)
+            prefix, name = func[:func.rindex('.')+1] if '.' in func else '', func.split('.')[-1]
+            if name not in self.functions or (prefix == '' and '{p}' in self.functions[name]):
+                raise _Unsupported("no derivative for '{}'".format(func))
+            a, a_t = self._visit(node.args[0])
+            t = self._new_temp("{}({})".format(func, a))
+            g = self.functions[name].format(g=self._adjoint(t), t=t, a=a, p=prefix)
+            self.backward.append(["{} += {}".format(self._adjoint(a_t), g)])
+            return t, t
+
+        elif isinstance(node, ast.Subscript) and isinstance(node.value, (ast.List, ast.Tuple)) and \
+                not self._is_active(_get_slice(node)) and not isinstance(_get_slice(node), ast.Slice):
+            # Selecting an item from a vector, say, by a discrete variable: the adjoint goes to the selected item only
+            items = [self._visit(item) for item in node.value.elts]
+            self.temp_counter += 1
+            index = "_i{}".format(self.temp_counter)
+            self.forward.append("{} = {}".format(index, _to_source(_get_slice(node))))
+            t = self._new_temp("[{}][{}]".format(', '.join([item[0] for item in items]), index))
+            block = []
+            for i, (_, a_t) in enumerate(items):
+                if a_t is not None:
+                    block.append("if {} == {} or {} == {}:\n\t{} += {}".format(
+                        index, i, index, i - len(items), self._adjoint(a_t), self._adjoint(t)))
+            self.backward.append(block)
+            return t, t
+
+        elif isinstance(node, ast.Subscript) and not self._is_active(_get_slice(node)) and \
+                not isinstance(_get_slice(node), ast.Slice):
+            # Selecting an entry of an array-valued vertex, e.g., of a stacked vertex
+            a, a_t = self._visit(node.value)
+            self.temp_counter += 1
+            index = "_i{}".format(self.temp_counter)
+            self.forward.append("{} = {}".format(index, _to_source(_get_slice(node))))
+            t = self._new_temp("{}[{}]".format(a, index))
+            self.backward.append(["{0} = _grad.add_at({0}, {1}, {2}, {3})".format(
+                self._adjoint(a_t), a, index, self._adjoint(t))])
+            return t, t
+
+        elif isinstance(node, ast.Call) and len(node.args) == 2 and len(node.keywords) == 0 and \
+                isinstance(node.func, ast.Attribute) and node.func.attr == 'full' and not self._is_active(node.args[0]):
+            # Broadcasting a value to a NumPy-array, e.g., the parameter of a stacked vertex
+            a, a_t = self._visit(node.args[1])
+            t = self._new_temp("{}({}, {})".format(_to_source(node.func), _to_source(node.args[0]), a))
+            self.backward.append(["{} += _grad.unbroadcast({}, {})".format(self._adjoint(a_t), self._adjoint(t), a)])
+            return t, t
+
+        elif isinstance(node, (ast.Compare, ast.BoolOp)):
+            # Comparisons are piecewise constant
+            return _to_source(node), None
+
+        else:
+            raise _Unsupported("no derivative for '{}'".format(_to_source(node)))
+
+    @staticmethod
+    def _adjoint(temp: str):
+        return "_g" + temp[2:]
+
+    def _get_arguments(self, node: Vertex, distr):
+        # Returns the code of the distribution's arguments in the order of the parameters
+        args = node.distribution_args
+        names = node.distribution_arg_names
+        if args is None or distr is None:
+            raise _Unsupported("unknown distribution '{}'".format(node.distribution_name))
+        if len(distr.params) == 0:
+            return args
+        if names is None:
+            names = distr.params[:len(args)]
+        elif len(names) < len(args):
+            names = [None] * (len(args) - len(names)) + names
+        arguments = { n: a for n, a in zip(names, args) }
+        if not all([p in arguments for p in distr.params]):
+            raise _Unsupported("missing arguments for '{}'".format(node.distribution_name))
+        return [arguments[p] for p in distr.params]
+
+    def _visit_vertex(self, node: Vertex):
+        state = self.state_object
+        value = node.observation if node.is_observed else "{}['{}']".format(state, node.name)
+        value_ast = ast.parse(value, mode='eval').body
+        if not self._is_active(value_ast) and not self._is_active(ast.parse(node.get_code(), mode='eval')):
+            # This factor does not contribute to the gradient
+            return
+        from . import ppl_gradient_rules
+        distr = distributions.get_distribution_for_name(node.distribution_name)
+        if distr is None or distr.name not in ppl_gradient_rules.rules:
+            raise _Unsupported("no derivative for the distribution '{}'".format(node.distribution_name))
+        args = [ast.parse(arg, mode='eval').body for arg in self._get_arguments(node, distr)]
+
+        if node.plate is not None:
+            # The leaves are shared with the other vertices and must therefore live outside the loop, while the
+            # forward and backward pass of each iteration go into the loop
+            for item in [value_ast] + args:
+                for leaf in ast.walk(item):
+                    if self._get_state_key(leaf) in self.active:
+                        self._visit(leaf)
+            forward, backward = self.forward, self.backward
+            self.forward, self.backward = [], []
+            try:
+                self._visit_factor(node, value_ast, args, distr)
+                body = self.forward + [line for block in reversed(self.backward) for line in block]
+            finally:
+                self.forward, self.backward = forward, backward
+            self.forward.append("for {} in range({}):\n\t{}".format(node.plate.index, node.plate.size,
+                                                                     '\n'.join(body).replace('\n', '\n\t')))
+        else:
+            self._visit_factor(node, value_ast, args, distr)
+
+    def _visit_factor(self, node: Vertex, value_ast, args: list, distr):
+        from . import ppl_gradient_rules
+        items = [self._visit(item) for item in [value_ast] + args]
+        self.temp_counter += 1
+        d = "_d{}".format(self.temp_counter)
+        code = ["{} = _grad.{}({})".format(d, ppl_gradient_rules.rules[distr.name].__name__,
+                                           ', '.join([item[0] for item in items]))]
+        # The log-pdf of an array-valued vertex is the sum over its entries, so that the derivatives with respect to
+        # parameters, which have been broadcast, are sums as well
+        is_array = distr._vector_sample or node.elements is not None or \
+                   (node.sample_size is not None and node.sample_size > 1)
+        for i, (_, t) in enumerate(items):
+            if t is not None:
+                if is_array:
+                    code.append("{} += _grad.unbroadcast({}[{}], {})".format(self._adjoint(t), d, i, t))
+                else:
+                    code.append("{} += {}[{}]".format(self._adjoint(t), d, i))
+        cond_code = node.get_cond_code(state_object=self.state_object)
+        if cond_code is not None:
+            self.forward.append(cond_code + '\n\t'.join(code))
+        else:
+            self.forward += code
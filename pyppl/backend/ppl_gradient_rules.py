@@ -0,0 +1,169 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+# The derivative rules for the log-pdfs of the distributions, used by the code generated for `gen_log_pdf_grad` (see
+# `ppl_gradient_codegen`).
+#
+# Each rule takes the value and the parameters of the distribution (in the order given in `pyppl.distributions`) and
+# returns the partial derivatives of the log-pdf with respect to the value and each of the parameters as a tuple. The
+# rules work on floats, and on NumPy-arrays if NumPy is available. The rules for the distributions over vectors (and
+# the helpers for array-valued vertices) need NumPy.
+#
+import math
+
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+
+if np is not None:
+    exp = np.exp
+    log = np.log
+else:
+    exp = math.exp
+    log = math.log
+
+
+def _digamma(x: float):
+    result = 0.0
+    while x < 6.0:
+        result -= 1.0 / x
+        x += 1.0
+    f = 1.0 / (x * x)
+    return result + math.log(x) - 0.5 / x - \
+           f * (1.0/12 - f * (1.0/120 - f * (1.0/252 - f * (1.0/240 - f / 132))))
+
+if np is not None:
+    _digamma_vector = np.vectorize(_digamma, otypes=[float])
+
+def digamma(x):
+    if np is not None and isinstance(x, np.ndarray):
+        return _digamma_vector(x)
+    return _digamma(float(x))
+
+
+def unbroadcast(g, value):
+    """
+    Sums the derivative `g` over the axes, along which `value` has been broadcast to the shape of `g`.
+    """
+    shape = np.shape(value)
+    if np.shape(g) == shape:
+        return g
+    g = np.sum(g, axis=tuple(range(np.ndim(g) - len(shape))))
+    axes = tuple([i for i, n in enumerate(shape) if n == 1 and g.shape[i] != 1])
+    if len(axes) > 0:
+        g = np.sum(g, axis=axes, keepdims=True)
+    return g if len(shape) > 0 else float(g)
+
+def add_at(adjoint, value, index, g):
+    """
+    Adds `g` to the entry `index` of the adjoint of the array `value`.
+    """
+    if np.ndim(adjoint) == 0:
+        adjoint = np.full(np.shape(value), float(adjoint))
+    adjoint[index] += g
+    return adjoint
+
+def take(g, index):
+    # The adjoint is `0.0` as long as nothing has been added to it
+    return g[index] if np.ndim(g) > 0 else g
+
+
+def bernoulli(value, probs):
+    return 0.0, value / probs - (1 - value) / (1 - probs)
+
+def beta(value, alpha, beta):
+    d = digamma(alpha + beta)
+    return (alpha - 1) / value - (beta - 1) / (1 - value), \
+           log(value) - digamma(alpha) + d, \
+           log(1 - value) - digamma(beta) + d
+
+def binomial(value, total_count, probs):
+    return 0.0, 0.0, value / probs - (total_count - value) / (1 - probs)
+
+def categorical(value, probs):
+    probs = np.asarray(probs, dtype=float)
+    value = np.asarray(value, dtype=int)
+    one_hot = np.arange(probs.shape[-1]) == value[..., None]
+    return 0.0, one_hot / probs - 1 / probs.sum(axis=-1, keepdims=True)
+
+def cauchy(value, mu, gamma):
+    z = (value - mu) / gamma
+    d = 2 * z / (gamma * (1 + z * z))
+    return -d, d, z * d - 1 / gamma
+
+def dirichlet(value, alpha):
+    alpha = np.asarray(alpha, dtype=float)
+    value = np.asarray(value, dtype=float)
+    return (alpha - 1) / value, digamma(alpha.sum(axis=-1, keepdims=True)) - digamma(alpha) + log(value)
+
+def discrete(value, probs):
+    # The parameters of `Discrete` are not declared in `pyppl.distributions`: we get the arguments as they are given
+    return categorical(value, probs)
+
+def exponential(value, rate):
+    return -rate, 1 / rate - value
+
+def gamma(value, alpha, beta):
+    return (alpha - 1) / value - beta, \
+           log(beta) - digamma(alpha) + log(value), \
+           alpha / beta - value
+
+def half_cauchy(value, mu, gamma):
+    return cauchy(value, mu, gamma)
+
+def log_gamma(value, alpha, beta):
+    e = exp(value)
+    return alpha - beta * e, log(beta) - digamma(alpha) + value, alpha / beta - e
+
+def log_normal(value, mu, sigma):
+    z = (log(value) - mu) / sigma
+    return (-1 - z / sigma) / value, z / sigma, (z * z - 1) / sigma
+
+def multinomial(value, total_count, probs, n):
+    probs = np.asarray(probs, dtype=float)
+    value = np.asarray(value, dtype=float)
+    return 0.0, 0.0, value / probs - value.sum(axis=-1, keepdims=True) / probs.sum(axis=-1, keepdims=True), 0.0
+
+def multivariate_normal(value, mu, covariance_matrix):
+    cov = np.asarray(covariance_matrix, dtype=float)
+    s = np.linalg.solve(cov, (np.asarray(value, dtype=float) - mu)[..., None])[..., 0]
+    return -s, s, 0.5 * (s[..., :, None] * s[..., None, :] - np.linalg.inv(cov))
+
+def normal(value, loc, scale):
+    z = (value - loc) / scale
+    return -z / scale, z / scale, (z * z - 1) / scale
+
+def poisson(value, lam):
+    return 0.0, value / lam - 1
+
+def uniform(value, a, b):
+    d = 1 / (b - a)
+    return 0.0, d, -d
+
+
+# The rules by the name of the distribution
+rules = {
+    'Bernoulli':   bernoulli,
+    'Beta':        beta,
+    'Binomial':    binomial,
+    'Categorical': categorical,
+    'Cauchy':      cauchy,
+    'Dirichlet':   dirichlet,
+    'Discrete':    discrete,
+    'Exponential': exponential,
+    'Gamma':       gamma,
+    'HalfCauchy':  half_cauchy,
+    'LogGamma':    log_gamma,
+    'LogNormal':   log_normal,
+    'Multinomial': multinomial,
+    'MultivariateNormal': multivariate_normal,
+    'Normal':      normal,
+    'Poisson':     poisson,
+    'Uniform':     uniform,
+}
@@ -6,10 +6,218 @@
 # 12. Mar 2018, Tobias Kohn
 # 07. May 2018, Tobias Kohn
 #
+import ast
 import datetime
 import importlib
+import json
+import re
 from ..graphs import *
 from ..ppl_ast import *
+from .. import distributions
+from .ppl_gradient_codegen import GradientCodeGenerator
+from .ppl_graph_vectorizer import find_observe_families
+
+# The code of data, which consists of numbers and lists only
+_numeric_data = re.compile(r"^\[[\[\]\s,0-9eE.+\-]*\]$")
+
+
+class _BatchTransformer(ast.NodeTransformer):
+    """
+    Rewrites the code of a node so that it computes the values of all particles at once, where each value in the
+    state has a leading particle dimension: the boolean operators and conditional expressions become the element-wise
+    NumPy-functions, a list is indexed by an array of indices through `choose`, and an index into a vector-valued
+    vertex selects an entry for every particle.  Raises a `ValueError` for anything we cannot batch.
+    """
+
+    def __init__(self, state_object: str, numpy_name: str, vectors: set, arrays: set, data: set):
+        self.state_object = state_object
+        self.numpy_name = numpy_name
+        self.vectors = vectors      # The vertices with vector values
+        self.arrays = arrays        # The data nodes, whose values are NumPy-arrays
+        self.data = data            # All data nodes
+
+    def _call(self, function: str, *args, **kwargs):
+        return ast.Call(func=ast.Attribute(value=ast.Name(id=self.numpy_name, ctx=ast.Load()), attr=function,
+                                           ctx=ast.Load()),
+                        args=list(args), keywords=[ast.keyword(arg=k, value=v) for k, v in kwargs.items()])
+
+    def _get_key(self, node):
+        # The name of the value, if the node reads `state['name']`
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and \
+                node.value.id == self.state_object and isinstance(node.slice, ast.Constant):
+            return node.slice.value
+        return None
+
+    def is_batched(self, node):
+        for item in ast.walk(node):
+            key = self._get_key(item)
+            if key is not None and key not in self.data:
+                return True
+        return False
+
+    def visit_Subscript(self, node):
+        if self._get_key(node) is not None:
+            return node
+        self.generic_visit(node)
+        base = node.value
+        if isinstance(base, (ast.List, ast.Tuple)):
+            if not self.is_batched(node.slice):
+                return node
+            # `choose` picks the values of the particles from a list of scalars
+            if not any([isinstance(item, (ast.List, ast.Tuple)) or self._get_key(item) in self.vectors
+                        for item in base.elts]):
+                return self._call('choose', node.slice, ast.List(elts=base.elts, ctx=ast.Load()))
+        key = self._get_key(base)
+        if key in self.vectors and not self.is_batched(node.slice):
+            node.slice = ast.Tuple(elts=[ast.Constant(value=Ellipsis), node.slice], ctx=ast.Load())
+            return node
+        if key in self.vectors:
+            index = ast.Subscript(value=self._call('asarray', node.slice),
+                                  slice=ast.Tuple(elts=[ast.Constant(value=Ellipsis), ast.Constant(value=None)],
+                                                  ctx=ast.Load()), ctx=ast.Load())
+            return ast.Subscript(value=self._call('take_along_axis', base, index, ast.Constant(value=-1)),
+                                 slice=ast.Tuple(elts=[ast.Constant(value=Ellipsis), ast.Constant(value=0)],
+                                                 ctx=ast.Load()), ctx=ast.Load())
+        if not self.is_batched(base):
+            root = base
+            while isinstance(root, ast.Subscript) and self._get_key(root) is None:
+                root = root.value
+            if not self.is_batched(node.slice) or self._get_key(root) in self.arrays:
+                return node
+        raise ValueError("cannot index '{}' per particle".format(ast.unparse(node)))
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        function = 'logical_and' if isinstance(node.op, ast.And) else 'logical_or'
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = self._call(function, result, value)
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return self._call('logical_not', node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        # A chain `a < b < c` is a conjunction of the single comparisons
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        left = node.left
+        result = None
+        for op, right in zip(node.ops, node.comparators):
+            item = ast.Compare(left=left, ops=[op], comparators=[right])
+            result = item if result is None else self._call('logical_and', result, item)
+            left = right
+        return result
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return self._call('where', node.test, node.body, node.orelse)
+
+    def visit_Call(self, node):
+        # The stacked parameters of a vectorised vertex get the particles along the first axis
+        self.generic_visit(node)
+        func = node.func
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and \
+                func.value.id == self.numpy_name and self.is_batched(node):
+            if func.attr == 'array' and len(node.args) == 1 and isinstance(node.args[0], ast.List):
+                return self._call('stack', self._call('broadcast_arrays', ast.Starred(value=node.args[0],
+                                                                                        ctx=ast.Load())),
+                                  axis=ast.Constant(value=-1))
+            if func.attr == 'full' and len(node.args) == 2 and isinstance(node.args[0], ast.Constant):
+                items = ast.List(elts=[node.args[1]] * node.args[0].value, ctx=ast.Load())
+                return self._call('stack', items, axis=ast.Constant(value=-1))
+        return node
+
+    def transform(self, code: str):
+        try:
+            tree = ast.parse(code, mode='eval')
+        except SyntaxError:
+            raise ValueError("cannot parse '{}'".format(code))
+        return ast.unparse(ast.fix_missing_locations(self.visit(tree)))
+
+
+class _PlateTransformer(ast.NodeTransformer):
+    """
+    Rewrites the code of a vertex inside a plate so that it evaluates all iterations at once, where the loop variable
+    holds the array of all indices, and each value computed from it has a leading iteration dimension: a list indexed
+    by the loop variable becomes an array, an index into such a value picks an entry for every iteration, and
+    anything that might not work element-wise on arrays raises a `ValueError`.
+    """
+
+    _ELEMENT_WISE = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Attribute, ast.keyword,
+                     ast.Load, ast.operator, ast.UAdd, ast.USub)
+
+    def __init__(self, index: str, state_object: str, numpy_name: str, vectors: set, arrays: set):
+        self.index = index
+        self.state_object = state_object
+        self.numpy_name = numpy_name
+        self.vectors = vectors      # The vertices and data nodes with vector values
+        self.arrays = arrays        # The data nodes, whose values are NumPy-arrays
+
+    def _get_key(self, node):
+        # The name of the value, if the node reads `state['name']`
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and \
+                node.value.id == self.state_object and isinstance(node.slice, ast.Constant):
+            return node.slice.value
+        return None
+
+    def _uses_index(self, node):
+        return any([isinstance(item, ast.Name) and item.id == self.index for item in ast.walk(node)])
+
+    def generic_visit(self, node):
+        if not isinstance(node, self._ELEMENT_WISE):
+            raise ValueError("cannot evaluate '{}' for all iterations".format(ast.unparse(node)))
+        return super().generic_visit(node)
+
+    def visit_Subscript(self, node):
+        key = self._get_key(node)
+        if key is not None:
+            # A vector would not broadcast against the iterations, unless we pick an entry first
+            if key in self.vectors:
+                raise ValueError("cannot evaluate '{}' for all iterations".format(ast.unparse(node)))
+            return node
+        base = node.value
+        if isinstance(base, (ast.List, ast.Tuple)):
+            base.elts = [self.visit(item) for item in base.elts]
+        elif self._get_key(base) is None:
+            node.value = self.visit(base)
+        node.slice = self.visit(node.slice)
+        per_iteration = self._uses_index(node.value)
+        if isinstance(node.slice, (ast.Slice, ast.Tuple)) or \
+                (per_iteration and (self._uses_index(node.slice) or isinstance(base, (ast.List, ast.Tuple)))):
+            raise ValueError("cannot index '{}' for all iterations".format(ast.unparse(node)))
+        if per_iteration:
+            node.slice = ast.Tuple(elts=[ast.Slice(), node.slice], ctx=ast.Load())
+            return node
+        if not self._uses_index(node.slice) or self._get_key(base) in self.arrays:
+            return node
+        if isinstance(base, (ast.List, ast.Tuple)):
+            node.value = ast.Call(func=ast.Attribute(value=ast.Name(id=self.numpy_name, ctx=ast.Load()),
+                                                     attr='asarray', ctx=ast.Load()),
+                                  args=[ast.List(elts=base.elts, ctx=ast.Load())], keywords=[])
+            return node
+        raise ValueError("cannot index '{}' for all iterations".format(ast.unparse(node)))
+
+    def visit_Call(self, node):
+        # Only the distributions and NumPy's functions are known to work on arrays
+        func = node.func
+        if not (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and
+                func.value.id in (self.numpy_name, 'dist')):
+            raise ValueError("cannot evaluate '{}' for all iterations".format(ast.unparse(node)))
+        node.args = [self.visit(arg) for arg in node.args]
+        node.keywords = [self.visit(keyword) for keyword in node.keywords]
+        return node
+
+    def transform(self, code: str):
+        try:
+            tree = ast.parse(code, mode='eval')
+        except SyntaxError:
+            raise ValueError("cannot parse '{}'".format(code))
+        return ast.unparse(ast.fix_missing_locations(self.visit(tree)))
 
 
 class GraphCodeGenerator(object):
@@ -56,15 +264,47 @@ class GraphCodeGenerator(object):
           return "param1, param2", "return set.union(self.vertices, self.conditionals)"
       ```
 
+      Private helper methods, which are generated for each vertex, say, are returned by `_generate_helper_methods`
+      as a list of tuples `(name, parameters, code)`.
+
+      The methods listed in `EXTRA_METHODS` are only generated if their group is named in `extra_methods`, so that
+      a model does not pay for the code of, say, the gradient, unless it is actually used.
+
       Of course, you do not need to actually change this class, but you can derive a new class from it, if you wish.
     """
 
-    def __init__(self, nodes: list, state_object: Optional[str]=None, imports: Optional[str]=None):
+    # The groups of methods that are only generated on demand (see `extra_methods` in `compile_model`)
+    EXTRA_METHODS = {
+        'terms': ('gen_log_pdf_terms', 'get_vertex_index'),
+        'grad': ('gen_log_pdf_grad',),
+        'flat': ('get_flat_index', 'get_flat_cont_slice', 'get_flat_disc_slice', 'pack', 'unpack', 'gen_log_pdf_flat'),
+        'delta': ('gen_log_pdf_factors', 'gen_log_pdf_delta'),
+        'batch': ('gen_prior_samples_batch', 'gen_log_pdf_batch'),
+        'markov_blanket': ('get_markov_blanket',),
+    }
+
+    def __init__(self, nodes: list, state_object: Optional[str]=None, imports: Optional[str]=None,
+                 local_variables: bool=False, lazy_branches: bool=False, vectorize: bool=False,
+                 extra_methods: tuple=()):
+        for name in extra_methods:
+            if name not in self.EXTRA_METHODS:
+                raise ValueError("unknown extra method: '{}'".format(name))
         self.nodes = nodes
         self.state_object = state_object
         self.imports = imports
+        self.local_variables = local_variables
+        self.lazy_branches = lazy_branches
+        self.vectorize = vectorize
+        self.extra_methods = set(extra_methods)
+        self._families = None
         self.bit_vector_name = None
         self.logpdf_suffix = None
+        self.numpy_name = None
+        self._dependents = None
+        self._constant_distributions = None
+        self._array_plates = None
+        self._flat_layout = None
+        self._has_dist = False
 
     def _complete_imports(self, imports: str):
         if imports != '':
@@ -87,6 +327,7 @@ class GraphCodeGenerator(object):
                 uses_torch = uses_torch or m == 'torch'
             if uses_torch or uses_numpy:
                 self.logpdf_suffix = ''
+            self._has_dist = has_dist or uses_torch
             if not has_dist:
                 if uses_torch:
                     return 'import pyfo.distributions as dist\n'
@@ -127,6 +368,18 @@ class GraphCodeGenerator(object):
         except ModuleNotFoundError:
             pass
 
+        # NumPy is optional: the flat vectors (see `pack`) are simple lists if it is not available
+        try:
+            importlib.import_module('numpy')
+            self.numpy_name = '_np'
+            imports = "import numpy as _np\n" + imports
+        except ModuleNotFoundError:
+            self.numpy_name = None
+
+        if 'markov_blanket' in self.extra_methods:
+            imports = "from pyppl.graphs import MarkovBlanketIndex as _MarkovBlanketIndex\n" + imports
+        if 'grad' in self.extra_methods:
+            imports = "from pyppl.backend import ppl_gradient_rules as _grad\n" + imports
         imports = self._complete_imports(imports) + imports
 
         result = ["# {}".format(datetime.datetime.now()),
@@ -146,7 +399,10 @@ class GraphCodeGenerator(object):
         if repr_method is not None:
             result.append('\t' + repr_method.replace('\n', '\n\t'))
 
-        methods = [x for x in dir(self) if not x.startswith('_') and x != 'generate_model_code']
+        skipped = { name for key in self.EXTRA_METHODS if key not in self.extra_methods
+                    for name in self.EXTRA_METHODS[key] }
+        methods = [x for x in dir(self) if not x.startswith('_') and x != 'generate_model_code' and
+                   x not in skipped]
         for method_name in methods:
             method = getattr(self, method_name)
             if callable(method):
@@ -159,6 +415,10 @@ class GraphCodeGenerator(object):
                 code = code.replace('\n', '\n\t\t')
                 result.append("\tdef {}({}):\n\t\t{}\n".format(method_name, args, code))
 
+        for method_name, args, code in self._generate_helper_methods():
+            code = code.replace('\n', '\n\t\t')
+            result.append("\tdef {}(self, {}):\n\t\t{}\n".format(method_name, args, code))
+
         return '\n'.join(result)
 
     def _generate_doc_string(self):
@@ -170,7 +430,168 @@ class GraphCodeGenerator(object):
                "\tself.vertices = vertices\n" \
                "\tself.arcs = arcs\n" \
                "\tself.data = data\n" \
-               "\tself.conditionals = conditionals\n"
+               "\tself.conditionals = conditionals\n" \
+               "\tself.markov_blanket = None\n" + \
+               self._generate_constants() + \
+               "\tself.distributions = {}\n".format(self._generate_distributions().replace('\n', '\n\t')) + \
+               "\tself.transformed_distributions = None\n" + \
+               self._generate_vectors()
+
+    def _generate_constants(self):
+        # The values of the data nodes are built once, when the model is created, and then shared by all states.
+        # With NumPy, numeric data becomes read-only arrays, so that no state can modify the shared values.
+        data_nodes = [node for node in self.nodes if isinstance(node, DataNode)]
+        if len(data_nodes) > 0:
+            items = []
+            arrays = []
+            for node in data_nodes:
+                code = node.get_code()
+                if self._is_numeric_data(code):
+                    code = "{}.array({})".format(self.numpy_name, code)
+                    arrays.append("\tself.constants['{}'].setflags(write=False)\n".format(node.name))
+                items.append("\t\t'{}': {},\n".format(node.name, code))
+            return "\tself.constants = {{\n{}\t}}\n".format(''.join(items)) + ''.join(arrays)
+        else:
+            return "\tself.constants = {}\n"
+
+    def _is_numeric_data(self, code: str):
+        # Only (nested) lists of numbers, which NumPy can turn into a rectangular array of numbers
+        if self.numpy_name is None or _numeric_data.match(code) is None:
+            return False
+        try:
+            import numpy
+            return numpy.array(json.loads(code)).dtype.kind in 'biuf'
+        except ValueError:
+            return False
+
+    def _get_families(self):
+        # The families of observed vertices, which are evaluated as a single vectorised factor (needs NumPy)
+        if self._families is None:
+            if self.vectorize:
+                self._families = find_observe_families(self.nodes, self.state_object, self.numpy_name)
+            else:
+                self._families = []
+        return self._families
+
+    def _generate_vectors(self):
+        # The parameters and observations of the families, which do not depend on the state
+        items = []
+        for family in self._get_families():
+            for key, codes in family.constant_slots:
+                items.append("\t\t'{}': {}.array([{}]),\n".format(key, self.numpy_name, ', '.join(codes)))
+        if len(items) > 0:
+            return "\tself.vectors = {{\n{}\t}}\n".format(''.join(items))
+        else:
+            return "\tself.vectors = {}\n"
+
+    def _get_constant_distributions(self):
+        # The vertices whose distributions do not depend on the state (apart from data nodes), mapped to the names of
+        # the data nodes they use
+        if self._constant_distributions is None:
+            if not self._has_dist:
+                # Without any module `dist`, the distributions could not be built when the model is created
+                return {}
+            data_names = { node.name for node in self.nodes if isinstance(node, DataNode) }
+            names = re.compile(r"\b({})\b".format('|'.join([re.escape(node.name) for node in self.nodes])))
+            result = {}
+            for node in self.nodes:
+                if isinstance(node, Vertex) and node.plate is None and \
+                        all([isinstance(a, DataNode) for a in node.ancestors]):
+                    used = set(names.findall(node.get_code()))
+                    if used.issubset(data_names):
+                        result[node] = used
+            self._constant_distributions = result
+        return self._constant_distributions
+
+    def _get_constant_code(self, node: Vertex, flags: dict):
+        # Takes the values of the data nodes from `self.constants`
+        code = node.get_code(**flags)
+        for name in sorted(self._get_constant_distributions()[node]):
+            if self.state_object is not None:
+                code = code.replace("{}['{}']".format(self.state_object, name), "self.constants['{}']".format(name))
+            else:
+                code = re.sub(r"\b{}\b".format(name), "self.constants['{}']".format(name), code)
+        return code
+
+    def _generate_distributions(self, flags: Optional[dict]=None):
+        items = ["\t'{}': {},\n".format(node.name, self._get_constant_code(node, flags if flags is not None else {}))
+                 for node in self._get_constant_distributions()]
+        return "{{\n{}}}".format(''.join(items)) if len(items) > 0 else "{}"
+
+    def _get_distribution_code(self, node: Vertex, flags=None):
+        if node in self._get_constant_distributions():
+            if flags is None or len(flags) == 0:
+                return "self.distributions['{}']".format(node.name)
+            elif flags == {'transformed': True}:
+                return "self.transformed_distributions['{}']".format(node.name)
+        if flags is not None:
+            return node.get_code(**flags)
+        else:
+            return node.get_code()
+
+    def _use_local_variables(self, code: str, *, write_back: str='conditions'):
+        """
+        Rewrites the code of a method so as to hold the values in local variables instead of the state, which is much
+        faster in Python. The inputs are read from the state when the method is entered, and the data nodes are taken
+        from `self.constants`.  Before the method returns, the values the caller needs are written back to the state:
+        either `'all'` values, only the `'conditions'` (as used by `gen_cond_bit_vector`), or `'none'`.
+
+        Values that are only assigned under some condition remain in the state, as do inputs that are only read
+        under some condition: they might not be present in the state at all.
+        """
+        state = self.state_object
+        if not self.local_variables or state is None:
+            return code
+        pattern = re.compile(r"(?<![\w.]){}\['([A-Za-z_][A-Za-z_0-9]*)'\]".format(re.escape(state)))
+        assign_pattern = re.compile(r"^(\t*){}\['([A-Za-z_][A-Za-z_0-9]*)'\] = ".format(re.escape(state)))
+        update_line = "{}.update(self.constants)".format(state)
+        data_names = { node.name for node in self.nodes if isinstance(node, DataNode) }
+        cond_names = { node.name for node in self.nodes if isinstance(node, ConditionNode) }
+        lines = code.split('\n')
+
+        # Find the values assigned at the top level and those read before they have been assigned
+        assigned = set()
+        assigned_nested = set()
+        inputs = set()
+        inputs_nested = set()
+        for line in lines:
+            m = assign_pattern.match(line)
+            target = m.group(2) if m is not None else None
+            nested = line.startswith('\t')
+            reads = pattern.findall(line[m.end():] if m is not None else line)
+            for name in reads:
+                if name not in assigned:
+                    (inputs_nested if nested else inputs).add(name)
+            if target is not None:
+                (assigned_nested if m.group(1) != '' else assigned).add(target)
+        names = (assigned | inputs) - assigned_nested - (inputs_nested - inputs)
+        if len(names) == 0:
+            return code
+
+        loads = []
+        for name in sorted(names & inputs):
+            if name in data_names:
+                loads.append("{} = self.constants['{}']".format(name, name))
+            else:
+                loads.append("{} = {}['{}']".format(name, state, name))
+        if write_back == 'all':
+            stores = sorted(names & assigned)
+        elif write_back == 'conditions':
+            stores = sorted(names & assigned & cond_names)
+        else:
+            stores = []
+
+        # The first line initialises the method's result (or the state itself)
+        result = [pattern.sub(lambda m: m.group(1) if m.group(1) in names else m.group(0), lines[0])] + loads
+        for line in lines[1:]:
+            if line == update_line and write_back != 'all':
+                continue
+            if len(stores) > 0 and line.startswith('return '):
+                result.append("{}.update({{{}}})".format(state, ', '.join(["'{}': {}".format(name, name)
+                                                                          for name in stores])))
+                stores = []
+            result.append(pattern.sub(lambda m: m.group(1) if m.group(1) in names else m.group(0), line))
+        return '\n'.join(result)
 
     def _generate_repr_method(self):
         s = "def __repr__(self):\n" \
@@ -198,6 +619,11 @@ class GraphCodeGenerator(object):
     def get_conditions(self):
         return "return self.conditionals"
 
+    def get_markov_blanket(self):
+        return "name", "if self.markov_blanket is None:\n" \
+                       "\tself.markov_blanket = _MarkovBlanketIndex(sorted(self.vertices, key=lambda v: v.name))\n" \
+                       "return self.markov_blanket.get_markov_blanket(name)"
+
     def gen_cond_vars(self):
         return "return [c.name for c in self.conditionals]"
 
@@ -216,7 +642,119 @@ class GraphCodeGenerator(object):
     def is_torch_imported(self):
         return "import sys \nprint('torch' in sys.modules) \nprint(torch.__version__) \nprint(type(torch.tensor)) \nimport inspect \nprint(inspect.getfile(torch))"
 
-    def _gen_code(self, buffer: list, code_for_vertex, *, want_data_node: bool=True, flags=None):
+    def _get_guard(self, node: ConditionNode):
+        # A condition that depends on vertices in a branch is only evaluated if that branch is taken
+        conditions = set()
+        for a in node.ancestors:
+            if isinstance(a, Vertex) and a.conditions is not None:
+                conditions.update(a.conditions)
+        if len(conditions) == 0:
+            return None
+        result = []
+        for cond, truth_value in sorted(conditions, key=lambda c: (c[0].name, c[1])):
+            name = "{}['{}']".format(self.state_object, cond.name) if self.state_object is not None else cond.name
+            result.append(name if truth_value else 'not ' + name)
+        return ' and '.join(result)
+
+    def _gen_guarded_code(self, cond_code: str, dist_code: str, code, inactive_code=None):
+        # Puts the distribution and the code of a vertex under the guard of its conditions, removing the guard
+        # `code_for_vertex` might already have put in place
+        if type(code) is str:
+            code = [code]
+        elif code is None:
+            code = []
+        body = [dist_code] if dist_code is not None else []
+        for item in code:
+            if item.startswith(cond_code):
+                item = item[len(cond_code):].replace('\n\t', '\n')
+            body.append(item)
+        result = cond_code + '\n'.join(body).replace('\n', '\n\t')
+        if inactive_code is not None:
+            result += "\nelse:\n\t" + inactive_code
+        return result
+
+    def _get_array_plates(self):
+        # With `vectorize`, the vertices inside plates whose code can be evaluated for all iterations at once, mapped to
+        # the transformers for their distributions (see `_PlateTransformer`)
+        if self._array_plates is None:
+            result = {}
+            if self.vectorize and self.numpy_name is not None and self.state_object is not None:
+                vectors = { node.name for node in self.nodes
+                            if isinstance(node, DataNode) or
+                            (isinstance(node, Vertex) and (self._is_flat_vector(node) or node.elements is not None)) }
+                arrays = { node.name for node in self.nodes
+                           if isinstance(node, DataNode) and self._is_numeric_data(node.get_code()) }
+                for node in self.nodes:
+                    if isinstance(node, Vertex) and node.plate is not None and node.observation is not None:
+                        transformer = _PlateTransformer(node.plate.index, self.state_object, self.numpy_name,
+                                                        vectors, arrays)
+                        try:
+                            transformer.transform(node.get_code())
+                            transformer.transform(node.observation)
+                            result[node] = transformer
+                        except ValueError:
+                            pass
+            self._array_plates = result
+        return self._array_plates
+
+    def _get_observation_code(self, node: Vertex):
+        # The observed values of all iterations at once, if the vertex is inside a plate without a loop
+        transformer = self._get_array_plates().get(node, None)
+        return transformer.transform(node.observation) if transformer is not None else node.observation
+
+    def _gen_plate_code(self, name: str, node: Vertex, code_for_vertex, flags, code_for_plate,
+                        code_for_inactive_vertex, want_distribution):
+        # The vertex is evaluated once per iteration of the plate, where `name[index]` is the value of the iteration.
+        # If possible, all iterations are evaluated at once, though, with the array of all indices as `index`, so that
+        # `name` is the array of all values
+        plate = node.plate
+        cond_code = node.get_cond_code(state_object=self.state_object) if self.lazy_branches else None
+        transformer = self._get_array_plates().get(node, None)
+        body = []
+        if transformer is not None:
+            body.append("{} = {}.arange({})".format(plate.index, self.numpy_name, plate.size))
+        if want_distribution is None or want_distribution(node):
+            code = self._get_distribution_code(node, flags)
+            body.append("dst_ = {}".format(transformer.transform(code) if transformer is not None else code))
+        code = code_for_vertex("{}[{}]".format(name, plate.index) if transformer is None else name, node)
+        for item in code if type(code) is list else [code]:
+            if cond_code is not None and item.startswith(cond_code):
+                item = item[len(cond_code):].replace('\n\t', '\n')
+            body.append(item)
+        if transformer is not None:
+            result = '\n'.join(body)
+        else:
+            result = "for {} in range({}):\n\t{}".format(plate.index, plate.size,
+                                                         '\n'.join(body).replace('\n', '\n\t'))
+            if code_for_plate is not None:
+                result = code_for_plate(name, node) + '\n' + result
+        if cond_code is not None:
+            inactive_code = code_for_inactive_vertex(name, node) if code_for_inactive_vertex is not None else None
+            result = self._gen_guarded_code(cond_code, None, result, inactive_code)
+        return result
+
+    def _gen_code(self, buffer: list, code_for_vertex, *, want_data_node: bool=True, flags=None,
+                  code_for_inactive_vertex=None, want_distribution=None, code_for_family=None,
+                  code_for_plate=None, want_guard=None):
+        """
+        With `lazy_branches`, the vertices on branches that are not taken are skipped altogether, including their
+        distributions. In this case, `code_for_inactive_vertex` might provide the code to run instead, and, if given,
+        `want_guard(node)` tells whether the vertex is to be skipped at all. If given, `want_distribution(node)` tells
+        whether the code for the vertex needs its distribution `dst_` at all.
+
+        If `code_for_family` is given, the members of the families of observed vertices (see `ppl_graph_vectorizer`)
+        are replaced by the code for the entire family, right after the last member.
+
+        The code for a vertex inside a plate is put into a loop, and `code_for_vertex` gets the value of a single
+        iteration as `name`. If given, `code_for_plate(name, node)` provides the code to run before the loop. With
+        `vectorize`, the loop is replaced by array-valued parameters wherever possible, and `name` is the value of the
+        entire plate.
+        """
+        families = {}
+        if code_for_family is not None:
+            for family in self._get_families():
+                for member in family.members:
+                    families[member] = family
         distribution = None
         state = self.state_object
         if self.bit_vector_name is not None:
@@ -224,16 +762,37 @@ class GraphCodeGenerator(object):
                 buffer.append("{}['{}'] = 0".format(state, self.bit_vector_name))
             else:
                 buffer.append("{} = 0".format(self.bit_vector_name))
+        if state is not None and any([isinstance(node, DataNode) for node in self.nodes]):
+            buffer.append("{}.update(self.constants)".format(state))
         for node in self.nodes:
             name = node.name
             if state is not None:
                 name = "{}['{}']".format(state, name)
-            if isinstance(node, Vertex):
-                if flags is not None:
-                    code = "dst_ = {}".format(node.get_code(**flags))
-                else:
-                    code = "dst_ = {}".format(node.get_code())
-                if code != distribution:
+            if isinstance(node, Vertex) and node in families:
+                family = families[node]
+                if node is family.last_member:
+                    code = code_for_family(family)
+                    buffer += code if type(code) is list else [code]
+                    distribution = None
+
+            elif isinstance(node, Vertex) and node.plate is not None:
+                buffer.append(self._gen_plate_code(name, node, code_for_vertex, flags, code_for_plate,
+                                                   code_for_inactive_vertex, want_distribution))
+                distribution = None
+
+            elif isinstance(node, Vertex):
+                code = "dst_ = {}".format(self._get_distribution_code(node, flags))
+                if want_distribution is not None and not want_distribution(node):
+                    code = None
+                cond_code = node.get_cond_code(state_object=state) \
+                    if self.lazy_branches and (want_guard is None or want_guard(node)) else None
+                if cond_code is not None:
+                    inactive_code = code_for_inactive_vertex(name, node) \
+                        if code_for_inactive_vertex is not None else None
+                    buffer.append(self._gen_guarded_code(cond_code, code, code_for_vertex(name, node), inactive_code))
+                    distribution = None
+                    continue
+                if code is not None and code != distribution:
                     buffer.append(code)
                     distribution = code
                 code = code_for_vertex(name, node)
@@ -248,49 +807,148 @@ class GraphCodeGenerator(object):
                 buffer.append(code)
                 buffer.append("{} |= {} if _c else 0".format(bit_vector, node.bit_index))
 
-            elif want_data_node or not isinstance(node, DataNode):
-                code = "{} = {}".format(name, node.get_code())
-                buffer.append(code)
+            elif isinstance(node, DataNode):
+                if state is None and want_data_node:
+                    buffer.append("{} = self.constants['{}']".format(name, node.name))
+
+            else:
+                code = node.get_code()
+                guard = self._get_guard(node) if self.lazy_branches and isinstance(node, ConditionNode) else None
+                if guard is not None:
+                    code = "{} and {}".format(guard, code)
+                buffer.append("{} = {}".format(name, code))
+
+    def _get_log_pdf_code(self, name: str, node: Vertex, distribution: str='dst_'):
+        # The log-pdf of a stacked vertex, or of all iterations of a plate, is the sum over the single log-pdfs
+        code = "{}.log_pdf({})".format(distribution, name)
+        if node.elements is not None or node in self._get_array_plates():
+            code = "{}.sum({})".format(self.numpy_name, code)
+        return code
 
     def gen_log_pdf(self):
         def code_for_vertex(name: str, node: Vertex):
             cond_code = node.get_cond_code(state_object=self.state_object)
             if cond_code is not None:
-                result = cond_code + "log_pdf = log_pdf + dst_.log_pdf({})".format(name)
+                result = cond_code + "log_pdf = log_pdf + {}".format(self._get_log_pdf_code(name, node))
             else:
-                result = "log_pdf = log_pdf + dst_.log_pdf({})".format(name)
+                result = "log_pdf = log_pdf + {}".format(self._get_log_pdf_code(name, node))
             if self.logpdf_suffix is not None:
                 result = result + self.logpdf_suffix
             return result
 
         logpdf_code = ["log_pdf = 0"]
-        self._gen_code(logpdf_code, code_for_vertex=code_for_vertex, want_data_node=False)
+        self._gen_code(logpdf_code, code_for_vertex=code_for_vertex, want_data_node=False,
+                       code_for_family=self._gen_family_code)
         logpdf_code.append("return log_pdf")
-        return 'state', '\n'.join(logpdf_code)
+        return 'state', self._use_local_variables('\n'.join(logpdf_code))
+
+    def _gen_family_code(self, family, flags=None):
+        # A single batched log-pdf for all members of the family, masking the members whose conditions do not hold
+        result = "dst_.log_pdf({})".format(family.observation)
+        if family.mask is not None:
+            mask = "{}.array([{}])".format(self.numpy_name, ', '.join([c if c is not None else 'True'
+                                                                       for c in family.mask]))
+            result = "{}.where({}, {}, 0.0)".format(self.numpy_name, mask, result)
+        return ["dst_ = {}".format(family.get_code(**(flags if flags is not None else {}))),
+                "log_pdf = log_pdf + {}.sum({})".format(self.numpy_name, result)]
+
+    def gen_log_pdf_terms(self):
+        """
+        The generated method `gen_log_pdf_terms(state)` returns the contributions of the individual vertices to the
+        log-pdf, in the order given by `get_vertex_index()`.  The contribution of a vertex, whose conditions do not
+        hold, is zero.
+        """
+        vertices = [node for node in self.nodes if isinstance(node, Vertex)]
+        index = { node: i for i, node in enumerate(vertices) }
+
+        def code_for_vertex(name: str, node: Vertex):
+            result = "terms[{}] {} {}".format(index[node], '+=' if node.plate is not None else '=',
+                                              self._get_log_pdf_code(name, node))
+            if self.logpdf_suffix is not None:
+                result = result + self.logpdf_suffix
+            cond_code = node.get_cond_code(state_object=self.state_object)
+            if cond_code is not None:
+                result = cond_code + result
+            return result
+
+        if self.numpy_name is not None:
+            logpdf_code = ["terms = {}.zeros({})".format(self.numpy_name, len(vertices))]
+        else:
+            logpdf_code = ["terms = [0.0] * {}".format(len(vertices))]
+        self._gen_code(logpdf_code, code_for_vertex=code_for_vertex, want_data_node=False)
+        logpdf_code.append("return terms")
+        return 'state', self._use_local_variables('\n'.join(logpdf_code))
+
+    def get_vertex_index(self):
+        vertices = [node for node in self.nodes if isinstance(node, Vertex)]
+        items = ["'{}': {}".format(node.name, i) for i, node in enumerate(vertices)]
+        return "return {{{}}}".format(', '.join(items))
+
+    def transform_state(self):
+        """
+        The generated method `transform_state(state, samples_only=False)` returns a copy of the state, where the
+        sampled vertices are named by their original names (as long as these are unique), and the values of stacked
+        vertices (see `ppl_graph_vectorizer`) are split up into their elements again.  With `samples_only`, the
+        result only contains the sampled values.
+        """
+        vertices = [node for node in self.nodes if isinstance(node, Vertex) and node.is_sampled]
+        all_vertices = [e for v in vertices for e in (v.elements if v.elements is not None else [v])]
+        counts = {}
+        for v in all_vertices:
+            counts[v.original_name] = counts.get(v.original_name, 0) + 1
+
+        def get_name(v: Vertex):
+            return v.original_name if v.original_name is not None and counts[v.original_name] == 1 else v.name
+
+        names = ["'{}': '{}'".format(v.name, get_name(v)) for v in vertices if v.elements is None]
+        elements = ["'{}': [{}]".format(v.name, ', '.join(["'{}'".format(get_name(e)) for e in v.elements]))
+                    for v in vertices if v.elements is not None]
+        code = "names = {{{}}}\n" \
+               "elements = {{{}}}\n" \
+               "result = {{}}\n" \
+               "for key in state:\n" \
+               "\tif key in elements:\n" \
+               "\t\tfor name, value in zip(elements[key], state[key]):\n" \
+               "\t\t\tresult[name] = value\n" \
+               "\telif key in names:\n" \
+               "\t\tresult[names[key]] = state[key]\n" \
+               "\telif not samples_only and not key.startswith('data_') and not key.startswith('__'):\n" \
+               "\t\tresult[key] = state[key]\n" \
+               "return result".format(', '.join(names), ', '.join(elements))
+        return 'state, samples_only: bool=False', code
+
+    def gen_log_pdf_grad(self):
+        return 'state', GradientCodeGenerator(self.nodes, self.state_object).generate()
 
     def gen_log_pdf_transformed(self):
         def code_for_vertex(name: str, node: Vertex):
             cond_code = node.get_cond_code(state_object=self.state_object)
             if cond_code is not None:
-                result = cond_code + "log_pdf = log_pdf + dst_.log_pdf({})".format(name)
+                result = cond_code + "log_pdf = log_pdf + {}".format(self._get_log_pdf_code(name, node))
             else:
-                result = "log_pdf = log_pdf + dst_.log_pdf({})".format(name)
+                result = "log_pdf = log_pdf + {}".format(self._get_log_pdf_code(name, node))
             if self.logpdf_suffix is not None:
                 result += self.logpdf_suffix
             return result
         # Note to self : To change suffix for torch or numpy look at line 87-88 in compiled imports (above)
         logpdf_code = ["log_pdf = 0"]
-        self._gen_code(logpdf_code, code_for_vertex=code_for_vertex, want_data_node=False, flags={'transformed': True})
+        if len(self._get_constant_distributions()) > 0:
+            # Unlike the distributions in `self.distributions`, we only build these when they are actually needed
+            logpdf_code.append("if self.transformed_distributions is None:\n"
+                               "\tself.transformed_distributions = {}".format(
+                               self._generate_distributions({'transformed': True}).replace('\n', '\n\t')))
+        self._gen_code(logpdf_code, code_for_vertex=code_for_vertex, want_data_node=False, flags={'transformed': True},
+                       code_for_family=lambda family: self._gen_family_code(family, {'transformed': True}))
         logpdf_code.append("return log_pdf.sum()")
-        return 'state', '\n'.join(logpdf_code)
+        return 'state', self._use_local_variables('\n'.join(logpdf_code))
 
     def gen_prior_samples(self):
 
         def code_for_vertex(name: str, node: Vertex):
             if node.has_observation:
-                return "{} = {}".format(name, node.observation)
+                return "{} = {}".format(name, self._get_observation_code(node))
             sample_size = node.sample_size
-            if sample_size is not None and sample_size > 1:
+            if sample_size is not None and sample_size > 1 and node.elements is None:
                 return "{} = dst_.sample(sample_size={})".format(name, sample_size)
             else:
                 return "{} = dst_.sample()".format(name)
@@ -299,10 +957,417 @@ class GraphCodeGenerator(object):
         sample_code = []
         if state is not None:
             sample_code.append(state + " = {}")
-        self._gen_code(sample_code, code_for_vertex=code_for_vertex, want_data_node=True)
+        if self.lazy_branches:
+            # The distributions of observed vertices are not needed to sample from the prior. Observations that do
+            # not depend on the state are always set, as the branch might be taken later on (see `gen_log_pdf_delta`)
+            def want_guard(node: Vertex):
+                return not node.has_observation or \
+                       (state is not None and "{}[".format(state) in str(node.observation))
+
+            self._gen_code(sample_code, code_for_vertex=code_for_vertex, want_data_node=True,
+                           code_for_inactive_vertex=lambda name, _: "{} = None".format(name),
+                           want_distribution=lambda node: not node.has_observation,
+                           code_for_plate=self._gen_plate_list, want_guard=want_guard)
+        else:
+            self._gen_code(sample_code, code_for_vertex=code_for_vertex, want_data_node=True,
+                           code_for_plate=self._gen_plate_list)
         if state is not None:
             sample_code.append("return " + state)
-        return '\n'.join(sample_code)
+        return self._use_local_variables('\n'.join(sample_code), write_back='all')
+
+    @staticmethod
+    def _gen_plate_list(name: str, node: Vertex):
+        # The list that takes the values of all iterations of the plate
+        return "{} = [None] * {}".format(name, node.plate.size)
+
+    def _get_batch_transformer(self):
+        # Batches need the values in a state, and NumPy to work on them
+        if self.state_object is None or self.numpy_name is None:
+            raise ValueError("batches need a state-object and NumPy")
+        vectors = { node.name for node in self.nodes
+                    if isinstance(node, Vertex) and (self._is_flat_vector(node) or node.elements is not None) }
+        data = { node.name for node in self.nodes if isinstance(node, DataNode) }
+        arrays = { node.name for node in self.nodes
+                   if isinstance(node, DataNode) and self._is_numeric_data(node.get_code()) }
+        return _BatchTransformer(self.state_object, self.numpy_name, vectors, arrays, data)
+
+    def _get_batch_mask(self, node: Vertex):
+        # The particles for which all conditions of the vertex hold, or `None` if the vertex has no conditions
+        if not node.has_conditions:
+            return None
+        result = None
+        for cond, truth_value in sorted(node.conditions, key=lambda c: (c[0].name, c[1])):
+            item = "{}['{}']".format(self.state_object, cond.name)
+            if not truth_value:
+                item = "{}.logical_not({})".format(self.numpy_name, item)
+            result = item if result is None else "{}.logical_and({}, {})".format(self.numpy_name, result, item)
+        return result
+
+    def _gen_batch_code(self, buffer: list, code_for_vertex, code_for_plate=None):
+        """
+        Unlike `_gen_code`, there are no branches in a batch: all vertices are evaluated for all particles, and
+        `code_for_vertex(name, node, transformer)` uses `_get_batch_mask` to pick the particles for which the vertex
+        is actually part of the model.  As in `_gen_code`, the code for a vertex inside a plate is put into a loop,
+        after the code given by `code_for_plate(name, node)`.
+        """
+        transformer = self._get_batch_transformer()
+        state = self.state_object
+        if any([isinstance(node, DataNode) for node in self.nodes]):
+            buffer.append("{}.update(self.constants)".format(state))
+        distribution = None
+        for node in self.nodes:
+            name = "{}['{}']".format(state, node.name)
+            if isinstance(node, Vertex) and node.plate is not None:
+                plate = node.plate
+                body = ["dst_ = {}".format(transformer.transform(self._get_distribution_code(node))),
+                        code_for_vertex("{}[{}]".format(name, plate.index), node, transformer)]
+                if code_for_plate is not None:
+                    buffer.append(code_for_plate(name, node))
+                buffer.append("for {} in range({}):\n\t{}".format(plate.index, plate.size,
+                                                                 '\n'.join(body).replace('\n', '\n\t')))
+                distribution = None
+            elif isinstance(node, Vertex):
+                code = "dst_ = {}".format(transformer.transform(self._get_distribution_code(node)))
+                if code != distribution:
+                    buffer.append(code)
+                    distribution = code
+                buffer.append(code_for_vertex(name, node, transformer))
+            elif not isinstance(node, DataNode):
+                buffer.append("{} = {}".format(name, transformer.transform(node.get_code())))
+
+    def _gen_batch_method(self, code_for_body):
+        # Like the flat vector, a batch might not be possible for all models
+        try:
+            return code_for_body()
+        except ValueError as e:
+            return "raise NotImplementedError({})".format(repr("no batches for this model: " + str(e)))
+
+    def _get_batch_size_code(self, states: str):
+        # The number of particles is given by the values of the sampled vertices, or recorded in the state
+        names = [node.name for node in self.nodes if isinstance(node, Vertex) and node.is_sampled]
+        if len(names) > 0:
+            return "len({}['{}'])".format(states, names[0])
+        return "{}['__batch_size__']".format(states)
+
+    def gen_prior_samples_batch(self):
+        """
+        The generated method samples `n` particles at once: each sampled value in the returned state has a leading
+        particle dimension. Vertices whose distribution does not depend on other vertices draw `n` samples, all other
+        distributions are evaluated with the (batched) values of their parents and draw one sample per particle.
+
+        Conditionals do not branch: all vertices are sampled for all particles, and the values of vertices in
+        branches that a particle does not take are simply ignored by `gen_log_pdf_batch`. If the model cannot be
+        batched (say, it indexes a list of lists by a random value), the method raises a `NotImplementedError`.
+        """
+        def code_for_vertex(name: str, node: Vertex, transformer):
+            if node.has_observation:
+                return "{} = {}".format(name, transformer.transform(node.observation))
+            sample_size = node.sample_size if node.elements is None else None
+            random = any([isinstance(a, Vertex) for a in node.ancestors])
+            if sample_size is not None and sample_size > 1:
+                if random:
+                    return "{} = {}.moveaxis(dst_.sample(sample_size={}), 0, 1)".format(
+                        name, self.numpy_name, sample_size)
+                return "{} = {}.stack([dst_.sample(sample_size={}) for _ in range(n)])".format(
+                    name, self.numpy_name, sample_size)
+            elif random:
+                return "{} = dst_.sample()".format(name)
+            else:
+                return "{} = dst_.sample(sample_size=n)".format(name)
+
+        def code_for_body():
+            state = self.state_object
+            sample_code = [state + " = {'__batch_size__': n}"]
+            self._gen_batch_code(sample_code, code_for_vertex, code_for_plate=self._gen_plate_list)
+            sample_code.append("return " + state)
+            return '\n'.join(sample_code)
+
+        return 'n', self._gen_batch_method(code_for_body)
+
+    def gen_log_pdf_batch(self):
+        """
+        The generated method computes the log-pdf of all particles in a batched state (as returned by
+        `gen_prior_samples_batch`) at once, and returns an array with one log-pdf per particle. The log-pdf of a vertex
+        only counts for the particles that satisfy its conditions.
+        """
+        def code_for_vertex(name: str, node: Vertex, _):
+            # Batches evaluate the plates in a loop, one iteration at a time
+            result = "dst_.log_pdf({})".format(name) if node.plate is not None else self._get_log_pdf_code(name, node)
+            if node.elements is not None or (node.sample_size is not None and node.sample_size > 1):
+                result = "{}.sum(dst_.log_pdf({}), axis=-1)".format(self.numpy_name, name)
+            mask = self._get_batch_mask(node)
+            if mask is not None:
+                result = "{}.where({}, {}, 0.0)".format(self.numpy_name, mask, result)
+            result = "log_pdf = log_pdf + {}".format(result)
+            if self.logpdf_suffix is not None:
+                result = result + self.logpdf_suffix
+            if mask is not None:
+                # The parameters might be invalid for the particles that do not take the branch
+                result = "with {}.errstate(all='ignore'):\n\t{}".format(self.numpy_name, result)
+            return result
+
+        def code_for_body():
+            state = self.state_object
+            logpdf_code = ["{} = dict(states)".format(state),
+                           "log_pdf = {}.zeros({})".format(self.numpy_name, self._get_batch_size_code('states'))]
+            self._gen_batch_code(logpdf_code, code_for_vertex)
+            logpdf_code.append("return log_pdf")
+            return '\n'.join(logpdf_code)
+
+        return 'states', self._gen_batch_method(code_for_body)
+
+    def _get_data_length(self, code: str):
+        # The length of a list, given either as a literal (with arbitrary entries), or by a data node or a vertex
+        try:
+            node = ast.parse(code, mode='eval').body
+        except SyntaxError:
+            return None
+        if isinstance(node, (ast.List, ast.Tuple)):
+            return len(node.elts)
+        if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Constant):
+            for item in self.nodes:
+                if item.name == node.slice.value and isinstance(item, DataNode):
+                    try:
+                        return len(ast.literal_eval(item.get_code()))
+                    except (ValueError, SyntaxError, TypeError):
+                        return None
+                elif item.name == node.slice.value and isinstance(item, Vertex):
+                    return self._get_flat_size(item)
+        return None
+
+    def _get_flat_size(self, vertex: Vertex):
+        # The number of entries a sampled vertex takes up in the flat vector, or `None` if we cannot tell. The values
+        # of vector-valued distributions (such as the Dirichlet-distribution) have the length of their first parameter
+        size = vertex.sample_size if vertex.sample_size is not None and vertex.sample_size > 1 else 1
+        distr = distributions.get_distribution_for_name(vertex.distribution_name)
+        if distr is not None and distr._vector_sample and vertex.elements is None:
+            length = self._get_data_length(vertex.distribution_args[0]) if vertex.distribution_args else None
+            if length is None:
+                return None
+            size *= length
+        return size
+
+    def _get_flat_layout(self):
+        # The sampled vertices in the order of the flat vector: all continuous variables come first, followed by
+        # the discrete ones. Returns a list of tuples `(vertex, start, stop)` and the start of the discrete part.
+        if self._flat_layout is None:
+            vertices = [node for node in self.nodes if isinstance(node, Vertex) and node.is_sampled]
+            vertices = [v for v in vertices if not v.is_discrete] + [v for v in vertices if v.is_discrete]
+            result = []
+            index = 0
+            disc_start = None
+            for v in vertices:
+                if v.is_discrete and disc_start is None:
+                    disc_start = index
+                size = self._get_flat_size(v)
+                if size is None:
+                    raise ValueError("the size of the vertex '{}' is unknown".format(v.name))
+                result.append((v, index, index + size))
+                index += size
+            self._flat_layout = result, disc_start if disc_start is not None else index
+        return self._flat_layout
+
+    def _is_flat_vector(self, vertex: Vertex):
+        distr = distributions.get_distribution_for_name(vertex.distribution_name)
+        return (vertex.sample_size is not None and vertex.sample_size > 1) or \
+               (distr is not None and distr._vector_sample)
+
+    def _get_flat_item(self, vertex: Vertex, start: int, stop: int, vector: str):
+        # The values of discrete vertices are integers again, so that they can be used as indices
+        if not self._is_flat_vector(vertex):
+            if vertex.is_discrete:
+                return "int({}[{}])".format(vector, start)
+            return "{}[{}]".format(vector, start)
+        result = "{}[{}:{}]".format(vector, start, stop)
+        if vertex.is_discrete and self.numpy_name is not None:
+            result = "{}.asarray({}, dtype=int)".format(self.numpy_name, result)
+        distr = distributions.get_distribution_for_name(vertex.distribution_name)
+        if distr is not None and distr._vector_sample and vertex.sample_size is not None and \
+                vertex.sample_size > 1 and self.numpy_name is not None:
+            result = "{}.reshape({}.asarray({}), ({}, -1))".format(self.numpy_name, self.numpy_name, result,
+                                                                    vertex.sample_size)
+        return result
+
+    def _gen_flat_code(self, code_for_layout):
+        # The flat vector needs the size of each vertex, which is not always known
+        try:
+            return code_for_layout(*self._get_flat_layout())
+        except ValueError as e:
+            return "raise NotImplementedError({})".format(repr("no flat layout for this model: " + str(e)))
+
+    def get_flat_index(self):
+        def code_for_layout(layout, _):
+            items = ["'{}': slice({}, {})".format(v.name, start, stop) for v, start, stop in layout]
+            return "return {{{}}}".format(', '.join(items))
+        return self._gen_flat_code(code_for_layout)
+
+    def get_flat_cont_slice(self):
+        return self._gen_flat_code(lambda _, disc_start: "return slice(0, {})".format(disc_start))
+
+    def get_flat_disc_slice(self):
+        def code_for_layout(layout, disc_start):
+            return "return slice({}, {})".format(disc_start, layout[-1][2] if len(layout) > 0 else 0)
+        return self._gen_flat_code(code_for_layout)
+
+    def pack(self):
+        def code_for_layout(layout, _):
+            items = []
+            for v, _, _ in layout:
+                if self._is_flat_vector(v) and self.numpy_name is not None:
+                    items.append("*{}.ravel(state['{}'])".format(self.numpy_name, v.name))
+                elif self._is_flat_vector(v):
+                    items.append("*state['{}']".format(v.name))
+                else:
+                    items.append("state['{}']".format(v.name))
+            if self.numpy_name is not None:
+                return "return {}.asarray([{}], dtype=float)".format(self.numpy_name, ', '.join(items))
+            else:
+                return "return [{}]".format(', '.join(items))
+        return 'state', self._gen_flat_code(code_for_layout)
+
+    def unpack(self):
+        def code_for_layout(layout, _):
+            items = ["'{}': {}".format(v.name, self._get_flat_item(v, start, stop, 'theta'))
+                     for v, start, stop in layout]
+            return "return {{{}}}".format(', '.join(items))
+        return 'theta', self._gen_flat_code(code_for_layout)
+
+    def gen_log_pdf_flat(self):
+        def code_for_vertex(name: str, node: Vertex):
+            result = "log_pdf = log_pdf + {}".format(self._get_log_pdf_code(name, node))
+            if self.logpdf_suffix is not None:
+                result = result + self.logpdf_suffix
+            cond_code = node.get_cond_code(state_object=self.state_object)
+            if cond_code is not None:
+                result = cond_code + result
+            if node.has_observation:
+                return ["{} = {}".format(name, self._get_observation_code(node)), result]
+            else:
+                return result
+
+        def code_for_layout(layout, _):
+            items = ["'{}': {}".format(v.name, self._get_flat_item(v, start, stop, 'theta'))
+                     for v, start, stop in layout]
+            logpdf_code = ["{} = {{{}}}".format(self.state_object, ', '.join(items)), "log_pdf = 0"]
+            self._gen_code(logpdf_code, code_for_vertex=code_for_vertex, want_data_node=False,
+                           code_for_plate=self._gen_plate_list)
+            logpdf_code.append("return log_pdf")
+            return '\n'.join(logpdf_code)
+
+        return 'theta', self._gen_flat_code(code_for_layout)
+
+    def _generate_helper_methods(self):
+        # The factors of the vertices and their updates, as used by `gen_log_pdf_delta`
+        result = []
+        if 'delta' not in self.extra_methods:
+            return result
+        for node in self.nodes:
+            if isinstance(node, Vertex):
+                result.append(self._generate_factor(node))
+                result.append(self._generate_factor_update(node))
+        return result
+
+    def _generate_factor(self, node: Vertex):
+        # The factor of a single vertex, i.e. its contribution to the log-pdf
+        name = "{}['{}']".format(self.state_object, node.name)
+        transformer = self._get_array_plates().get(node, None)
+        if transformer is not None:
+            code = "{} = {}.arange({})\nreturn {}".format(
+                node.plate.index, self.numpy_name, node.plate.size,
+                self._get_log_pdf_code(name, node, transformer.transform(self._get_distribution_code(node))))
+        elif node.plate is not None:
+            code = "return sum([{} for {} in range({})])".format(
+                self._get_log_pdf_code("{}[{}]".format(name, node.plate.index), node, self._get_distribution_code(node)),
+                node.plate.index, node.plate.size)
+        else:
+            code = "return {}{}".format(self._get_log_pdf_code(name, node, self._get_distribution_code(node)),
+                                        self.logpdf_suffix if self.logpdf_suffix is not None else '')
+        cond_code = node.get_cond_code(state_object=self.state_object)
+        if cond_code is not None:
+            code = cond_code + code.replace("\n", "\n\t") + "\nreturn 0.0"
+            if self.lazy_branches and node.plate is None:
+                # The vertex has no value if its branch was skipped when the state was sampled
+                code = "if {} is None:\n\treturn 0.0\n".format(name) + code
+        return "_factor_{}".format(node.name), 'state', code
+
+    def _get_dependents(self):
+        # Maps each node to its position and to the nodes that directly depend on it, either as an ancestor, or, for
+        # conditions, because the node is only evaluated if the condition holds
+        if self._dependents is None:
+            dependents = { node: (i, set()) for i, node in enumerate(self.nodes) }
+            for node in self.nodes:
+                for a in node.ancestors:
+                    if a in dependents:
+                        dependents[a][1].add(node)
+                if isinstance(node, Vertex) and node.conditions is not None:
+                    for c, _ in node.conditions:
+                        if c in dependents:
+                            dependents[c][1].add(node)
+            self._dependents = dependents
+        return self._dependents
+
+    def _generate_factor_update(self, node: Vertex):
+        # After `node` has changed, we re-evaluate the conditions that depend on it (through other conditions, but
+        # not through other vertices), and then all factors that might have changed, writing them to `factors`
+        dependents = self._get_dependents()
+        changed = { node }
+        stack = [node]
+        while len(stack) > 0:
+            for item in dependents[stack.pop()][1]:
+                if item not in changed:
+                    changed.add(item)
+                    if isinstance(item, ConditionNode):
+                        stack.append(item)
+        changed = sorted(changed, key=lambda item: dependents[item][0])
+        state = self.state_object
+        code = []
+        for item in changed:
+            if isinstance(item, ConditionNode):
+                code.append("{}['{}'] = {}".format(state, item.name, item.get_code()))
+        for item in changed:
+            if isinstance(item, Vertex):
+                code.append("factors['{}'] = self._factor_{}({})".format(item.name, item.name, state))
+        return "_update_{}".format(node.name), 'state, factors', '\n'.join(code)
+
+    def gen_log_pdf_factors(self):
+        state = self.state_object
+        code = ["factors = {}"]
+        if any([isinstance(node, DataNode) for node in self.nodes]):
+            code.append("{}.update(self.constants)".format(state))
+        for node in self.nodes:
+            if isinstance(node, ConditionNode):
+                code.append("{}['{}'] = {}".format(state, node.name, node.get_code()))
+            elif isinstance(node, Vertex):
+                code.append("factors['{}'] = self._factor_{}({})".format(node.name, node.name, state))
+        code.append("return factors")
+        return 'state', '\n'.join(code)
+
+    def gen_log_pdf_delta(self):
+        """
+        The generated method `gen_log_pdf_delta(state, changed_vertices)` returns the log-pdf of the state, after the
+        vertices in `changed_vertices` (given by their names) have been changed.  The factors of all vertices are
+        cached in the state itself: the first call computes all factors, while subsequent calls only re-compute the
+        factors that depend on the changed vertices.
+
+        The cache is copied on write: the updated factors are stored in a new dictionary, so that a proposal can be
+        evaluated on a (shallow) copy of the state, say, `dict(state)`, and rejected by simply keeping the original
+        state.  The log-pdf is the sum of the factors, rather than accumulated over the changes, so that rounding
+        errors do not build up.
+        """
+        state = self.state_object
+        code = "factors = {s}.get('__factors__', None)\n" \
+               "if factors is None:\n" \
+               "\tfactors = self.gen_log_pdf_factors({s})\n" \
+               "elif len(changed_vertices) > 0:\n" \
+               "\tfactors = dict(factors)\n" \
+               "\tfor v in changed_vertices:\n" \
+               "\t\tgetattr(self, '_update_' + (v if type(v) is str else v.name))({s}, factors)\n" \
+               "else:\n" \
+               "\treturn {s}['__log_pdf__']\n" \
+               "{s}['__factors__'] = factors\n" \
+               "{s}['__log_pdf__'] = sum(factors.values())\n" \
+               "return {s}['__log_pdf__']".format(s=state)
+        return 'state, changed_vertices', code
 
     def gen_cond_bit_vector(self):
         code = "result = 0\n" \
@@ -29,7 +29,7 @@ class _ConditionCollector(Visitor):
 
 class GraphFactory(object):
 
-    def __init__(self, code_generator=None):
+    def __init__(self, code_generator=None, hash_cons=None):
         if code_generator is None:
             code_generator = CodeGenerator()
             code_generator.state_object = 'state'
@@ -38,6 +38,21 @@ class GraphFactory(object):
         self.code_generator = code_generator
         self.cond_nodes_map = {}
         self.data_nodes_cache = {}
+        # With a `HashConsTable`, condition and data nodes are first looked up by the identity of their interned AST,
+        # so that we only need to generate code for new ones.
+        self.hash_cons = hash_cons
+        self._interned_nodes_map = {}
+
+    def _lookup_interned(self, node: AstNode):
+        if self.hash_cons is not None:
+            node = self.hash_cons.intern_tree(node)
+            return node, self._interned_nodes_map.get(id(node), None)
+        else:
+            return node, None
+
+    def _register_interned(self, node: AstNode, result):
+        if self.hash_cons is not None:
+            self._interned_nodes_map[id(node)] = result
 
     def _generate_code_for_node(self, node: AstNode):
         return self.code_generator.visit(node)
@@ -52,8 +67,12 @@ class GraphFactory(object):
 
     def create_condition_node(self, test: AstNode, parents: set):
         name = self.generate_symbol('cond_')
+        test, result = self._lookup_interned(test)
+        if result is not None:
+            return result
         code = self._generate_code_for_node(test)
         if code in self.cond_nodes_map:
+            self._register_interned(test, self.cond_nodes_map[code])
             return self.cond_nodes_map[code]
         if isinstance(test, AstCompare) and is_zero(test.right) and test.second_right is None:
             result = ConditionNode(name, ancestors=parents, condition=code,
@@ -66,21 +85,28 @@ class GraphFactory(object):
             result = ConditionNode(name, ancestors=parents, condition=code)
         self.nodes.append(result)
         self.cond_nodes_map[code] = result
+        self._register_interned(test, result)
         return result
 
     def create_data_node(self, data: AstNode, parents: Optional[set]=None):
         if parents is None:
             parents = set()
+        data, result = self._lookup_interned(data)
+        if result is not None:
+            return result
         code = self._generate_code_for_node(data)
         if code in self.data_nodes_cache:
+            self._register_interned(data, self.data_nodes_cache[code])
             return self.data_nodes_cache[code]
         name = self.generate_symbol('data_')
         result = DataNode(name, ancestors=parents, data=code)
         self.nodes.append(result)
         self.data_nodes_cache[code] = result
+        self._register_interned(data, result)
         return result
 
-    def create_observe_node(self, dist: AstNode, value: AstNode, parents: set, conditions: set):
+    def create_observe_node(self, dist: AstNode, value: AstNode, parents: set, conditions: set,
+                            plate: Optional[Plate]=None):
         arg_names = None
         if isinstance(dist, AstCall):
             func = dist.function_name
@@ -106,10 +132,13 @@ class GraphFactory(object):
                         distribution_transform=trans, distribution_arg_names=arg_names,
                         observation=v_code,
                         observation_value=obs_value, conditions=conditions,
-                        condition_nodes=cc.cond_nodes if len(cc.cond_nodes) > 0 else None)
+                        condition_nodes=cc.cond_nodes if len(cc.cond_nodes) > 0 else None, plate=plate)
         self.nodes.append(result)
         return result
 
+    def create_plate(self, size: int):
+        return Plate(self.generate_symbol('i'), size)
+
     def create_sample_node(self, dist: AstNode, size: int, parents: set, original_name: Optional[str]=None):
         arg_names = None
         if isinstance(dist, AstCall):
@@ -135,9 +164,12 @@ class GraphFactory(object):
         return result
 
     def generate_code(self, *, class_name: Optional[str] = None, imports: Optional[str]=None,
-                      base_class: Optional[str]=None):
+                      base_class: Optional[str]=None, local_variables: bool=False, lazy_branches: bool=False,
+                      vectorize: bool=False, extra_methods: tuple=()):
         code_gen = GraphCodeGenerator(self.nodes, self.code_generator.state_object,
-                                      imports=imports if imports is not None else '')
+                                      imports=imports if imports is not None else '',
+                                      local_variables=local_variables, lazy_branches=lazy_branches,
+                                      vectorize=vectorize, extra_methods=extra_methods)
         return code_gen.generate_model_code(class_name=class_name, base_class=base_class)
 
 
@@ -9,6 +9,7 @@
 from ..ppl_ast import *
 from ..graphs import *
 from .ppl_graph_factory import GraphFactory
+from .ppl_graph_vectorizer import stack_sample_families, replace_stacked_nodes
 
 
 class ConditionScope(object):
@@ -46,6 +47,7 @@ class GraphGenerator(ScopedVisitor):
         self.factory = factory
         self.nodes = []
         self.conditions = None  # type: ConditionScope
+        self.plate = None
         self.imports = set()
 
     def enter_condition(self, condition):
@@ -75,7 +77,7 @@ class GraphGenerator(ScopedVisitor):
         for key in items.keys():
             item, parent = self.visit(items[key])
             result[key] = item
-            parents = set.union(parents, parent)
+            parents.update(parent)
         return result, parents
 
     def _visit_items(self, items):
@@ -85,7 +87,7 @@ class GraphGenerator(ScopedVisitor):
             if _item is not None:
                 item, parent = _item
                 result.append(item)
-                parents = set.union(parents, parent)
+                parents.update(parent)
             else:
                 result.append(None)
         return result, parents
@@ -157,13 +159,39 @@ class GraphGenerator(ScopedVisitor):
         items, parents = self._visit_dict(node.items)
         return AstDict(items), parents
 
+    def _visit_plate(self, target: str, source: AstValueVector, body: AstNode):
+        # The simplifier only leaves loops over data, whose iterations are independent, in place: the vertices in
+        # the body are created once, and refer to the loop variable of the plate
+        if self.plate is not None:
+            raise RuntimeError("cannot nest plates")
+        plate = self.factory.create_plate(len(source))
+        index = AstSymbol(plate.index, predef=True)
+        if list(source.items) == list(range(len(source))):
+            value = index
+        else:
+            data, _ = self.visit(source)
+            value = makeSubscript(data, index)
+        with self.create_scope():
+            self.define(target, (value, set()))
+            self.plate = plate
+            try:
+                result, parents = self.visit(body)
+            finally:
+                self.plate = None
+        return result, parents
+
     def visit_for(self, node: AstFor):
+        if isinstance(node.source, AstValueVector) and len(node.source) > 0:
+            _, parents = self._visit_plate(node.target, node.source, node.body)
+            return AstValue(None), parents
         source, s_parents = self.visit(node.source)
         body, b_parents = self.visit(node.body)
         parents = set.union(s_parents, b_parents)
         return AstFor(node.target, source, body), parents
 
     def visit_if(self, node: AstIf):
+        if self.plate is not None:
+            raise RuntimeError("cannot branch inside a plate")
         test, parents = self.visit(node.test)
         cond_node = self.factory.create_condition_node(test, parents)
         if cond_node is not None:
@@ -189,6 +217,8 @@ class GraphGenerator(ScopedVisitor):
         return self.visit(node.body)
 
     def visit_list_for(self, node: AstListFor):
+        if isinstance(node.source, AstValueVector) and len(node.source) > 0 and node.test is None:
+            return self._visit_plate(node.target, node.source, node.expr)
         source, s_parents = self.visit(node.source)
         expr, e_parents = self.visit(node.expr)
         parents = set.union(s_parents, e_parents)
@@ -208,11 +238,13 @@ class GraphGenerator(ScopedVisitor):
         dist, d_parents = self.visit(node.dist)
         value, v_parents = self.visit(node.value)
         parents = set.union(d_parents, v_parents)
-        node = self.factory.create_observe_node(dist, value, parents, self.get_current_conditions())
+        node = self.factory.create_observe_node(dist, value, parents, self.get_current_conditions(), plate=self.plate)
         self.nodes.append(node)
         return AstSymbol(node.name, node=node), set()
 
     def visit_sample(self, node: AstSample):
+        if self.plate is not None:
+            raise RuntimeError("cannot sample inside a plate")
         dist, d_parents = self.visit(node.dist)
         if node.size is not None:
             size, s_parents = self.visit(node.size)
@@ -281,9 +313,20 @@ class GraphGenerator(ScopedVisitor):
         result = makeVector(items)
         return result, parents
 
+    def stack_sample_families(self):
+        # Replaces families of independent samples with the same distribution by array-valued vertices
+        stacked = stack_sample_families(self.factory.nodes, self.factory.code_generator.state_object)
+        if len(stacked) > 0:
+            self.nodes = replace_stacked_nodes(self.nodes, stacked)
+            self.factory.nodes = replace_stacked_nodes(self.factory.nodes, stacked)
+
     def generate_code(self, imports: Optional[str]=None, *,
                       base_class: Optional[str]=None,
-                      class_name: Optional[str]=None):
+                      class_name: Optional[str]=None,
+                      local_variables: bool=False,
+                      lazy_branches: bool=False,
+                      vectorize: bool=False,
+                      extra_methods: tuple=()):
         if len(self.imports) > 0:
             _imports = '\n'.join(['import {}'.format(item) for item in self.imports])
             if imports is not None:
@@ -293,9 +336,15 @@ class GraphGenerator(ScopedVisitor):
         else:
             _imports = ''
         return self.factory.generate_code(class_name=class_name, imports=_imports,
-                                          base_class=base_class)
-
-    def generate_model(self, imports: Optional[str]=None, base_class: Optional[str]=None, class_name: str='Model'):
+                                          base_class=base_class, local_variables=local_variables,
+                                          lazy_branches=lazy_branches, vectorize=vectorize,
+                                          extra_methods=extra_methods)
+
+    def generate_model(self, imports: Optional[str]=None, base_class: Optional[str]=None, class_name: str='Model',
+                       profiler=None, local_variables: bool=False, lazy_branches: bool=False,
+                       vectorize: bool=False, extra_methods: tuple=()):
+        if vectorize:
+            self.stack_sample_families()
         vertices = set()
         arcs = set()
         data = set()
@@ -310,10 +359,22 @@ class GraphGenerator(ScopedVisitor):
             elif isinstance(node, ConditionNode):
                 conditionals.add(node)
 
-        code = self.generate_code(imports=imports, base_class=base_class, class_name=class_name)
         c_globals = {}
-        exec(code, c_globals)
+        if profiler is not None:
+            code = profiler.run_function('code_generator', self.generate_code, imports=imports, base_class=base_class,
+                                         class_name=class_name, local_variables=local_variables,
+                                         lazy_branches=lazy_branches, vectorize=vectorize,
+                                         extra_methods=extra_methods)
+            profiler.run_function('exec', exec, code, c_globals)
+        else:
+            code = self.generate_code(imports=imports, base_class=base_class, class_name=class_name,
+                                      local_variables=local_variables, lazy_branches=lazy_branches,
+                                      vectorize=vectorize, extra_methods=extra_methods)
+            exec(code, c_globals)
         Model = c_globals[class_name]
         result = Model(vertices, arcs, data, conditionals)
         result.code = code
+        result.reachability = ReachabilityIndex(self.nodes).attach()
+        if 'markov_blanket' in extra_methods:
+            result.markov_blanket = MarkovBlanketIndex([node for node in self.nodes if isinstance(node, Vertex)])
         return result
@@ -0,0 +1,343 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import ast
+import importlib
+import re
+from ..graphs import *
+from .. import distributions
+from .ppl_gradient_codegen import _to_source, _Unsupported
+
+
+# The distributions, whose parameters are vectors themselves, cannot be stacked along a new axis
+_VECTOR_PARAMETERS = { 'Categorical', 'Discrete', 'Multinomial' }
+
+
+class ObserveFamily(object):
+    """
+    A family of observed vertices, which all have the same distribution and only differ in the values of their
+    parameters and observations. This is, e.g., the case for observations on i.i.d. data inside an unrolled loop.
+
+    The family evaluates a single distribution, whose parameters are arrays with one entry per member, in place of the
+    distributions of all its members. The parameters (and the observed value) are given as templates, where
+    everything that differs between the members has been replaced by a slot: the slots that only depend on
+    literals and data nodes are `constant_slots` (their arrays are built once when the model is created), while the
+    values of the `runtime_slots` are stacked up each time the log-pdf is computed. If any member has conditions,
+    `mask` lists the condition code for each member (`None` for members without conditions).
+    """
+
+    def __init__(self, name: str, members: list):
+        self.name = name
+        self.members = members
+        self.distribution_func = members[0].distribution_func
+        self.arg_names = members[0].distribution_arg_names
+        self.args = None
+        self.observation = None
+        self.constant_slots = []
+        self.runtime_slots = []
+        self.mask = None
+
+    def __len__(self):
+        return len(self.members)
+
+    @property
+    def last_member(self):
+        return self.members[-1]
+
+    def get_code(self, **flags):
+        if self.arg_names is not None:
+            args = ["{}={}".format(n, a) for n, a in zip(self.arg_names, self.args)]
+        else:
+            args = list(self.args)
+        for key in flags:
+            args.append("{}={}".format(key, flags[key]))
+        return "{}({})".format(self.distribution_func, ', '.join(args))
+
+
+class _FamilyBuilder(object):
+
+    def __init__(self, family: ObserveFamily, state_object: str, data_names: set, numpy_name: str):
+        self.family = family
+        self.state_object = state_object
+        self.data_names = data_names
+        self.numpy_name = numpy_name
+
+    def _is_state(self, node):
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == self.state_object:
+            s = node.slice
+            s = s.value if s.__class__.__name__ == 'Index' else s
+            if hasattr(ast, 'Constant') and isinstance(s, ast.Constant):
+                return s.value
+            elif s.__class__.__name__ == 'Str':
+                return s.s
+            return ''
+        return None
+
+    def _is_constant(self, node):
+        # A subtree is constant if it depends on no other values in the state than data nodes
+        for item in ast.walk(node):
+            name = self._is_state(item)
+            if name is not None and name not in self.data_names:
+                return False
+        return True
+
+    def _to_constant_source(self, node):
+        code = _to_source(node)
+        for name in self.data_names:
+            code = code.replace("{}[{!r}]".format(self.state_object, name), "self.constants[{!r}]".format(name))
+        return code
+
+    def _add_slot(self, trees: list):
+        if all([self._is_constant(tree) for tree in trees]):
+            key = "{}_{}".format(self.family.name, len(self.family.constant_slots))
+            codes = [self._to_constant_source(tree) for tree in trees]
+            self.family.constant_slots.append((key, codes))
+            return "self.vectors[{!r}]".format(key)
+        else:
+            codes = [_to_source(tree) for tree in trees]
+            self.family.runtime_slots.append(codes)
+            return "{}.array([{}])".format(self.numpy_name, ', '.join(codes))
+
+    def merge(self, trees: list):
+        """
+        Returns the template for the given ASTs (one per member of the family), where the slots are names holding
+        the code for the respective array.
+        """
+        first = trees[0]
+        first_dump = ast.dump(first)
+        if all([ast.dump(tree) == first_dump for tree in trees[1:]]):
+            return first
+        is_expr = isinstance(first, ast.expr)
+        if is_expr and (self._is_state(first) is not None or self._is_constant(first) or
+                        not all([self._same_shape(first, tree) for tree in trees])):
+            return ast.Name(id=self._add_slot(trees), ctx=ast.Load())
+        if not all([self._same_shape(first, tree) for tree in trees]):
+            raise _Unsupported("cannot merge '{}'".format(first.__class__.__name__))
+        result = type(first)()
+        for name, value in ast.iter_fields(first):
+            if isinstance(value, list):
+                setattr(result, name, [self.merge([getattr(tree, name)[i] for tree in trees])
+                                       if isinstance(item, ast.AST) else item for i, item in enumerate(value)])
+            elif isinstance(value, ast.AST) and name != 'ctx':
+                setattr(result, name, self.merge([getattr(tree, name) for tree in trees]))
+            else:
+                setattr(result, name, value)
+        if isinstance(result, ast.Subscript) and not all([ast.dump(tree.slice) == ast.dump(first.slice)
+                                                          for tree in trees[1:]]):
+            # The index is an array with one entry per member, which lists (or vectors) do not support
+            func = ast.parse("{}.asarray".format(self.numpy_name), mode='eval').body
+            result.value = ast.Call(func=func, args=[result.value], keywords=[])
+        return result
+
+    @staticmethod
+    def _same_shape(first, tree):
+        # Two nodes have the same shape if they only differ in their children
+        if type(first) is not type(tree):
+            return False
+        for name, a in ast.iter_fields(first):
+            b = getattr(tree, name, None)
+            if isinstance(a, list):
+                if not isinstance(b, list) or len(a) != len(b):
+                    return False
+                if any([isinstance(x, ast.AST) != isinstance(y, ast.AST) or
+                        (not isinstance(x, ast.AST) and x != y) for x, y in zip(a, b)]):
+                    return False
+            elif isinstance(a, ast.AST):
+                if not isinstance(b, ast.AST):
+                    return False
+            elif a != b:
+                return False
+        return True
+
+    def build(self):
+        family = self.family
+        members = family.members
+        family.args = [_to_source(self.merge([ast.parse(m.distribution_args[i], mode='eval').body for m in members]))
+                       for i in range(len(members[0].distribution_args))]
+        family.observation = _to_source(self.merge([ast.parse(m.observation, mode='eval').body for m in members]))
+        if any([m.conditions is not None and len(m.conditions) > 0 for m in members]):
+            family.mask = [m.get_cond_code(state_object=self.state_object) for m in members]
+            family.mask = [c[3:-3] if c is not None else None for c in family.mask]
+        return family
+
+
+def _get_family_key(node: Vertex):
+    if not isinstance(node, Vertex) or node.observation is None or node.distribution_func is None or \
+            node.distribution_args is None or (node.sample_size is not None and node.sample_size > 1) or \
+            node.plate is not None:
+        return None
+    distr = distributions.get_distribution_for_name(node.distribution_name)
+    if distr is None or distr._vector_sample:
+        return None
+    arg_names = node.distribution_arg_names
+    if arg_names is not None and len(arg_names) != len(node.distribution_args):
+        return None
+    key = (node.distribution_func, tuple(arg_names) if arg_names is not None else None,
+           len(node.distribution_args))
+    if distr.name in _VECTOR_PARAMETERS:
+        key += tuple(node.distribution_args)
+    return key
+
+
+def find_observe_families(nodes: list, state_object: str, numpy_name: str, *, min_size: int=4) -> list:
+    """
+    Finds the families of observed vertices with the same distribution, which can be evaluated together as a single
+    vectorised factor, and returns a list of `ObserveFamily`-objects. Families with less than `min_size` members
+    are not worth it and therefore left out.
+    """
+    if state_object is None or numpy_name is None:
+        return []
+    groups = {}
+    for node in nodes:
+        key = _get_family_key(node)
+        if key is not None:
+            groups.setdefault(key, []).append(node)
+    data_names = { node.name for node in nodes if isinstance(node, DataNode) }
+    result = []
+    for members in groups.values():
+        if len(members) < min_size:
+            continue
+        family = ObserveFamily("family_{}".format(len(result)), members)
+        try:
+            result.append(_FamilyBuilder(family, state_object, data_names, numpy_name).build())
+        except (_Unsupported, SyntaxError):
+            pass
+    return result
+
+
+def _get_sample_key(node):
+    if not isinstance(node, Vertex) or node.observation is not None or node.distribution_func is None or \
+            node.distribution_args is None or node.distribution_transform is not None or \
+            (node.sample_size is not None and node.sample_size > 1) or node.elements is not None or \
+            (node.conditions is not None and len(node.conditions) > 0) or \
+            (node.condition_nodes is not None and len(node.condition_nodes) > 0):
+        return None
+    distr = distributions.get_distribution_for_name(node.distribution_name)
+    if distr is None or distr._vector_sample or distr.name in _VECTOR_PARAMETERS:
+        return None
+    arg_names = node.distribution_arg_names
+    if arg_names is None or len(arg_names) != len(node.distribution_args):
+        return None
+    return node.distribution_func, tuple(arg_names)
+
+
+def _get_inputs(node):
+    # The nodes, whose values are used to compute the given node
+    if isinstance(node, Vertex):
+        result = set(node.ancestors)
+        if node.condition_nodes is not None:
+            result.update(node.condition_nodes)
+        return result
+    return node.ancestors
+
+
+def _create_stacked_vertex(members: list, numpy_name: str):
+    first = members[0]
+    n = len(members)
+    args = []
+    for i in range(len(first.distribution_args)):
+        codes = [m.distribution_args[i] for m in members]
+        if all([c == codes[0] for c in codes[1:]]):
+            args.append(codes[0])
+        else:
+            args.append("{}.array([{}])".format(numpy_name, ', '.join(codes)))
+    if all([a == c for a, c in zip(args, first.distribution_args)]):
+        # All elements have the same distribution: we still need one parameter with an entry per element
+        args[0] = "{}.full({}, {})".format(numpy_name, n, args[0])
+    ancestors = set.union(*[m.ancestors for m in members])
+    code = "{}({})".format(first.distribution_func, ', '.join(["{}={}".format(k, a)
+                                                               for k, a in zip(first.distribution_arg_names, args)]))
+    result = Vertex(members[-1].name, ancestors=ancestors, distribution_code=code,
+                    distribution_name=first.distribution_name, distribution_args=args,
+                    distribution_func=first.distribution_func, distribution_arg_names=first.distribution_arg_names,
+                    sample_size=n, elements=members, line_number=first.line_number)
+    for m in members:
+        result.dependent_conditions.update(m.dependent_conditions)
+    return result
+
+
+def stack_sample_families(nodes: list, state_object: str, numpy_name: str='_np', *, min_size: int=4) -> dict:
+    """
+    Finds the families of sampled vertices, which have the same distribution (with possibly different parameters) and
+    do not depend on each other, such as the weights of a layer in a neural network. Each family is replaced by a
+    single vertex, whose value is an array with one entry per member (see `Vertex.elements`). The code of all nodes
+    that depend on a member is rewritten to use the respective entry of the array instead.
+
+    Returns a dictionary, which maps each member to the new vertex (use `replace_stacked_nodes` to update a list of
+    nodes). As the parameters are stacked into NumPy-arrays, nothing happens if NumPy is not available.
+    """
+    if state_object is None:
+        return {}
+    try:
+        importlib.import_module('numpy')
+    except ModuleNotFoundError:
+        return {}
+
+    # A family is closed as soon as another node depends on one of its members: the new vertex takes the place of
+    # the last member, and must therefore be computed before any node that uses it
+    families = []
+    open_families = {}
+    for node in nodes:
+        inputs = _get_inputs(node)
+        for key in [key for key in open_families if any([m in inputs for m in open_families[key]])]:
+            families.append(open_families.pop(key))
+        key = _get_sample_key(node)
+        if key is not None:
+            open_families.setdefault(key, []).append(node)
+    families += list(open_families.values())
+
+    result = {}
+    for members in families:
+        if len(members) >= min_size:
+            vertex = _create_stacked_vertex(members, numpy_name)
+            for m in members:
+                result[m] = vertex
+    if len(result) == 0:
+        return result
+
+    index = { m.name: (v.name, v.elements.index(m)) for m, v in result.items() }
+    pattern = re.compile(r"{}\[(['\"])(\w+)\1\]".format(re.escape(state_object)))
+
+    def replace(match):
+        item = index.get(match.group(2), None)
+        if item is not None:
+            return "{}['{}'][{}]".format(state_object, item[0], item[1])
+        return match.group(0)
+
+    def rewrite(code):
+        return pattern.sub(replace, code) if type(code) is str else code
+
+    for node in nodes:
+        if node in result:
+            continue
+        if isinstance(node, Vertex):
+            node.distribution_code = rewrite(node.distribution_code)
+            if node.distribution_args is not None:
+                node.distribution_args = [rewrite(arg) for arg in node.distribution_args]
+            if node.distribution_arguments is not None:
+                node.distribution_arguments = { k: rewrite(v) for k, v in node.distribution_arguments.items() }
+            node.observation = rewrite(node.observation)
+            node.condition_ancestors = { result.get(a, a) for a in node.condition_ancestors }
+        elif isinstance(node, ConditionNode):
+            node.condition = rewrite(node.condition)
+            node.function = rewrite(node.function)
+        node.ancestors = { result.get(a, a) for a in node.ancestors }
+    return result
+
+
+def replace_stacked_nodes(nodes: list, stacked: dict) -> list:
+    """
+    Replaces the members of the families found by `stack_sample_families` by their new vertex.
+    """
+    result = []
+    for node in nodes:
+        vertex = stacked.get(node, None)
+        if vertex is None:
+            result.append(node)
+        elif node is vertex.elements[-1]:
+            result.append(vertex)
+    return result
@@ -0,0 +1,485 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+# A runtime backend for the distributions listed in `pyppl.distributions`, which only depends on NumPy. Select it
+# by compiling the model with:
+#   `compile_model(source, imports='import pyppl.backend.ppl_numpy_distributions as dist')`
+#
+# The parameters might be floats or NumPy-arrays, in which case `sample()` and `log_pdf()` work element-wise (the
+# parameters and values are broadcast against each other). `sample(sample_size=n)` draws `n` samples at once. All
+# densities are computed in log-space. The constructors only store their parameters, so that creating a distribution
+# for each evaluation is cheap; anything more expensive (such as the Cholesky-factor of a covariance matrix) is only
+# computed when needed.
+#
+# With `transformed=True`, the values of distributions with a bounded support are taken to be in an unconstrained
+# space: `x = a + exp(y)` for a support `[a, inf)` and `x = a + (b-a) * sigmoid(y)` for a support `[a, b]`. Both
+# `sample()` and `log_pdf()` then work on `y`, and the log-pdf includes the log-Jacobian of the transformation.
+#
+import math
+import numpy as np
+
+_LOG_2 = math.log(2.0)
+_LOG_PI = math.log(math.pi)
+_LOG_2PI = math.log(2.0 * math.pi)
+
+_rng = np.random.default_rng()
+
+def seed(value=None):
+    """
+    Re-seeds the random number generator used by all distributions.
+    """
+    global _rng
+    _rng = np.random.default_rng(value)
+
+
+_LANCZOS_G = 7.0
+_LANCZOS_COEFFICIENTS = np.array([
+    0.99999999999980993, 676.5203681218851, -1259.1392167224028, 771.32342877765313, -176.61502916214059,
+    12.507343278686905, -0.13857109526572012, 9.9843695780195716e-6, 1.5056327351493116e-7
+])
+
+def _lgamma_array(x):
+    # Lanczos-approximation, together with the reflection formula for `x < 1/2`
+    x = np.asarray(x, dtype=float)
+    reflect = x < 0.5
+    z = np.where(reflect, 1.0 - x, x) - 1.0
+    a = np.full(z.shape, _LANCZOS_COEFFICIENTS[0])
+    for i in range(1, len(_LANCZOS_COEFFICIENTS)):
+        a = a + _LANCZOS_COEFFICIENTS[i] / (z + i)
+    t = z + _LANCZOS_G + 0.5
+    result = 0.5 * _LOG_2PI + (z + 0.5) * np.log(t) - t + np.log(a)
+    if np.any(reflect):
+        with np.errstate(divide='ignore'):
+            result = np.where(reflect, _LOG_PI - np.log(np.abs(np.sin(math.pi * x))) - result, result)
+    return result
+
+def lgamma(x):
+    """
+    The logarithm of the absolute value of the Gamma-function, for floats as well as NumPy-arrays.
+    """
+    if np.ndim(x) == 0:
+        try:
+            return math.lgamma(x)
+        except ValueError:
+            return math.inf
+    return _lgamma_array(x)
+
+def _log(x):
+    with np.errstate(divide='ignore'):
+        return np.log(x)
+
+def _xlogy(x, y):
+    # Returns `x * log(y)`, which is zero for `x == 0`, even if `y == 0`
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(np.equal(x, 0), 0.0, x * np.log(y))
+
+def _xlog1py(x, y):
+    # Returns `x * log(1 + y)`, which is zero for `x == 0`, even if `y == -1`
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(np.equal(x, 0), 0.0, x * np.log1p(y))
+
+def _outside(log_pdf, condition):
+    # Sets the log-pdf to `-inf` where the value is outside the support
+    if np.ndim(condition) == 0:
+        return _NEG_INF if condition else log_pdf
+    return np.where(condition, -np.inf, log_pdf)
+
+def _not_count(value, upper=None):
+    # Returns the condition for values which are not counts `0, 1, ...`, below `upper` if given
+    result = np.less(value, 0) | np.not_equal(np.floor(value), value)
+    return result if upper is None else result | np.greater_equal(value, upper)
+
+# Python's own numbers are handled by `math`, which is considerably faster than NumPy for single values. The results
+# are still returned as NumPy-floats, so that they have the same methods (such as `sum()`) as the results for arrays
+_SCALARS = (float, int)
+_NEG_INF = np.float64(-math.inf)
+
+def _get_shape(sample_size, *params):
+    if sample_size is None:
+        return None
+    return (sample_size,) + np.broadcast(*params).shape
+
+
+####################################################################################################
+
+class Distribution(object):
+    """
+    The base class for all distributions of this backend.
+
+    The support of a distribution is given by `get_bounds()`, which returns a tuple `(lower, upper)`, where each
+    bound is `None` if the support is not bounded in that direction.  The bounds are only needed for `transformed`
+    distributions.
+    """
+
+    def get_bounds(self):
+        return None, None
+
+    def _transform(self):
+        lower, upper = self.get_bounds()
+        if lower is None and upper is None:
+            return
+        log_pdf = self.log_pdf
+        sample = self.sample
+        if upper is None:
+            def transformed_log_pdf(value):
+                return log_pdf(lower + np.exp(value)) + value
+            def transformed_sample(sample_size=None):
+                return _log(sample(sample_size=sample_size) - lower)
+        else:
+            width = upper - lower
+            def transformed_log_pdf(value):
+                log_jacobian = np.log(width) - np.logaddexp(0.0, value) - np.logaddexp(0.0, -value)
+                return log_pdf(lower + width / (1.0 + np.exp(-value))) + log_jacobian
+            def transformed_sample(sample_size=None):
+                u = (sample(sample_size=sample_size) - lower) / width
+                with np.errstate(divide='ignore'):
+                    return np.log(u) - np.log1p(-u)
+        self.log_pdf = transformed_log_pdf
+        self.log_prob = transformed_log_pdf
+        self.sample = transformed_sample
+
+    def log_prob(self, value):
+        return self.log_pdf(value)
+
+
+class Bernoulli(Distribution):
+
+    def __init__(self, probs, transformed=False):
+        self.probs = probs
+
+    def log_pdf(self, value):
+        if type(value) in _SCALARS and type(self.probs) in _SCALARS:
+            p = self.probs if value else 1.0 - self.probs
+            return np.float64(math.log(p)) if p > 0 else _NEG_INF
+        return _xlogy(value, self.probs) + _xlog1py(1 - np.asarray(value), -np.asarray(self.probs))
+
+    def sample(self, sample_size=None):
+        return _rng.binomial(1, self.probs, _get_shape(sample_size, self.probs))
+
+
+class Beta(Distribution):
+
+    def __init__(self, alpha, beta, transformed=False):
+        self.alpha = alpha
+        self.beta = beta
+        if transformed:
+            self._transform()
+
+    def get_bounds(self):
+        return 0.0, 1.0
+
+    def log_pdf(self, value):
+        a, b = self.alpha, self.beta
+        result = _xlogy(np.subtract(a, 1), value) + _xlog1py(np.subtract(b, 1), -np.asarray(value)) + \
+                 lgamma(np.add(a, b)) - lgamma(a) - lgamma(b)
+        return _outside(result, (np.less(value, 0)) | (np.greater(value, 1)))
+
+    def sample(self, sample_size=None):
+        return _rng.beta(self.alpha, self.beta, _get_shape(sample_size, self.alpha, self.beta))
+
+
+class Binomial(Distribution):
+
+    def __init__(self, total_count, probs, transformed=False):
+        self.total_count = total_count
+        self.probs = probs
+
+    def log_pdf(self, value):
+        n, k = self.total_count, value
+        result = lgamma(np.add(n, 1)) - lgamma(np.add(k, 1)) - lgamma(np.subtract(n, k) + 1) + \
+                 _xlogy(k, self.probs) + _xlog1py(np.subtract(n, k), -np.asarray(self.probs))
+        return _outside(result, (np.less(k, 0)) | (np.greater(k, n)))
+
+    def sample(self, sample_size=None):
+        return _rng.binomial(self.total_count, self.probs, _get_shape(sample_size, self.total_count, self.probs))
+
+
+class Categorical(Distribution):
+    """
+    The probabilities are normalised and might be given for a batch of distributions, with the categories along the
+    last axis.
+    """
+
+    def __init__(self, probs, transformed=False):
+        self.probs = probs
+
+    def _get_log_probs(self):
+        probs = np.asarray(self.probs, dtype=float)
+        return _log(probs) - np.log(probs.sum(axis=-1, keepdims=True))
+
+    def log_pdf(self, value):
+        if type(value) in _SCALARS and type(self.probs) is list:
+            outside = bool(_not_count(value, len(self.probs)))
+            p = 0.0 if outside else self.probs[int(value)]
+            return _outside(np.float64(math.log(p / math.fsum(self.probs))) if p > 0 else _NEG_INF, outside)
+        log_probs = self._get_log_probs()
+        outside = _not_count(value, log_probs.shape[-1])
+        # The values outside the categories are replaced by a valid index before indexing, and masked afterwards
+        index = np.where(outside, 0, value).astype(int)
+        if log_probs.ndim == 1:
+            result = log_probs[index]
+        else:
+            result = np.take_along_axis(log_probs, index[..., None], axis=-1)[..., 0]
+        return _outside(result, outside)
+
+    def sample(self, sample_size=None):
+        cdf = np.cumsum(np.asarray(self.probs, dtype=float), axis=-1)
+        shape = cdf.shape[:-1] if sample_size is None else (sample_size,) + cdf.shape[:-1]
+        u = _rng.random(shape) * cdf[..., -1]
+        result = (cdf <= u[..., None]).sum(axis=-1)
+        return int(result) if result.ndim == 0 else result
+
+
+class Cauchy(Distribution):
+
+    def __init__(self, mu, gamma, transformed=False):
+        self.mu = mu
+        self.gamma = gamma
+
+    def log_pdf(self, value):
+        z = (np.asarray(value) - self.mu) / self.gamma
+        return -_LOG_PI - np.log(self.gamma) - np.log1p(z * z)
+
+    def sample(self, sample_size=None):
+        return self.mu + self.gamma * _rng.standard_cauchy(_get_shape(sample_size, self.mu, self.gamma))
+
+
+class Dirichlet(Distribution):
+
+    def __init__(self, alpha, transformed=False):
+        self.alpha = alpha
+
+    def log_pdf(self, value):
+        alpha = np.asarray(self.alpha, dtype=float)
+        return (_xlogy(alpha - 1, value)).sum(axis=-1) + \
+               lgamma(alpha.sum(axis=-1)) - lgamma(alpha).sum(axis=-1)
+
+    def sample(self, sample_size=None):
+        alpha = np.asarray(self.alpha, dtype=float)
+        shape = alpha.shape if sample_size is None else (sample_size,) + alpha.shape
+        g = _rng.standard_gamma(alpha, shape)
+        return g / g.sum(axis=-1, keepdims=True)
+
+
+class Discrete(Categorical):
+    pass
+
+
+class Exponential(Distribution):
+
+    def __init__(self, rate, transformed=False):
+        self.rate = rate
+        if transformed:
+            self._transform()
+
+    def get_bounds(self):
+        return 0.0, None
+
+    def log_pdf(self, value):
+        if type(value) in _SCALARS and type(self.rate) in _SCALARS:
+            return np.float64(math.log(self.rate) - self.rate * value) if value >= 0 else _NEG_INF
+        return _outside(np.log(self.rate) - self.rate * np.asarray(value), np.less(value, 0))
+
+    def sample(self, sample_size=None):
+        return _rng.exponential(1.0 / np.asarray(self.rate), _get_shape(sample_size, self.rate))
+
+
+class Gamma(Distribution):
+    """
+    The Gamma-distribution with shape `alpha` and rate `beta`.
+    """
+
+    def __init__(self, alpha, beta, transformed=False):
+        self.alpha = alpha
+        self.beta = beta
+        if transformed:
+            self._transform()
+
+    def get_bounds(self):
+        return 0.0, None
+
+    def log_pdf(self, value):
+        a, b = self.alpha, self.beta
+        if type(value) in _SCALARS and type(a) in _SCALARS and type(b) in _SCALARS and value > 0:
+            return np.float64(a * math.log(b) - math.lgamma(a) + (a - 1) * math.log(value) - b * value)
+        result = a * np.log(b) - lgamma(a) + _xlogy(np.subtract(a, 1), value) - b * np.asarray(value)
+        return _outside(result, np.less(value, 0))
+
+    def sample(self, sample_size=None):
+        return _rng.gamma(self.alpha, 1.0 / np.asarray(self.beta), _get_shape(sample_size, self.alpha, self.beta))
+
+
+class HalfCauchy(Distribution):
+    """
+    The Cauchy-distribution folded at its location `mu`, i.e. with support `[mu, inf)`.
+    """
+
+    def __init__(self, mu, gamma, transformed=False):
+        self.mu = mu
+        self.gamma = gamma
+        if transformed:
+            self._transform()
+
+    def get_bounds(self):
+        return self.mu, None
+
+    def log_pdf(self, value):
+        z = (np.asarray(value) - self.mu) / self.gamma
+        return _outside(_LOG_2 - _LOG_PI - np.log(self.gamma) - np.log1p(z * z), np.less(z, 0))
+
+    def sample(self, sample_size=None):
+        return self.mu + self.gamma * np.abs(_rng.standard_cauchy(_get_shape(sample_size, self.mu, self.gamma)))
+
+
+class LogGamma(Distribution):
+    """
+    The distribution of `log(x)`, where `x` follows a Gamma-distribution with shape `alpha` and rate `beta`.
+    """
+
+    def __init__(self, alpha, beta, transformed=False):
+        self.alpha = alpha
+        self.beta = beta
+
+    def log_pdf(self, value):
+        a, b = self.alpha, self.beta
+        return a * np.log(b) - lgamma(a) + a * np.asarray(value) - b * np.exp(value)
+
+    def sample(self, sample_size=None):
+        g = _rng.gamma(self.alpha, 1.0, _get_shape(sample_size, self.alpha, self.beta))
+        return _log(g) - np.log(self.beta)
+
+
+class LogNormal(Distribution):
+
+    def __init__(self, mu, sigma, transformed=False):
+        self.mu = mu
+        self.sigma = sigma
+        if transformed:
+            self._transform()
+
+    def get_bounds(self):
+        return 0.0, None
+
+    def log_pdf(self, value):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_value = np.log(value)
+            z = (log_value - self.mu) / self.sigma
+            result = -0.5 * z * z - np.log(self.sigma) - 0.5 * _LOG_2PI - log_value
+        return _outside(result, np.less_equal(value, 0))
+
+    def sample(self, sample_size=None):
+        return _rng.lognormal(self.mu, self.sigma, _get_shape(sample_size, self.mu, self.sigma))
+
+
+class Multinomial(Distribution):
+    """
+    The counts of `total_count` draws from the categories with the (normalised) probabilities `probs`. The optional
+    `n` gives the number of samples drawn at once, if `sample` is called without a `sample_size`.
+    """
+
+    def __init__(self, total_count, probs, n=None, transformed=False):
+        self.total_count = total_count
+        self.probs = probs
+        self.n = n
+
+    def log_pdf(self, value):
+        probs = np.asarray(self.probs, dtype=float)
+        probs = probs / probs.sum(axis=-1, keepdims=True)
+        value = np.asarray(value)
+        return lgamma(np.add(self.total_count, 1)) - lgamma(value + 1).sum(axis=-1) + \
+               _xlogy(value, probs).sum(axis=-1)
+
+    def sample(self, sample_size=None):
+        probs = np.asarray(self.probs, dtype=float)
+        probs = probs / probs.sum(axis=-1, keepdims=True)
+        if sample_size is None:
+            sample_size = self.n
+        return _rng.multinomial(self.total_count, probs, sample_size)
+
+
+class MultivariateNormal(Distribution):
+
+    def __init__(self, mu, covariance_matrix, transformed=False):
+        self.mu = mu
+        self.covariance_matrix = covariance_matrix
+        self._cholesky = None
+
+    def _get_cholesky(self):
+        if self._cholesky is None:
+            self._cholesky = np.linalg.cholesky(np.asarray(self.covariance_matrix, dtype=float))
+        return self._cholesky
+
+    def log_pdf(self, value):
+        L = self._get_cholesky()
+        diff = np.asarray(value, dtype=float) - self.mu
+        z = np.linalg.solve(L, diff[..., None])[..., 0]
+        log_det = np.log(np.diagonal(L, axis1=-2, axis2=-1)).sum(axis=-1)
+        return -0.5 * (z * z).sum(axis=-1) - log_det - 0.5 * L.shape[-1] * _LOG_2PI
+
+    def sample(self, sample_size=None):
+        L = self._get_cholesky()
+        mu = np.asarray(self.mu, dtype=float)
+        shape = np.broadcast_shapes(mu.shape, L.shape[:-1])
+        if sample_size is not None:
+            shape = (sample_size,) + shape
+        z = _rng.standard_normal(shape)
+        return mu + (L @ z[..., None])[..., 0]
+
+
+class Normal(Distribution):
+
+    def __init__(self, loc, scale, transformed=False):
+        self.loc = loc
+        self.scale = scale
+
+    def log_pdf(self, value):
+        if type(value) in _SCALARS and type(self.loc) in _SCALARS and type(self.scale) in _SCALARS:
+            z = (value - self.loc) / self.scale
+            return np.float64(-0.5 * z * z - math.log(self.scale) - 0.5 * _LOG_2PI)
+        z = (np.asarray(value) - self.loc) / self.scale
+        return -0.5 * z * z - np.log(self.scale) - 0.5 * _LOG_2PI
+
+    def sample(self, sample_size=None):
+        return _rng.normal(self.loc, self.scale, _get_shape(sample_size, self.loc, self.scale))
+
+
+class Poisson(Distribution):
+
+    def __init__(self, lam, transformed=False):
+        self.lam = lam
+
+    def log_pdf(self, value):
+        if type(value) in _SCALARS and type(self.lam) in _SCALARS:
+            outside = bool(_not_count(value))
+            k = 0 if outside else value
+            return _outside(np.float64((k * math.log(self.lam) if k > 0 else 0.0) - self.lam - math.lgamma(k + 1)),
+                            outside)
+        outside = _not_count(value)
+        k = np.where(outside, 0, value)
+        return _outside(_xlogy(k, self.lam) - self.lam - lgamma(k + 1), outside)
+
+    def sample(self, sample_size=None):
+        return _rng.poisson(self.lam, _get_shape(sample_size, self.lam))
+
+
+class Uniform(Distribution):
+
+    def __init__(self, a, b, transformed=False):
+        self.a = a
+        self.b = b
+        if transformed:
+            self._transform()
+
+    def get_bounds(self):
+        return self.a, self.b
+
+    def log_pdf(self, value):
+        result = -np.log(np.subtract(self.b, self.a))
+        return _outside(result, np.less(value, self.a) | np.greater(value, self.b))
+
+    def sample(self, sample_size=None):
+        return _rng.uniform(self.a, self.b, _get_shape(sample_size, self.a, self.b))
@@ -6,6 +6,8 @@
 # 20. Feb 2018, Tobias Kohn
 # 20. Mar 2018, Tobias Kohn
 #
+import re
+from typing import Optional
 from .. import lexer
 from ..fe_clojure import ppl_clojure_forms as clj
 from ..lexer import CatCode, TokenType
@@ -13,23 +15,135 @@ from ..lexer import CatCode, TokenType
 
 #######################################################################################################################
 
-class ClojureLexer(object):
+class ClojureRegexTokenizer(object):
+    """
+    A bulk tokenizer for Clojure/FOPPL, which scans the source with one compiled master regular expression instead
+    of reading it character by character. It produces the same `(pos, TokenType, value)`-triples as the generic
+    `Lexer` does when configured by the `ClojureLexer`, but is considerably faster on large, machine-generated
+    sources with lots of numeric data.
+
+    The only difference to the generic lexer is in the handling of invalid input: any character outside the set of
+    valid characters (including non-ASCII characters outside of strings) raises a `SyntaxError`.
+    """
+
+    _name_chars = r"A-Za-z0-9_!$*+\-./<>=?"
+
+    _master_pattern = re.compile('|'.join([
+        r"(?P<WHITESPACE>[ \t\r\n,]+)",
+        r"(?P<COMMENT>;[^\n]*)",
+        r"(?P<NUMBER>[+-]?(?:0[xX][0-9a-fA-F]*|0[oO][0-7]*|0[bB][01]*|"
+        r"[0-9]+(?:\.[0-9]+)?(?:\.(?=[ \t\r\n,)\]}]))?(?:[eE][+-]?[0-9]+)?))",
+        r"(?P<STRING>#?\"(?:[^\"\\\x00]|\\[\s\S]?)*\"?)",
+        r"(?P<SYMBOL>~@|#'|&&|[#'`~^@&])",
+        r"(?P<LEFT_BRACKET>[(\[{])",
+        r"(?P<RIGHT_BRACKET>[)\]}])",
+        r"(?P<NAME>[A-Za-z_!$*+\-./<>=?][" + _name_chars + r"]*)",
+        r"(?P<PREFIX>(?P<PREFIX_CHAR>[%:])(?P=PREFIX_CHAR)*[" + _name_chars + r"]*)",
+        r"(?P<INVALID>[\s\S])",
+    ]))
+
+    _bases = { 'x': 16, 'X': 16, 'o': 8, 'O': 8, 'b': 2, 'B': 2 }
 
     def __init__(self, text: str):
         self.text = text
-        self.lexer = lexer.Lexer(text)
+        self.constants = {
+            'false': False,
+            'nil': None,
+            'true': True,
+        }
+        self.keywords = set()
+        self._stream = lexer.CharacterStream(text)
+        self._tokens = self._tokenize()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._tokens)
+
+    def _read_number(self, text: str):
+        sign = text[0]
+        if sign in ('+', '-'):
+            text = text[1:]
+        if len(text) > 1 and text[0] == '0' and text[1] in self._bases:
+            result = int(text[2:], self._bases[text[1]])
+        else:
+            if text.endswith('.'):
+                text += '0'
+            result = int(text) if text.isdigit() else float(text)
+        return -result if sign == '-' else result
+
+    def _tokenize(self):
+        constants = self.constants
+        keywords = self.keywords
+        read_number = self._read_number
+        T_NUMBER = TokenType.NUMBER
+        T_SYMBOL = TokenType.SYMBOL
+        T_LEFT = TokenType.LEFT_BRACKET
+        T_RIGHT = TokenType.RIGHT_BRACKET
+        for match in self._master_pattern.finditer(self.text):
+            kind = match.lastgroup
+            if kind == 'WHITESPACE' or kind == 'COMMENT':
+                continue
+            pos = match.start()
+            value = match.group()
+            if kind == 'NUMBER':
+                yield pos, T_NUMBER, read_number(value)
+            elif kind == 'NAME':
+                if value in constants:
+                    yield pos, TokenType.VALUE, constants[value]
+                elif value in keywords:
+                    yield pos, TokenType.KEYWORD, value
+                else:
+                    yield pos, T_SYMBOL, value
+            elif kind == 'LEFT_BRACKET':
+                yield pos, T_LEFT, value
+            elif kind == 'RIGHT_BRACKET':
+                yield pos, T_RIGHT, value
+            elif kind == 'STRING':
+                yield pos, TokenType.STRING, value
+            elif kind == 'SYMBOL' or kind == 'PREFIX':
+                yield pos, T_SYMBOL, value
+            else:
+                raise SyntaxError("invalid character in input stream: {}/'{}' (line {})".format(
+                    hex(ord(value)), value, self.get_line_from_pos(pos)
+                ))
+
+    def get_line_from_pos(self, pos):
+        return self._stream.get_line_from_pos(pos)
+
+
+#######################################################################################################################
+
+class ClojureLexer(object):
+    """
+    Reads the Clojure/FOPPL-source and creates the Clojure forms (see `ppl_clojure_forms`).
+
+    The `tokenizer`-argument selects the backend that splits the source into tokens: the default (`None` or
+    `'default'`) is the configurable, character-based `Lexer`, while `'regex'` selects the `ClojureRegexTokenizer`,
+    which is much faster on large sources.
+    """
+
+    def __init__(self, text: str, tokenizer: Optional[str]=None):
+        self.text = text
+        if tokenizer is None or tokenizer == 'default':
+            self.lexer = lexer.Lexer(text)
+            self.lexer.catcodes['\n', ','] = CatCode.WHITESPACE
+            self.lexer.catcodes['!', '$', '*', '+', '-', '.', '/', '<', '>', '=', '?'] = CatCode.ALPHA
+            self.lexer.catcodes[';'] = CatCode.LINE_COMMENT
+            self.lexer.catcodes['#', '\'', '`', '~', '^', '@'] = CatCode.SYMBOL
+            self.lexer.catcodes['&'] = CatCode.SYMBOL
+            self.lexer.catcodes['%', ':'] = CatCode.PREFIX
+            self.lexer.add_symbols('~@', '#\'')
+            self.lexer.add_string_prefix('#')
+            self.lexer.add_constant('false', False)
+            self.lexer.add_constant('nil', None)
+            self.lexer.add_constant('true', True)
+        elif tokenizer == 'regex':
+            self.lexer = ClojureRegexTokenizer(text)
+        else:
+            raise ValueError("unknown tokenizer: '{}'".format(tokenizer))
         self.source = lexer.BufferedIterator(self.lexer)
-        self.lexer.catcodes['\n', ','] = CatCode.WHITESPACE
-        self.lexer.catcodes['!', '$', '*', '+', '-', '.', '/', '<', '>', '=', '?'] = CatCode.ALPHA
-        self.lexer.catcodes[';'] = CatCode.LINE_COMMENT
-        self.lexer.catcodes['#', '\'', '`', '~', '^', '@'] = CatCode.SYMBOL
-        self.lexer.catcodes['&'] = CatCode.SYMBOL
-        self.lexer.catcodes['%', ':'] = CatCode.PREFIX
-        self.lexer.add_symbols('~@', '#\'')
-        self.lexer.add_string_prefix('#')
-        self.lexer.add_constant('false', False)
-        self.lexer.add_constant('nil', None)
-        self.lexer.add_constant('true', True)
 
     def __iter__(self):
         return self
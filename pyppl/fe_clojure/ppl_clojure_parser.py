@@ -431,7 +431,7 @@ class ClojureParser(clj.Visitor):
 
 #######################################################################################################################
 
-def parse(source):
-    clj_ast = list(ClojureLexer(source))
+def parse(source, *, tokenizer=None):
+    clj_ast = list(ClojureLexer(source, tokenizer=tokenizer))
     ppl_ast = ClojureParser().visit(clj_ast)
     return ppl_ast
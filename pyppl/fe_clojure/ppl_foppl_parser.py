@@ -23,17 +23,23 @@ class FopplParser(ClojureParser):
         initial_data = initial_data.visit(self)
         function = function.visit(self)
         args = [arg.visit(self) for arg in args]
-        result = initial_data
-        i = 0
-        while i < count:
-            result = AstCall(function, [AstValue(i), result] + args)
-            i += 1
-        return result
+        # Each step is bound to a new local variable, rather than nesting the calls `count` levels deep, so that the
+        # later passes handle long loops in linear time and with bounded recursion depth
+        if count <= 0:
+            return initial_data
+        name = generate_temp_var()
+        result = [AstDef(name, initial_data, global_context=False)]
+        for i in range(count):
+            value = AstCall(function, [AstValue(i), AstSymbol(name)] + args)
+            name = generate_temp_var()
+            result.append(AstDef(name, value, global_context=False))
+        result.append(AstSymbol(name))
+        return AstBody(result)
 
 
 #######################################################################################################################
 
-def parse(source):
-    clj_ast = list(ClojureLexer(source))
+def parse(source, *, tokenizer=None):
+    clj_ast = list(ClojureLexer(source, tokenizer=tokenizer))
     ppl_ast = FopplParser().visit(clj_ast)
     return ppl_ast
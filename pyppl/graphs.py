@@ -7,6 +7,8 @@
 # 11. May 2018, Tobias Kohn
 #
 from typing import Optional
+import array
+import bisect
 from . import distributions
 
 
@@ -30,6 +32,12 @@ class GraphNode(object):
     necessary values, it is save to call `evaluate`.
     """
 
+    # Set by `ReachabilityIndex.attach()` once the graph is complete
+    _reachability = None
+
+    _ancestors = frozenset()
+    _children = frozenset()
+
     def __init__(self, name: str, ancestors: Optional[set]=None):
         if ancestors is None:
             ancestors = set()
@@ -40,6 +48,22 @@ class GraphNode(object):
         assert type(self.name) is str
         assert all([isinstance(item, GraphNode) for item in self.ancestors])
 
+    @property
+    def ancestors(self):
+        return self._ancestors
+
+    @ancestors.setter
+    def ancestors(self, value):
+        # The nodes also keep track of their children, so that we can find the descendants without a reachability
+        # index.  Note that the set of ancestors must therefore be replaced as a whole rather than modified in place.
+        for a in self._ancestors:
+            a._children.discard(self)
+        self._ancestors = value
+        for a in value:
+            if '_children' not in a.__dict__:
+                a._children = set()
+            a._children.add(self)
+
     @property
     def display_name(self):
         if hasattr(self, 'original_name'):
@@ -152,6 +176,23 @@ class DataNode(GraphNode):
         return self.data_code
 
 
+class Plate(object):
+    """
+    A plate stands for a loop, whose iterations are independent of each other, and which is therefore not unrolled.
+    The vertices inside the plate (see `Vertex.plate`) are evaluated once for each value of the loop variable `index`,
+    running from `0` to `size-1`. Accordingly, the value of such a vertex is the list of the values of all
+    iterations, or an array if the code generator evaluates all iterations at once (see `vectorize`). Plates are
+    only created with the compile option `plates`.
+    """
+
+    def __init__(self, index: str, size: int):
+        self.index = index
+        self.size = size
+
+    def __repr__(self):
+        return "Plate({}, {})".format(self.index, self.size)
+
+
 class Vertex(GraphNode):
     """
     Vertices play the crucial and central role in the graphical model. Each vertex represents either the sampling from
@@ -168,7 +209,7 @@ class Vertex(GraphNode):
       code, or `None`.
     `ancestors`:
       The set of all parent vertices. This contains only the ancestors, which are in direct line, and not the parents
-      of parents. Use the `get_all_ancestors()`-method to retrieve a full list of all ancestors (including parents of
+      of parents. Use the `get_all_ancestors`-property to retrieve a full list of all ancestors (including parents of
       parents of parents of ...).
     `dist_ancestors`:
       The set of ancestors used for the distribution/sampling, without those used inside the conditions.
@@ -190,6 +231,13 @@ class Vertex(GraphNode):
       vertex in their `get_all_ancestors`-set.
     `sample_size`:
       The dimension of the samples drawn from this distribution.
+    `elements`:
+      If several sampled vertices have been stacked into this single, array-valued vertex, the list of the original
+      vertices, in the order of the entries of the array (see `ppl_graph_vectorizer`). The parameters of the
+      distribution then already have one entry per element, and `sample_size` is the number of elements.
+    `plate`:
+      If the vertex is inside a loop that has not been unrolled, the `Plate` of the loop. The code of the vertex
+      then refers to the loop variable `plate.index`.
     """
 
     def __init__(self, name: str, *,
@@ -206,6 +254,8 @@ class Vertex(GraphNode):
                  observation_value: Optional=None,
                  original_name: Optional[str]=None,
                  sample_size: int = 1,
+                 elements: Optional[list]=None,
+                 plate: Optional[Plate]=None,
                  line_number: int = -1):
         super().__init__(name, ancestors)
         self.condition_nodes = condition_nodes
@@ -223,6 +273,8 @@ class Vertex(GraphNode):
         self.original_name = original_name
         self.line_number = line_number
         self.sample_size = sample_size
+        self.elements = elements
+        self.plate = plate
         self.dependent_conditions = set()
         if conditions is not None:
             if self.condition_nodes is None:
@@ -251,6 +303,8 @@ class Vertex(GraphNode):
             "Dist-Transform": self.distribution_transform,
             "Sample-Size": self.sample_size,
             "Orig. Name":  self.original_name,
+            "Elements":    self.elements,
+            "Plate":       self.plate,
         }
         if self.observation is not None:
             args["Observation"] = self.observation
@@ -289,9 +343,13 @@ class Vertex(GraphNode):
             return None
 
     def add_dependent_condition(self, cond: ConditionNode):
-        self.dependent_conditions.add(cond)
-        for a in self.ancestors:
-            a.add_dependent_condition(cond)
+        # If an ancestor already has the condition, so do all of its ancestors
+        stack = [self]
+        while len(stack) > 0:
+            v = stack.pop()
+            if cond not in v.dependent_conditions:
+                v.dependent_conditions.add(cond)
+                stack += [a for a in v.ancestors if isinstance(a, Vertex)]
 
     @property
     def has_observation(self):
@@ -299,12 +357,15 @@ class Vertex(GraphNode):
 
     @property
     def get_all_ancestors(self):
-        result = []
-        for a in self.ancestors:
-            if a not in result:
-                result.append(a)
-                result += list(a.get_all_ancestors())
-        return set(result)
+        if self._reachability is not None:
+            return self._reachability.get_ancestors(self)
+        return _collect_ancestors([self]) - {self}
+
+    @property
+    def get_all_descendants(self):
+        if self._reachability is not None:
+            return self._reachability.get_descendants(self)
+        return _collect_descendants([self]) - {self}
 
     @property
     def is_conditional(self):
@@ -329,3 +390,267 @@ class Vertex(GraphNode):
     @property
     def has_conditions(self):
         return self.conditions is not None and len(self.conditions) > 0
+
+
+####################################################################################################
+
+def _collect_ancestors(nodes):
+    result = set()
+    stack = list(nodes)
+    while len(stack) > 0:
+        node = stack.pop()
+        if node not in result:
+            result.add(node)
+            stack += node.ancestors
+    return result
+
+
+def _collect_descendants(nodes):
+    result = set()
+    stack = list(nodes)
+    while len(stack) > 0:
+        node = stack.pop()
+        if node not in result:
+            result.add(node)
+            stack += node._children
+    return result
+
+
+def _merge_intervals(intervals: list):
+    intervals.sort()
+    result = [intervals[0]]
+    for lo, hi in intervals[1:]:
+        last_lo, last_hi = result[-1]
+        if lo <= last_hi + 1:
+            if hi > last_hi:
+                result[-1] = (last_lo, hi)
+        else:
+            result.append((lo, hi))
+    return tuple(result)
+
+
+class ReachabilityIndex(object):
+    """
+    The reachability index answers queries about the ancestors, descendants and dependent conditions of the nodes in
+    a complete graph, following the `ancestors`-fields of the nodes.
+
+    The index is built once, without any recursion. A depth-first search assigns each node its position in post-order,
+    and each node is then labelled with the list of position intervals covering all its ancestors (a second search
+    does the same for the descendants). Chains of nodes such as in HMMs need only a single interval per node, and
+    even for more general graphs, the number of intervals remains small in practice. Checking if a node is an ancestor
+    of another is then a binary search over the intervals, and retrieving all ancestors takes time linear in the
+    number of ancestors.
+
+    Usage:
+      ```
+      index = ReachabilityIndex(nodes).attach()
+      ancestors = index.get_ancestors(vertex)    # or: vertex.get_all_ancestors
+      ```
+    """
+
+    def __init__(self, nodes):
+        # The graph generator lists a condition node once for every time its `if` is visited
+        nodes = list(dict.fromkeys(nodes))
+        known_nodes = set(nodes)
+        nodes += [node for node in _collect_ancestors(nodes) if node not in known_nodes]
+        self.children = { node: [] for node in nodes }
+        for node in nodes:
+            for a in node.ancestors:
+                self.children[a].append(node)
+        self.topological_order = self._sort(nodes)
+        self._anc_order, self._anc_pos, self._anc_intervals = \
+            self._label(self.topological_order, lambda node: node.ancestors)
+        self._desc_order, self._desc_pos, self._desc_intervals = \
+            self._label(self.topological_order[::-1], lambda node: self.children[node])
+
+    def __contains__(self, node):
+        return node in self.children
+
+    def __len__(self):
+        return len(self.topological_order)
+
+    def _sort(self, nodes: list):
+        # Kahn's algorithm, keeping the given order of the nodes wherever possible
+        in_degree = { node: len(node.ancestors) for node in nodes }
+        ready = [node for node in reversed(nodes) if in_degree[node] == 0]
+        result = []
+        while len(ready) > 0:
+            node = ready.pop()
+            result.append(node)
+            for child in reversed(self.children[node]):
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    ready.append(child)
+        if len(result) != len(nodes):
+            raise ValueError("the graph contains a cycle")
+        return result
+
+    def _label(self, order: list, successors):
+        # `order` lists all successors of a node before the node itself. The depth-first search starts at the end of
+        # the order, so that long chains are numbered consecutively.
+        post_order = []
+        position = {}
+        low = {}
+        for root in reversed(order):
+            if root in position:
+                continue
+            low[root] = len(post_order)
+            position[root] = None
+            stack = [(root, iter(successors(root)))]
+            while len(stack) > 0:
+                node, it = stack[-1]
+                for succ in it:
+                    if succ not in position:
+                        low[succ] = len(post_order)
+                        position[succ] = None
+                        stack.append((succ, iter(successors(succ))))
+                        break
+                else:
+                    stack.pop()
+                    position[node] = len(post_order)
+                    post_order.append(node)
+        intervals = {}
+        for node in order:
+            items = [(low[node], position[node])]
+            for succ in successors(node):
+                items += intervals[succ]
+            intervals[node] = _merge_intervals(items)
+        return post_order, position, intervals
+
+    @staticmethod
+    def _contains(intervals: tuple, pos: int):
+        i = bisect.bisect_right(intervals, (pos, float('inf'))) - 1
+        return i >= 0 and intervals[i][0] <= pos <= intervals[i][1]
+
+    @staticmethod
+    def _read_intervals(order: list, intervals: tuple, node):
+        result = set()
+        for lo, hi in intervals:
+            result.update(order[lo:hi+1])
+        result.discard(node)
+        return result
+
+    def attach(self):
+        """
+        Registers the index with all its nodes, so that their `get_all_ancestors` etc. use the index.
+        """
+        for node in self.topological_order:
+            node._reachability = self
+        return self
+
+    def get_ancestors(self, node) -> set:
+        return self._read_intervals(self._anc_order, self._anc_intervals[node], node)
+
+    def get_descendants(self, node) -> set:
+        return self._read_intervals(self._desc_order, self._desc_intervals[node], node)
+
+    def get_children(self, node) -> set:
+        return set(self.children[node])
+
+    def get_dependent_conditions(self, node) -> set:
+        return { item for item in self.get_descendants(node) if isinstance(item, ConditionNode) }
+
+    def is_ancestor(self, ancestor, node) -> bool:
+        return ancestor is not node and self._contains(self._anc_intervals[node], self._anc_pos[ancestor])
+
+    def is_descendant(self, descendant, node) -> bool:
+        return descendant is not node and self._contains(self._desc_intervals[node], self._desc_pos[descendant])
+
+
+class MarkovBlanketIndex(object):
+    """
+    The Markov blanket index lists the parents, children and co-parents (the other parents of the children) of each
+    vertex, as well as its Markov blanket, which is the union of these three sets.
+
+    A vertex depends on its parents either directly, or through the conditions under which it is evaluated (see
+    `condition_ancestors`). Data nodes and conditions in between are skipped, so that the index only contains vertices.
+
+    The index is built once per model. Each relation is stored in compressed rows (CSR): the neighbours of the vertex
+    with number `i` are `indices[offsets[i]:offsets[i+1]]`, in the order of the vertices given to the constructor. The
+    lookups by name return tuples of names, which are slices of one flat list and need no further computation.
+
+    Usage:
+      ```
+      index = MarkovBlanketIndex(vertices)
+      blanket = index.get_markov_blanket('x30001')
+      ```
+      A model compiled with `extra_methods=('markov_blanket',)` builds the index of its vertices, and provides the
+      lookup as `model.get_markov_blanket('x30001')`.
+    """
+
+    def __init__(self, vertices):
+        self.vertices = list(vertices)
+        self.names = [v.name for v in self.vertices]
+        self.index = { name: i for i, name in enumerate(self.names) }
+        parents = [self._find_parents(v) for v in self.vertices]
+        children = [[] for _ in self.vertices]
+        for i, items in enumerate(parents):
+            for j in items:
+                children[j].append(i)
+        co_parents = []
+        blankets = []
+        for i in range(len(self.vertices)):
+            items = set()
+            for j in children[i]:
+                items.update(parents[j])
+            items.discard(i)
+            co_parents.append(sorted(items))
+            items.update(parents[i])
+            items.update(children[i])
+            items.discard(i)
+            blankets.append(sorted(items))
+        self.parents = self._compress(parents)
+        self.children = self._compress(children)
+        self.co_parents = self._compress(co_parents)
+        self.markov_blankets = self._compress(blankets)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def _find_parents(self, vertex) -> list:
+        # Follow the ancestors, including those of the conditions, through all nodes that are not vertices
+        result = set()
+        seen = set()
+        stack = list(vertex.ancestors)
+        if vertex.condition_nodes is not None:
+            stack += list(vertex.condition_nodes)
+        while len(stack) > 0:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            if isinstance(node, Vertex):
+                if node.name in self.index and node is not vertex:
+                    result.add(self.index[node.name])
+            else:
+                stack += list(node.ancestors)
+        return sorted(result)
+
+    def _compress(self, rows: list):
+        offsets = array.array('l', [0])
+        indices = array.array('l')
+        for row in rows:
+            indices.extend(row)
+            offsets.append(len(indices))
+        names = tuple(self.names[i] for i in indices)
+        return offsets, indices, names
+
+    def _get_row(self, relation, key) -> tuple:
+        offsets, _, names = relation
+        i = self.index[key if type(key) is str else key.name]
+        return names[offsets[i]:offsets[i+1]]
+
+    def get_parents(self, key) -> tuple:
+        return self._get_row(self.parents, key)
+
+    def get_children(self, key) -> tuple:
+        return self._get_row(self.children, key)
+
+    def get_co_parents(self, key) -> tuple:
+        return self._get_row(self.co_parents, key)
+
+    def get_markov_blanket(self, key) -> tuple:
+        return self._get_row(self.markov_blankets, key)
@@ -6,6 +6,7 @@
 # 20. Feb 2018, Tobias Kohn
 # 22. Feb 2018, Tobias Kohn
 #
+import bisect
 import enum
 
 #######################################################################################################################
@@ -108,6 +109,8 @@ class CharacterStream(object):
         self.source = source # type:str
         self._pos = 0        # type:int
         self.default_char = '\u0000'  # type:str
+        self._line_offsets = None     # type:list
+        self._line_source = None      # type:str
 
     def __getitem__(self, item):
         if 0 <= item < len(self.source):
@@ -151,8 +154,25 @@ class CharacterStream(object):
     def eof(self):
         return self._pos >= len(self.source)
 
+    def _get_line_offsets(self):
+        """
+        Returns a sorted list with the positions of all newline-characters in the source. The list is built once and
+        cached, so that line numbers can be found through a binary search instead of counting the newlines from the
+        start of the source over and over again.
+        """
+        source = self.source
+        if self._line_offsets is None or self._line_source is not source:
+            offsets = []
+            i = source.find('\n')
+            while i >= 0:
+                offsets.append(i)
+                i = source.find('\n', i + 1)
+            self._line_offsets = offsets
+            self._line_source = source
+        return self._line_offsets
+
     def get_line_from_pos(self, pos):
-        return self.source.count('\n', 0, pos)
+        return bisect.bisect_left(self._get_line_offsets(), pos)
 
     def next(self):
         i = self._pos
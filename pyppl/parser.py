@@ -8,9 +8,10 @@
 #
 from typing import Optional
 
-from .transforms import (ppl_new_simplifier, ppl_raw_simplifier, ppl_functions_inliner,
-                         ppl_symbol_simplifier, ppl_static_assignments)
+from .transforms.ppl_pass_manager import PassManager
 from . import ppl_ast
+from .ppl_hash_consing import HashConsTable
+from .ppl_profiler import CompileProfiler
 from .fe_clojure import ppl_foppl_parser
 from .fe_python import ppl_python_parser
 
@@ -32,40 +33,65 @@ def _detect_language(s:str):
     return None
 
 
-def parse(source:str, *, simplify:bool=True, language:Optional[str]=None, namespace:Optional[dict]=None):
+def parse(source:str, *, simplify:bool=True, language:Optional[str]=None, namespace:Optional[dict]=None,
+          tokenizer:Optional[str]=None, hash_cons=False, profiler:Optional[CompileProfiler]=None,
+          opt_level:int=1, plates:bool=False, pass_manager:Optional[PassManager]=None):
+    """
+    Parses the given source and runs the simplifying transformations on the resulting AST.
+
+    The `tokenizer` selects the tokenizer backend used by the Clojure/FOPPL-frontend: either the default, character-
+    based lexer (`None`), or `'regex'` for a faster tokenizer driven by a compiled regular expression.
+
+    If `hash_cons` is `True` or an instance of `HashConsTable`, structurally identical leaves and operator nodes are
+    interned, i.e. shared, before the main simplification and in the final AST (see `ppl_hash_consing`).
+
+    If a `profiler` is given, the time, memory, number of nodes and visits of each pass is recorded there (see
+    `ppl_profiler`).
+
+    The `opt_level` (0, 1 or 2) selects one of the presets for scheduling the transformations (see
+    `ppl_pass_manager`); alternatively, you can provide your own `PassManager`.
+
+    With `plates=True`, loops over data, whose iterations only observe values, are not unrolled, but kept as plates
+    (see `GraphGenerator`).  A `PassManager` of your own takes this option from its `options` instead.
+    """
+    if hash_cons is True:
+        hash_cons = HashConsTable()
+    elif hash_cons is False:
+        hash_cons = None
     result = None
     if type(source) is str and str != '':
         lang = _detect_language(source) if language is None else language.lower()
         if lang in ['py', 'python']:
-            result = ppl_python_parser.parse(source)
+            result = _run_function(profiler, 'frontend', ppl_python_parser.parse, source)
 
         elif lang in ['clj', 'clojure']:
-            result = ppl_foppl_parser.parse(source)
+            result = _run_function(profiler, 'frontend', ppl_foppl_parser.parse, source, tokenizer=tokenizer)
 
         elif lang == 'foppl':
-            result = ppl_foppl_parser.parse(source)
+            result = _run_function(profiler, 'frontend', ppl_foppl_parser.parse, source, tokenizer=tokenizer)
 
     if type(result) is list:
         result = ppl_ast.makeBody(result)
 
     if result is not None:
-        if namespace is None:
-            namespace = {}
-        raw_sim = ppl_raw_simplifier.RawSimplifier(namespace)
-        result = raw_sim.visit(result)
-        if simplify:
-            result = ppl_functions_inliner.FunctionInliner().visit(result)
-            result = raw_sim.visit(result)
-
-    if simplify and result is not None:
-        result = ppl_static_assignments.StaticAssignments().visit(result)
-        result = ppl_new_simplifier.Simplifier().visit(result)
-
-    result = ppl_symbol_simplifier.SymbolSimplifier().visit(result)
+        if pass_manager is None:
+            pass_manager = PassManager.from_level(opt_level, simplify=simplify, plates=plates)
+        result = pass_manager.run(result, namespace=namespace, hash_cons=hash_cons, profiler=profiler)
     return result
 
 
-def parse_from_file(filename: str, *, simplify:bool=True, language:Optional[str]=None, namespace:Optional[dict]=None):
+def _run_function(profiler:Optional[CompileProfiler], name:str, function, *args, **kwargs):
+    if profiler is not None:
+        return profiler.run_function(name, function, *args, **kwargs)
+    else:
+        return function(*args, **kwargs)
+
+
+def parse_from_file(filename: str, *, simplify:bool=True, language:Optional[str]=None, namespace:Optional[dict]=None,
+                    tokenizer:Optional[str]=None, hash_cons=False, profiler:Optional[CompileProfiler]=None,
+                    opt_level:int=1, plates:bool=False, pass_manager:Optional[PassManager]=None):
     with open(filename) as f:
         source = ''.join(f.readlines())
-    return parse(source, simplify=simplify, language=language, namespace=namespace)
+    return parse(source, simplify=simplify, language=language, namespace=namespace, tokenizer=tokenizer,
+                 hash_cons=hash_cons, profiler=profiler, opt_level=opt_level, plates=plates,
+                 pass_manager=pass_manager)
@@ -11,6 +11,28 @@ import enum
 from ast import copy_location as _cl
 import inspect as _inspect
 
+# Maps `(visitor class, node class, dispatch key)` to the resolved visit-, enter- and leave-methods (see `AstNode.visit`)
+_dispatch_cache = {}
+
+# Maps each node class to the names of the arguments of its `__init__`-method (see `AstNode.clone`)
+_init_args_cache = {}
+
+
+def _hash_field(value):
+    """
+    Returns a hash for the value of a field, which is consistent with the way `AstNode.equals` compares fields.
+    """
+    if isinstance(value, AstNode):
+        result = getattr(value, '_hash', None)
+        return result if result is not None else value.get_structural_hash()
+    elif type(value) in (list, tuple):
+        return hash(tuple([_hash_field(item) for item in value]))
+    try:
+        return hash(value)
+    except TypeError:
+        return 0
+
+
 class AstNode(object):
     """
     The `AstNode` is the base-class for all AST-nodes. You will typically not instantiate an object of this class,
@@ -18,13 +40,24 @@ class AstNode(object):
     """
 
     _attributes = { 'col_offset', 'lineno' }
-    original_name = None
     tag = None
 
+    # Each node class declares its fields statically in `_fields` and uses the same tuple as its `__slots__`. Apart
+    # from the fields, a node can only hold its location (`lineno`, `col_offset`), an `original_name`, its type (see
+    # `get_type`), and the cached structural hash of interned nodes (see `ppl_hash_consing`).
+    _fields = ()
+    __slots__ = ('lineno', 'col_offset', '_original_name', '_type', '_hash')
+
+    @property
+    def original_name(self):
+        return getattr(self, '_original_name', None)
+
+    @original_name.setter
+    def original_name(self, value):
+        self._original_name = value
+
     def get_fields(self):
-        fields = set(self.__dict__).difference(set(AstNode.__dict__))
-        fields = [name for name in fields if len(name) > 0 and not name.startswith('_')]
-        return fields
+        return list(self._fields)
 
     def set_field_values(self, source):
         if isinstance(source, self.__class__):
@@ -52,7 +85,7 @@ class AstNode(object):
             else:
                 return False
 
-        return [item for item in self.get_fields() if is_valid(item)]
+        return [item for item in self._fields if is_valid(item)]
 
     def get_ast_children(self):
         """
@@ -61,7 +94,7 @@ class AstNode(object):
         :return: A (possibly empty) list of `AstNode`-objects.
         """
         result = []
-        for name in self.get_fields():
+        for name in self._fields:
             field = getattr(self, name, None)
             if isinstance(field, AstNode):
                 result.append(field)
@@ -77,7 +110,10 @@ class AstNode(object):
 
         :return: Either an instance of `Type` (see `ppl_types`), or `None`.
         """
-        return getattr(self, '__type__', None)
+        return getattr(self, '_type', None)
+
+    def set_type(self, value):
+        self._type = value
 
     def get_visitor_names(self):
         """
@@ -123,6 +159,44 @@ class AstNode(object):
         name = name.lower()
         return ['enter_' + name, 'leave_' + name]
 
+    def _get_dispatch_key(self):
+        """
+        Returns a hashable value that, together with the class of the node, fully determines the names returned by
+        `get_visitor_names()`. The default implementation returns `None`, as the names depend on the class only.
+        Override this method whenever `get_visitor_names()` depends on the instance (as, e.g., for `AstBinary`).
+
+        NB: if a subclass overrides `get_visitor_names()`, but not this method, the list of visitor names itself is
+        used as a key (see `__init_subclass__`).
+        """
+        return None
+
+    def _get_visitor_names_key(self):
+        return tuple(self.get_visitor_names())
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'get_visitor_names' in cls.__dict__ and '_get_dispatch_key' not in cls.__dict__:
+            cls._get_dispatch_key = AstNode._get_visitor_names_key
+
+    def _resolve_dispatch(self, visitor_class):
+        """
+        Resolves the names of the `visit_XXX`-, `enter_XXX`- and `leave_XXX`-methods for a given class of visitors.
+        The result is cached by `visit()` and looked up by the class of the visitor, the class of the node and the
+        node's dispatch key (see `_get_dispatch_key()`).
+
+        :return: A tuple with the name of the visit-method (or `None`), the names of the enter- and leave-methods (or
+                 `None`), and two flags indicating whether the children are to be visited first, and whether the
+                 visitor has a `set_current_line_number`-method, respectively.
+        """
+        method_names = self.get_visitor_names() + ['visit_node', 'generic_visit']
+        methods = [name for name in method_names if getattr(visitor_class, name, None) is not None]
+        env_methods = [name for name in self.__get_envelop_method_names()
+                       if getattr(visitor_class, name, None) is not None]
+        return (methods[0] if len(methods) > 0 else None,
+                tuple(env_methods) if len(env_methods) == 2 else None,
+                getattr(visitor_class, '__visit_children_first__', False) is True,
+                getattr(visitor_class, 'set_current_line_number', None) is not None)
+
     def visit(self, visitor):
         """
         The visitor-object given as argument must provide at least one `visit_XXX`-method to be called by this method.
@@ -139,42 +213,43 @@ class AstNode(object):
         :param visitor: An object with a `visit_XXX`-method.
         :return:        The result returned by the `visit_XXX`-method of the visitor.
         """
-        visit_children_first = getattr(visitor, '__visit_children_first__', False) is True
-        lm_method = getattr(visitor, 'set_current_line_number', None)
-        method_names = self.get_visitor_names() + ['visit_node', 'generic_visit']
-        methods = [getattr(visitor, name, None) for name in method_names]
-        methods = [name for name in methods if name is not None]
-        env_methods = [getattr(visitor, name, None) for name in self.__get_envelop_method_names()]
-        env_methods = [name for name in env_methods if name is not None]
-        if len(methods) == 0 and callable(visitor):
+        key = (visitor.__class__, self.__class__, self._get_dispatch_key())
+        dispatch = _dispatch_cache.get(key)
+        if dispatch is None:
+            dispatch = self._resolve_dispatch(visitor.__class__)
+            _dispatch_cache[key] = dispatch
+        method_name, env_method_names, visit_children_first, has_lm_method = dispatch
+        if method_name is None and callable(visitor):
             if visit_children_first:
                 self.visit_children(visitor)
             return visitor(self)
-        elif len(methods) > 0:
+        elif method_name is not None:
+            method = getattr(visitor, method_name)
             if getattr(self, 'verbose', False) is True or getattr(visitor, 'verbose', False) is True:
-                print("calling {}".format(methods[0]))
-            if len(env_methods) == 2:
+                print("calling {}".format(method))
+            lm_method = visitor.set_current_line_number if has_lm_method and hasattr(self, 'lineno') else None
+            if env_method_names is not None:
                 obj = self
-                if lm_method is not None and hasattr(self, 'lineno'):
+                if lm_method is not None:
                     lm_method(self.lineno)
-                env_methods[0](self)
+                getattr(visitor, env_method_names[0])(self)
                 try:
                     if visit_children_first:
                         self.visit_children(visitor)
-                    if lm_method is not None and hasattr(self, 'lineno'):
+                    if lm_method is not None:
                         lm_method(self.lineno)
-                    result = methods[0](self)
+                    result = method(self)
                     if isinstance(result, self.__class__):
                         obj = result
                 finally:
-                    env_methods[1](obj)
+                    getattr(visitor, env_method_names[1])(obj)
                 return result
             else:
                 if visit_children_first:
                     self.visit_children(visitor)
-                if lm_method is not None and hasattr(self, 'lineno'):
+                if lm_method is not None:
                     lm_method(self.lineno)
-                return methods[0](self)
+                return method(self)
         else:
             raise RuntimeError("visitor '{}' has no visit-methods to call".format(type(visitor)))
 
@@ -187,7 +262,7 @@ class AstNode(object):
         :return:        A list with the values returned by the called `visit_XXX`-methods.
         """
         result = []
-        for name in self.get_fields():
+        for name in self._fields:
             item = getattr(self, name, None)
             if isinstance(item, AstNode) or type(item) in (list, tuple):
                 result.append(visitor.visit(item))
@@ -198,11 +273,12 @@ class AstNode(object):
         Sets an attribute on each node in the AST, based on the provided visitor (see `visit`-method above).
 
         :param visitor:    An object with `visit_XXX`-methods to be called.
-        :param attr_name:  The name of the attribute to set, must be a string.
+        :param attr_name:  The name of the attribute to set, must be a string. Since the nodes use `__slots__`, the
+                           attribute must be declared by the respective node class.
         :return:           The value of the attribute set.
         """
         assert type(attr_name) is str
-        for name in self.get_fields():
+        for name in self._fields:
             item = getattr(self, name, default)
             if isinstance(item, AstNode):
                 item.visit_attribute(visitor, attr_name)
@@ -232,11 +308,13 @@ class AstNode(object):
 
     def equals(self, node):
         try:
-            for attr in self.get_fields():
+            for attr in self._fields:
                 if attr in self._attributes: continue
                 attr_a = getattr(self, attr)
                 attr_b = getattr(node, attr)
                 if type(attr_a) in (list, tuple) and type(attr_b) in (list, tuple):
+                    if len(attr_a) != len(attr_b):
+                        return False
                     for a, b in zip(attr_a, attr_b):
                         if a != b:
                             return False
@@ -247,21 +325,46 @@ class AstNode(object):
             return False
 
     def __eq__(self, other):
-        return self.equals(other) if isinstance(other, self.__class__) else False
+        # Structurally identical interned nodes are the same object, so that comparing them takes constant time
+        if self is other:
+            return True
+        elif isinstance(other, self.__class__):
+            return self.equals(other)
+        else:
+            return False
+
+    def __hash__(self):
+        # Nodes that have not been interned can still be modified in place, and are therefore hashed by identity
+        result = getattr(self, '_hash', None)
+        return result if result is not None else object.__hash__(self)
+
+    def get_structural_hash(self):
+        """
+        Computes a hash of the node's structure, which is consistent with `equals`: two nodes that are equal always
+        have the same structural hash. The hash is computed recursively, unless the node has been interned by a
+        `HashConsTable`, in which case the hash is cached.
+        """
+        return hash(tuple([_hash_field(getattr(self, attr, None)) for attr in self._fields
+                           if attr not in self._attributes]))
 
     def clone(self, **kwargs):
-        init_method = getattr(self, '__init__', None)
-        if init_method is not None:
-            args = { arg: getattr(self, arg, None) for arg in _inspect.getfullargspec(init_method).args if arg != 'self' }
-            for arg in args:
-                if arg in kwargs:
-                    args[arg] = kwargs[arg]
-            result = self.__class__(**args)
-        else:
-            result = self.__class__()
-        fields = set(self.__dict__).difference(set(result.__dict__))
-        for field in fields:
-            setattr(result, field, getattr(self, field))
+        cls = self.__class__
+        for key in kwargs:
+            if key not in cls._fields and key not in cls._attributes and key != 'original_name':
+                raise TypeError("'{}' is not a field of '{}'".format(key, cls.__name__))
+        init_args = _init_args_cache.get(cls, None)
+        if init_args is None:
+            if cls.__init__ is not object.__init__:
+                spec = _inspect.getfullargspec(cls.__init__)
+                init_args = tuple([arg for arg in spec.args + spec.kwonlyargs if arg != 'self'])
+            else:
+                init_args = ()
+            _init_args_cache[cls] = init_args
+        args = { arg: kwargs[arg] if arg in kwargs else getattr(self, arg, None) for arg in init_args }
+        result = cls(**args)
+        for attr in ('lineno', 'col_offset', '_original_name'):
+            if hasattr(self, attr) and not hasattr(result, attr):
+                setattr(result, attr, getattr(self, attr))
         for key in kwargs:
             setattr(result, key, kwargs[key])
         return result
@@ -426,13 +529,16 @@ class ScopedVisitor(Visitor):
 #######################################################################################################################
 
 class AstControl(AstNode):
-    pass
+    _fields = ()
+    __slots__ = _fields
 
 class AstLeaf(AstNode):
-    pass
+    _fields = ()
+    __slots__ = _fields
 
 class AstOperator(AstNode):
-    pass
+    _fields = ()
+    __slots__ = _fields
 
 #######################################################################################################################
 
@@ -446,6 +552,9 @@ class BodyContext(enum.Enum):
 
 class AstAttribute(AstNode):
 
+    _fields = ('base', 'attr')
+    __slots__ = _fields
+
     def __init__(self, base:AstNode, attr:str):
         self.base = base
         self.attr = attr
@@ -458,6 +567,9 @@ class AstAttribute(AstNode):
 
 class AstBinary(AstOperator):
 
+    _fields = ('left', 'op', 'right')
+    __slots__ = _fields
+
     __binary_ops = {
         '+':  ('add',  lambda x, y: x + y),
         '-':  ('sub',  lambda x, y: x - y),
@@ -485,6 +597,9 @@ class AstBinary(AstOperator):
     def __repr__(self):
         return "({} {} {})".format(repr(self.left), self.op, repr(self.right))
 
+    def _get_dispatch_key(self):
+        return self.op
+
     def get_visitor_names(self):
         name = 'visit_binary_' + self.op_name
         return [name] + super(AstBinary, self).get_visitor_names()
@@ -505,9 +620,18 @@ class AstBinary(AstOperator):
                 return True
         return False
 
+    def get_structural_hash(self):
+        left, right = _hash_field(self.left), _hash_field(self.right)
+        if self.op in ('+', '*', 'and', 'or') and left > right:
+            left, right = right, left
+        return hash((left, self.op, right))
+
 
 class AstBody(AstNode):
 
+    _fields = ('items', 'context')
+    __slots__ = _fields
+
     def __init__(self, items:Optional[list], context:BodyContext=None):
         if items is None:
             items = []
@@ -545,6 +669,9 @@ class AstBody(AstNode):
         else:
             return False
 
+    def get_structural_hash(self):
+        return _hash_field(self.items)
+
     @property
     def is_empty(self):
         return len(self.items) == 0
@@ -563,6 +690,9 @@ class AstBody(AstNode):
 
 class AstBreak(AstNode):
 
+    _fields = ()
+    __slots__ = _fields
+
     def __repr__(self):
         return "break"
 
@@ -572,9 +702,15 @@ class AstBreak(AstNode):
     def equals(self, _):
         return True
 
+    def get_structural_hash(self):
+        return hash('break')
+
 
 class AstCall(AstNode):
 
+    _fields = ('function', 'args', 'keywords', 'is_builtin')
+    __slots__ = _fields
+
     def __init__(self, function:AstNode, args:list, keywords:Optional[list]=None, is_builtin:bool=False):
         if keywords is None:
             keywords = []
@@ -594,6 +730,9 @@ class AstCall(AstNode):
         args = [a + b for a, b in zip(keywords, args)]
         return "{}({})".format(repr(self.function), ', '.join(args))
 
+    def _get_dispatch_key(self):
+        return self.function_name, self.function_module, self.is_builtin
+
     def get_visitor_names(self):
         name = self.function_name
         if name is not None:
@@ -675,6 +814,9 @@ class AstCall(AstNode):
         else:
             return False
 
+    def get_structural_hash(self):
+        return hash((_hash_field(self.function), _hash_field(self.args), _hash_field(self.keywords)))
+
     def add_keywords_to_args(self, args: list):
         if len(self.keywords) > 0:
             kw = [''] * (len(args) - len(self.keywords)) + [item+'=' for item in self.keywords]
@@ -698,6 +840,9 @@ class AstCall(AstNode):
 
 class AstCompare(AstOperator):
 
+    _fields = ('left', 'op', 'right', 'second_op', 'second_right')
+    __slots__ = _fields
+
     __cmp_ops = {
         '==': ('eq', lambda x, y: x == y, '!='),
         '!=': ('ne', lambda x, y: x != y, '=='),
@@ -734,6 +879,9 @@ class AstCompare(AstOperator):
         else:
             return "({} {} {})".format(repr(self.left), self.op, repr(self.right))
 
+    def _get_dispatch_key(self):
+        return self.op, self.second_op
+
     def get_visitor_names(self):
         if self.second_op is not None:
             name = 'visit_ternary_' + self.op_name + '_' + self.op_name_2
@@ -768,6 +916,9 @@ class AstCompare(AstOperator):
 
 class AstDef(AstNode):
 
+    _fields = ('name', 'value', 'global_context', 'original_name')
+    __slots__ = _fields
+
     _attributes = {'col_offset', 'lineno', 'original_name'}
 
     def __init__(self, name:str, value:AstNode, global_context:bool=True, original_name:Optional[str]=None):
@@ -792,6 +943,9 @@ class AstDef(AstNode):
 
 class AstDict(AstNode):
 
+    _fields = ('items',)
+    __slots__ = _fields
+
     def __init__(self, items:dict):
         self.items = items
         assert type(items) is dict
@@ -814,9 +968,15 @@ class AstDict(AstNode):
         else:
             return False
 
+    def get_structural_hash(self):
+        return hash(frozenset([(key, _hash_field(self.items[key])) for key in self.items]))
+
 
 class AstFor(AstControl):
 
+    _fields = ('target', 'source', 'body', 'original_target')
+    __slots__ = _fields
+
     def __init__(self, target:str, source:AstNode, body:AstNode, original_target:Optional[str]=None):
         self.target = target
         self.source = source
@@ -832,6 +992,9 @@ class AstFor(AstControl):
 
 class AstFunction(AstNode):
 
+    _fields = ('name', 'parameters', 'body', 'vararg', 'defaults', 'doc_string', 'param_names', 'f_locals')
+    __slots__ = _fields
+
     def __init__(self, name:Optional[str], parameters:list, body:AstNode, *, vararg:Optional[str]=None,
                  defaults:Optional[list]=None, doc_string:Optional[str]=None, f_locals:Optional[set]=None):
         if name is None:
@@ -920,6 +1083,9 @@ class AstFunction(AstNode):
 
 class AstIf(AstControl):
 
+    _fields = ('test', 'if_node', 'else_node', 'cond_name')
+    __slots__ = _fields
+
     def __init__(self, test:AstNode, if_node:AstNode, else_node:Optional[AstNode]=None, cond_name:Optional[str]=None):
         if else_node is None:
             else_node = AstValue(None)
@@ -988,6 +1154,9 @@ class AstIf(AstControl):
 
 class AstImport(AstNode):
 
+    _fields = ('module_name', 'imported_names', 'alias')
+    __slots__ = _fields
+
     def __init__(self, module_name:str, imported_names:Optional[list]=None, alias:Optional[str]=None):
         self.module_name = module_name
         self.imported_names = imported_names
@@ -1008,6 +1177,9 @@ class AstImport(AstNode):
 
 class AstLet(AstNode):
 
+    _fields = ('target', 'source', 'body', 'original_target')
+    __slots__ = _fields
+
     def __init__(self, target:str, source:AstNode, body:AstNode, original_target:Optional[str]=None):
         self.target = target
         self.source = source
@@ -1030,6 +1202,9 @@ class AstLet(AstNode):
 
 class AstListFor(AstNode):
 
+    _fields = ('target', 'source', 'expr', 'test', 'original_target')
+    __slots__ = _fields
+
     def __init__(self, target:str, source:AstNode, expr:AstNode, test:Optional[AstNode]=None,
                  original_target:Optional[str]=None):
         self.target = target
@@ -1051,6 +1226,9 @@ class AstListFor(AstNode):
 
 class AstMultiSlice(AstNode):
 
+    _fields = ('base', 'indices')
+    __slots__ = _fields
+
     def __init__(self, base:AstNode, indices:list):
         self.base = base
         self.indices = indices
@@ -1069,6 +1247,9 @@ class AstMultiSlice(AstNode):
 
 class AstNamespace(AstNode):
 
+    _fields = ('name', 'bindings')
+    __slots__ = _fields
+
     def __init__(self, name: str, bindings: dict):
         self.name = name
         self.bindings = bindings
@@ -1084,6 +1265,9 @@ class AstNamespace(AstNode):
 
 class AstObserve(AstNode):
 
+    _fields = ('dist', 'value')
+    __slots__ = _fields
+
     def __init__(self, dist:AstNode, value:AstNode):
         self.dist = dist
         self.value = value
@@ -1097,6 +1281,9 @@ class AstObserve(AstNode):
 
 class AstReturn(AstNode):
 
+    _fields = ('value',)
+    __slots__ = _fields
+
     def __init__(self, value:AstNode):
         if value is None:
             value = AstValue(None)
@@ -1112,6 +1299,9 @@ class AstReturn(AstNode):
 
 class AstSample(AstNode):
 
+    _fields = ('dist', 'size')
+    __slots__ = _fields
+
     def __init__(self, dist: AstNode, size: Optional[AstNode]=None):
         self.dist = dist
         self.size = size
@@ -1127,6 +1317,9 @@ class AstSample(AstNode):
 
 class AstSlice(AstNode):
 
+    _fields = ('base', 'start', 'stop')
+    __slots__ = _fields
+
     def __init__(self, base:AstNode, start:Optional[AstNode], stop:Optional[AstNode]):
         self.base = base
         self.start = start
@@ -1159,6 +1352,9 @@ class AstSlice(AstNode):
 
 class AstSubscript(AstNode):
 
+    _fields = ('base', 'index', 'default', 'index_n')
+    __slots__ = _fields
+
     def __init__(self, base:AstNode, index:AstNode, default:Optional[AstNode]=None):
         self.base = base
         self.index = index
@@ -1187,6 +1383,9 @@ class AstSubscript(AstNode):
 
 class AstSymbol(AstLeaf):
 
+    _fields = ('name', 'import_source', 'protected', 'original_name', 'symbol', 'node', 'predef')
+    __slots__ = _fields
+
     def __init__(self, name:str, import_source:Optional[str]=None, protected:bool=False, node=None, predef=False,
                  original_name:Optional[str]=None):
         if original_name is None:
@@ -1210,7 +1409,10 @@ class AstSymbol(AstLeaf):
         return self.name.startswith(prefix)
 
     def equals(self, node):
-        return self.name == node.name
+        return self.name == node.name and self.import_source == node.import_source
+
+    def get_structural_hash(self):
+        return hash(self.name)
 
     @property
     def is_readonly(self):
@@ -1229,6 +1431,9 @@ class AstSymbol(AstLeaf):
 
 class AstUnary(AstOperator):
 
+    _fields = ('op', 'item')
+    __slots__ = _fields
+
     __unary_ops = {
         '+':   ('plus',  lambda x: x),
         '-':   ('minus', lambda x: -x),
@@ -1244,6 +1449,9 @@ class AstUnary(AstOperator):
     def __repr__(self):
         return "{}{}".format(self.op, repr(self.item))
 
+    def _get_dispatch_key(self):
+        return self.op
+
     def get_visitor_names(self):
         name = 'visit_unary_' + self.op_name
         return [name] + super(AstUnary, self).get_visitor_names()
@@ -1259,6 +1467,9 @@ class AstUnary(AstOperator):
 
 class AstValue(AstLeaf):
 
+    _fields = ('value',)
+    __slots__ = _fields
+
     def __init__(self, value):
         self.value = value
         assert value is None or type(value) in [bool, complex, float, int, str]
@@ -1269,9 +1480,15 @@ class AstValue(AstLeaf):
     def equals(self, other):
         return self.value == other.value
 
+    def get_structural_hash(self):
+        return _hash_field(self.value)
+
 
 class AstValueVector(AstLeaf):
 
+    _fields = ('items',)
+    __slots__ = _fields
+
     def __init__(self, items:list):
         self.items = items
 
@@ -1316,7 +1533,10 @@ class AstValueVector(AstLeaf):
             return AstCall(AstSymbol('cons'), [element, self])
 
     def equals(self, other):
-        return all([i == j for i, j in zip(self.items, other.items)])
+        return len(self.items) == len(other.items) and all([i == j for i, j in zip(self.items, other.items)])
+
+    def get_structural_hash(self):
+        return _hash_field(self.items)
 
     def to_vector(self):
         return AstVector([AstValue(item) for item in self.items])
@@ -1336,6 +1556,9 @@ class AstValueVector(AstLeaf):
 
 class AstVector(AstNode):
 
+    _fields = ('items',)
+    __slots__ = _fields
+
     def __init__(self, items:list):
         self.items = items
         assert type(items) is list and all([isinstance(item, AstNode) for item in items])
@@ -1352,19 +1575,27 @@ class AstVector(AstNode):
     def __repr__(self):
         return "[{}]".format(', '.join([repr(item) for item in self.items]))
 
+    @classmethod
+    def _from_nodes(cls, items: list):
+        # The items are already known to be nodes (e.g., those of an existing vector plus one more): checking them
+        # again would make a loop, which grows a vector through `conj`, quadratic
+        result = cls.__new__(cls)
+        result.items = items
+        return result
+
     def conj(self, element):
         if isinstance(element, AstNode):
-            return AstVector(self.items + [element])
+            return AstVector._from_nodes(self.items + [element])
         elif type(element) in [bool, complex, float, int, str]:
-            return AstVector(self.items + [AstValue(element)])
+            return AstVector._from_nodes(self.items + [AstValue(element)])
         else:
             return AstCall(AstSymbol('conj'), [self, element])
 
     def cons(self, element):
         if isinstance(element, AstNode):
-            return AstVector([element] + self.items)
+            return AstVector._from_nodes([element] + self.items)
         elif type(element) in [bool, complex, float, int, str]:
-            return AstVector([AstValue(element)] + self.items)
+            return AstVector._from_nodes([AstValue(element)] + self.items)
         else:
             return AstCall(AstSymbol('cons'), [element, self])
 
@@ -1379,6 +1610,9 @@ class AstVector(AstNode):
 
 class AstWhile(AstControl):
 
+    _fields = ('test', 'body')
+    __slots__ = _fields
+
     def __init__(self, test:AstCompare, body:AstNode):
         self.test = test
         self.body = body
@@ -1415,64 +1649,57 @@ def makeBody(*items):
             b_items += list(item)
         else:
             raise TypeError("item of type '{}' cannot be part of the AST".format(type(item)))
-    items = b_items
-
-    i = 0
-    while i < len(items):
-        node = items[i]
+    # The items still to be processed are kept on a stack (in reverse order), so that replacing an item by its parts
+    # does not need to shift all the following items in a list (which would be quadratic for long bodies)
+    pending = b_items[::-1]
+    items = []
+    while len(pending) > 0:
+        node = pending.pop()
         if isinstance(node, AstBody):
-            del items[i]
-            for itm in reversed(node.items):
-                items.insert(i, itm)
+            pending += node.items[::-1]
 
-        elif i+1 == len(items):
-            i += 1
+        elif len(pending) == 0:
+            items.append(node)
 
         elif isinstance(node, AstBreak) or isinstance(node, AstReturn):
-            items = items[:i]
             break
 
         elif isinstance(node, AstAttribute):
-            items[i] = node.base
+            pending.append(node.base)
 
         elif isinstance(node, AstBinary):
-            items[i] = node.right
-            items.insert(i, node.left)
+            pending.append(node.right)
+            pending.append(node.left)
 
         elif isinstance(node, AstCompare):
-            items[i] = node.right
-            items.insert(i, node.left)
+            pending.append(node.right)
             if node.second_right is not None:
-                items.insert(i + 1, node.second_right)
+                pending.append(node.second_right)
+            pending.append(node.left)
 
         elif isinstance(node, AstSlice):
-            parts = [x for x in (node.stop, node.start, node.base) if x is not None]
-            del items[i]
-            for p in parts:
-                items.insert(i, p)
+            pending += [x for x in (node.stop, node.start, node.base) if x is not None]
 
         elif isinstance(node, AstSubscript):
-            items[i] = node.base
             if node.default is not None:
-                items.insert(i + 1, node.default)
-            items.insert(i + 1, node.index)
+                pending.append(node.default)
+            pending.append(node.index)
+            pending.append(node.base)
 
         elif isinstance(node, AstSymbol):
-            del items[i]
+            pass
 
         elif isinstance(node, AstUnary):
-            items[i] = node.item
+            pending.append(node.item)
 
         elif isinstance(node, AstValue) or isinstance(node, AstValueVector):
-            del items[i]
+            pass
 
         elif isinstance(node, AstVector):
-            del items[i]
-            for itm in reversed(node.items):
-                items.insert(i, itm)
+            pending += node.items[::-1]
 
         else:
-            i += 1
+            items.append(node)
 
     if len(items) == 1:
         return items[0]
@@ -0,0 +1,130 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+from collections import OrderedDict
+from typing import Optional
+import threading
+
+
+class _CacheEntry(object):
+
+    __slots__ = ('model_class', 'vertices', 'arcs', 'data', 'conditionals', 'code', 'reachability', 'markov_blanket')
+
+    def __init__(self, model):
+        # The model is handed out to the caller, who might modify its sets
+        self.model_class = model.__class__
+        self.vertices = set(model.vertices)
+        self.arcs = set(model.arcs)
+        self.data = set(model.data)
+        self.conditionals = set(model.conditionals)
+        self.code = model.code
+        self.reachability = getattr(model, 'reachability', None)
+        self.markov_blanket = getattr(model, 'markov_blanket', None)
+
+    def create_model(self):
+        # Each model gets its own copies of the sets, but shares the (immutable) graph nodes and the class
+        result = self.model_class(set(self.vertices), set(self.arcs), set(self.data), set(self.conditionals))
+        result.code = self.code
+        result.reachability = self.reachability
+        result.markov_blanket = self.markov_blanket
+        return result
+
+
+class _Identity(object):
+    """
+    Stands in for a value in the namespace that is neither a string nor a number: two such values are the same key
+    only if they are the very same object.  Holding on to the object makes sure that its `id` is not reused while the
+    key is in the cache.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, _Identity) and self.value is other.value
+
+    def __hash__(self):
+        return id(self.value)
+
+
+def _get_namespace_key(value):
+    if value is None or type(value) in (bool, int, float, complex, str):
+        return value
+    return _Identity(value)
+
+
+class CompileCache(object):
+    """
+    A bounded in-memory cache of compiled models with LRU eviction, used by `compile_model`.
+
+    The cache stores the generated class together with the graph, and returns a fresh instance of the model on each
+    hit.  Use `clear()` to empty the cache, and `hits`/`misses` (or `stats()`) to see how well the cache performs.
+
+    The entries of the namespace are part of the key: strings and numbers by their value, all other objects by their
+    identity.  Passing an equal, but different object thus compiles the model anew.
+    """
+
+    def __init__(self, maxsize: int=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @staticmethod
+    def make_key(source: str, *, language: Optional[str]=None, namespace: Optional[dict]=None,
+                 imports: Optional[str]=None, base_class: Optional[str]=None, opt_level: int=1,
+                 plates: bool=False, local_variables: bool=False, lazy_branches: bool=False, vectorize: bool=False,
+                 extra_methods: tuple=()):
+        if namespace is not None:
+            namespace = tuple([(key, _get_namespace_key(namespace[key])) for key in sorted(namespace)])
+        return (source, language.lower() if language is not None else None, namespace, imports, base_class,
+                opt_level, plates, local_variables, lazy_branches, vectorize, tuple(sorted(set(extra_methods))))
+
+    def get(self, key):
+        """
+        Returns a fresh model for the given key, or `None` if there is no such model in the cache.
+        """
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry.create_model()
+
+    def put(self, key, model):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = _CacheEntry(model)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+        }
@@ -0,0 +1,106 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+from .ppl_ast import *
+
+
+class HashConsTable(object):
+    """
+    The hash-consing table interns immutable leaves and operator nodes: structurally identical subtrees are replaced
+    by one shared canonical node, which carries a cached structural hash.  Comparing two interned nodes is then
+    (mostly) a matter of comparing identities or hashes, and duplicate subtrees such as the distributions in unrolled
+    loops are only kept once in memory.
+
+    Two nodes are only merged if they agree on *all* their fields, including the location and `original_name`, and
+    if the values they hold have the same type (i.e. `1`, `1.0` and `True` remain distinct).  Interned nodes are
+    shared, and must therefore never be modified in place.  Other nodes such as definitions or samples are never
+    shared, but rebuilt with the interned children, if necessary.
+    """
+
+    __internable__ = (AstAttribute, AstBinary, AstCall, AstCompare, AstSlice, AstSubscript, AstUnary, AstVector,
+                      AstSymbol, AstValue, AstValueVector)
+
+    def __init__(self):
+        self.table = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, node):
+        return self.table.get(self._get_key(node), None) is node
+
+    def _get_value_key(self, value):
+        if isinstance(value, AstNode):
+            return id(value)
+        t = type(value)
+        if t in (list, tuple):
+            return (t, tuple([self._get_value_key(item) for item in value]))
+        elif t in (float, complex):
+            # `0.0 == -0.0` would otherwise merge both values
+            return (t, repr(value))
+        try:
+            hash(value)
+            return (t, value)
+        except TypeError:
+            return (t, id(value))
+
+    def _get_key(self, node: AstNode):
+        return (node.__class__, getattr(node, 'lineno', None), getattr(node, 'col_offset', None),
+                node.original_name) + \
+               tuple([self._get_value_key(getattr(node, field, None)) for field in node._fields])
+
+    def intern(self, node: AstNode):
+        """
+        Returns the canonical node for the given node, registering the node itself as canonical if there is no
+        structurally identical node in the table, yet.  All children of the node must have been interned before.
+        """
+        if not isinstance(node, self.__internable__):
+            return node
+        key = self._get_key(node)
+        result = self.table.get(key, None)
+        if result is None:
+            node._hash = node.get_structural_hash()
+            self.table[key] = node
+            self.misses += 1
+            return node
+        else:
+            self.hits += 1
+            return result
+
+    def intern_tree(self, node):
+        """
+        Interns an entire (sub)tree bottom-up and returns the resulting tree.  Nodes are only rebuilt (cloned) if any
+        of their children have been replaced.
+        """
+        if isinstance(node, AstNode):
+            changes = {}
+            for field in node._fields:
+                value = getattr(node, field, None)
+                if isinstance(value, (AstNode, list, tuple, dict)):
+                    new_value = self.intern_tree(value)
+                    if new_value is not value:
+                        changes[field] = new_value
+            if len(changes) > 0:
+                node = node.clone(**changes)
+            return self.intern(node)
+
+        elif type(node) in (list, tuple):
+            items = [self.intern_tree(item) for item in node]
+            if all([a is b for a, b in zip(items, node)]):
+                return node
+            return items if type(node) is list else tuple(items)
+
+        elif type(node) is dict:
+            items = { key: self.intern_tree(node[key]) for key in node }
+            if all([items[key] is node[key] for key in node]):
+                return node
+            return items
+
+        else:
+            return node
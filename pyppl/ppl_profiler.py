@@ -0,0 +1,155 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import json
+import time
+import tracemalloc
+from typing import Optional
+from .ppl_ast import AstNode
+
+
+def count_nodes(ast):
+    """
+    Counts the AST-nodes in the given tree (or list of trees). Shared subtrees are counted each time they occur.
+    """
+    count = 0
+    stack = [ast]
+    while len(stack) > 0:
+        item = stack.pop()
+        if isinstance(item, AstNode):
+            count += 1
+            stack += item.get_ast_children()
+        elif type(item) in (list, tuple):
+            stack += item
+    return count
+
+
+class PassProfile(object):
+    """
+    The measurements taken for a single compiler pass.  Sizes are given as the number of AST-nodes, or as the number
+    of graph nodes for the graph generator; memory in bytes, and time in seconds.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_time = 0.0
+        self.nodes_in = None    # type:int
+        self.nodes_out = None   # type:int
+        self.peak_memory = None # type:int
+        self.visits = None      # type:int
+
+    def __repr__(self):
+        return "{}: {:.4f}s, nodes {} -> {}, peak memory {}, visits {}".format(
+            self.name, self.wall_time, self.nodes_in, self.nodes_out, self.peak_memory, self.visits)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'wall_time': self.wall_time,
+            'nodes_in': self.nodes_in,
+            'nodes_out': self.nodes_out,
+            'peak_memory': self.peak_memory,
+            'visits': self.visits,
+        }
+
+
+class CompileProfiler(object):
+    """
+    Collects per-pass measurements while compiling a model.  Pass an instance (or `True`) as the `profile`-argument
+    to `compile_model`, or as the `profiler`-argument to `parser.parse`; the compiled model then carries the profiler
+    as `compile_profile`.
+
+    Peak memory is measured with `tracemalloc`, which slows down the compilation considerably; use
+    `trace_memory=False` if you are only interested in the timings.
+    """
+
+    def __init__(self, *, trace_memory: bool=True):
+        self.trace_memory = trace_memory
+        self.passes = []
+
+    def __iter__(self):
+        return iter(self.passes)
+
+    def __len__(self):
+        return len(self.passes)
+
+    def __repr__(self):
+        return '\n'.join([repr(item) for item in self.passes])
+
+    def _measure(self, name: str, function, ast=None, visitor=None):
+        result = PassProfile(name)
+        if ast is not None:
+            result.nodes_in = count_nodes(ast)
+        if visitor is not None:
+            # Count the visits by shadowing the visitor's `visit`-method with a counting wrapper
+            visit_method = visitor.visit
+            counter = [0]
+            def visit(node):
+                counter[0] += 1
+                return visit_method(node)
+            visitor.visit = visit
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            elif hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            mem_start = tracemalloc.get_traced_memory()[0]
+        try:
+            start_time = time.perf_counter()
+            output = function()
+            result.wall_time = time.perf_counter() - start_time
+        finally:
+            if self.trace_memory:
+                result.peak_memory = max(tracemalloc.get_traced_memory()[1] - mem_start, 0)
+                if started_tracing:
+                    tracemalloc.stop()
+            if visitor is not None:
+                del visitor.visit
+                result.visits = counter[0]
+        self.passes.append(result)
+        return result, output
+
+    def run_pass(self, name: str, visitor, ast):
+        """
+        Runs the visitor/transform on the given AST and records the measurements under the given name.
+
+        :return: The result of `visitor.visit(ast)`.
+        """
+        profile, output = self._measure(name, lambda: visitor.visit(ast), ast=ast, visitor=visitor)
+        profile.nodes_out = count_nodes(output)
+        return output
+
+    def run_function(self, name: str, function, *args, **kwargs):
+        """
+        Runs a function, which is not a visitor (such as the frontend parser or `exec`), and records its timing and
+        memory usage.  The number of nodes returned is recorded if the function returns an AST.
+        """
+        profile, output = self._measure(name, lambda: function(*args, **kwargs))
+        if isinstance(output, (AstNode, list)):
+            profile.nodes_out = count_nodes(output)
+        return output
+
+    def get_pass(self, name: str) -> Optional[PassProfile]:
+        for item in self.passes:
+            if item.name == name:
+                return item
+        return None
+
+    @property
+    def total_time(self):
+        return sum([item.wall_time for item in self.passes])
+
+    def to_dict(self):
+        return {
+            'total_time': self.total_time,
+            'passes': [item.to_dict() for item in self.passes],
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
@@ -12,12 +12,31 @@ from ..aux.ppl_transform_visitor import TransformVisitor
 from ..types import ppl_types, ppl_type_inference
 
 
+def _is_plate_body(node: AstNode):
+    # The iterations of a plate must only observe values, and must not pass anything on to the next iteration
+    items = node.items if isinstance(node, AstBody) else [node]
+    if len(items) == 0 or not all([isinstance(item, AstObserve) for item in items]):
+        return False
+    info = get_info(node)
+    if info.has_sample or info.has_cond or info.has_break or info.has_return or info.has_changed_vars:
+        return False
+    stack = [child for item in items for child in item.get_ast_children()]
+    while len(stack) > 0:
+        item = stack.pop()
+        if isinstance(item, (AstVector, AstObserve, AstSample, AstFunction, AstFor, AstListFor, AstWhile, AstIf,
+                             AstDef, AstLet, AstBody)):
+            return False
+        stack += item.get_ast_children()
+    return True
+
+
 class Simplifier(TransformVisitor):
 
-    def __init__(self):
+    def __init__(self, plates: bool=False):
         super().__init__()
         self.type_inferencer = ppl_type_inference.TypeInferencer(self)
         self.bindings = {}
+        self.plates = plates
 
     def get_type(self, node: AstNode):
         result = self.type_inferencer.visit(node)
@@ -224,17 +243,40 @@ class Simplifier(TransformVisitor):
                     return AstValue(True if op == 'in' else False)
             return AstValue(False if op == 'in' else True)
 
+        if left is node.left and right is node.right and second_right is node.second_right:
+            return node
         return _cl(AstCompare(left, node.op, right, node.second_op, second_right), node)
 
     def visit_def(self, node: AstDef):
         value = self.visit(node.value)
         if isinstance(value, AstSample):
-            return node.clone(value=value)
+            return node if value is node.value else node.clone(value=value)
         self.define_name(node.name, value)
         return AstBody([])
 
+    def _visit_plate(self, target: str, source: AstNode, body: AstNode):
+        """
+        With `plates`, a loop over data, whose iterations only observe values, is not unrolled, but kept as a plate
+        (see `GraphGenerator`). Returns the simplified body, or `None` if the loop needs to be unrolled.
+        """
+        if not self.plates or not isinstance(source, AstValueVector) or len(source) == 0:
+            return None
+        info = get_info(body)
+        if not info.has_observe or info.has_sample or info.has_cond:
+            return None
+        binding = self.bindings.pop(target, None)
+        try:
+            body = self.visit(body)
+        finally:
+            if binding is not None:
+                self.bindings[target] = binding
+        return body if _is_plate_body(body) else None
+
     def visit_for(self, node: AstFor):
         source = self.visit(node.source)
+        body = self._visit_plate(node.target, source, node.body)
+        if body is not None:
+            return node.clone(source=source, body=body)
         if is_vector(source):
             items = []
             for item in source:
@@ -264,6 +306,8 @@ class Simplifier(TransformVisitor):
         else_node = self.visit(node.else_node)
         if is_empty(if_node) and is_empty(else_node):
             return test
+        if test is node.test and if_node is node.if_node and else_node is node.else_node:
+            return node
         return node.clone(test=test, if_node=if_node, else_node=else_node)
 
     def visit_list_for(self, node:AstListFor):
@@ -278,6 +322,10 @@ class Simplifier(TransformVisitor):
                 src_len = None
 
         if node.test is None:
+            expr = self._visit_plate(node.target, source, node.expr)
+            if expr is not None:
+                return node.clone(source=source, expr=expr)
+
             if node.target == '_' and src_len is not None:
                 if isinstance(node.expr, AstSample) and node.expr.size is None:
                     return self.visit(node.expr.clone(size=AstValue(src_len)))
@@ -305,6 +353,8 @@ class Simplifier(TransformVisitor):
         index = self.visit(node.index)
         if is_vector(base) and is_integer(index):
             return base[index.value]
+        elif base is node.base and index is node.index:
+            return node
         else:
             return node.clone(base=base, index=index)
 
@@ -354,4 +404,7 @@ class Simplifier(TransformVisitor):
             if original_name is not None:
                 result.original_name = original_name
             return result
-        return makeVector(items)
+        result = makeVector(items)
+        if isinstance(result, AstVector) and all([a is b for a, b in zip(items, node.items)]):
+            return node
+        return result
@@ -0,0 +1,188 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+from typing import Optional
+from ..ppl_ast import *
+from . import (ppl_new_simplifier, ppl_raw_simplifier, ppl_functions_inliner,
+               ppl_symbol_simplifier, ppl_static_assignments)
+
+
+def _contains_node(ast, predicate):
+    stack = [ast]
+    while len(stack) > 0:
+        item = stack.pop()
+        if isinstance(item, AstNode):
+            if predicate(item):
+                return True
+            stack += item.get_ast_children()
+        elif type(item) in (list, tuple):
+            stack += item
+    return False
+
+
+def _needs_inlining(ast):
+    # The inliner replaces calls to functions by their bodies, and renames the targets of `let`-expressions
+    return _contains_node(ast, lambda node: isinstance(node, AstFunction) or
+                                            (isinstance(node, AstLet) and node.target != '_'))
+
+
+class Pass(object):
+    """
+    A transform registered with the pass manager.
+
+    The `factory` is called with the namespace of predefined symbols and returns a visitor, whose `visit`-method
+    carries out the transformation.  The passes listed in `requires` must be scheduled before this pass.  If a
+    `precondition` is given, the pass is skipped whenever `precondition(ast)` is false, i.e. when the pass cannot change
+    anything.  An `idempotent` pass is skipped if the tree has not changed since the pass ran last.  With
+    `reuse_instance`, all runs of the pass during one compilation share the same visitor.  The compile options named
+    in `options` are passed on to the `factory` as keyword arguments, if the pass manager has them.
+    """
+
+    def __init__(self, name: str, factory, *, requires: tuple=(), precondition=None,
+                 idempotent: bool=False, reuse_instance: bool=False, options: tuple=()):
+        self.name = name
+        self.factory = factory
+        self.requires = requires
+        self.precondition = precondition
+        self.idempotent = idempotent
+        self.reuse_instance = reuse_instance
+        self.options = options
+
+    def __repr__(self):
+        return "Pass({})".format(self.name)
+
+
+_passes = {}
+
+def register_pass(p: Pass):
+    _passes[p.name] = p
+    return p
+
+def get_pass(name: str) -> Pass:
+    if name not in _passes:
+        raise ValueError("unknown pass: '{}'".format(name))
+    return _passes[name]
+
+
+register_pass(Pass('raw_simplifier', lambda namespace: ppl_raw_simplifier.RawSimplifier(namespace),
+                   idempotent=True, reuse_instance=True))
+register_pass(Pass('functions_inliner', lambda _: ppl_functions_inliner.FunctionInliner(),
+                   requires=('raw_simplifier',), precondition=_needs_inlining))
+register_pass(Pass('static_assignments', lambda _: ppl_static_assignments.StaticAssignments(),
+                   requires=('raw_simplifier', 'functions_inliner')))
+register_pass(Pass('simplifier', lambda _, plates=False: ppl_new_simplifier.Simplifier(plates=plates),
+                   requires=('static_assignments',), options=('plates',)))
+register_pass(Pass('symbol_simplifier', lambda _: ppl_symbol_simplifier.SymbolSimplifier()))
+
+
+# The presets: the schedule of passes, and the passes to iterate until they reach a fixpoint
+#  - O0 runs each pass once and does not simplify the inlined code again,
+#  - O1 (the default) re-runs the raw simplifier after inlining, but only if the inliner has changed the tree,
+#  - O2 additionally iterates the simplifier until the tree does not change anymore.
+OPTIMIZATION_LEVELS = {
+    0: (('raw_simplifier', 'functions_inliner', 'static_assignments', 'simplifier', 'symbol_simplifier'), ()),
+    1: (('raw_simplifier', 'functions_inliner', 'raw_simplifier', 'static_assignments', 'simplifier',
+         'symbol_simplifier'), ()),
+    2: (('raw_simplifier', 'functions_inliner', 'raw_simplifier', 'static_assignments', 'simplifier',
+         'symbol_simplifier'), ('simplifier',)),
+}
+
+# Without simplification, we only resolve the symbols and imports
+_UNSIMPLIFIED = (('raw_simplifier', 'symbol_simplifier'), ())
+
+
+class PassManager(object):
+    """
+    Runs a schedule of registered passes on an AST.
+
+    A pass has changed the tree if it returns a different object: the transforms return the original node if, and
+    only if, nothing has changed, so that this test never has to compare the trees.  After each compilation, `log`
+    lists the runs of each pass as tuples `(name, status)`, where the status is one of `'changed'`, `'unchanged'` or
+    `'skipped'`.
+
+    The `options` are the compile options for the passes that take them, such as `plates` for the simplifier.
+    """
+
+    def __init__(self, schedule, *, fixpoint=(), max_iterations: int=4, options: Optional[dict]=None):
+        seen = set()
+        for name in schedule:
+            p = get_pass(name)
+            for req in p.requires:
+                if req not in seen:
+                    raise ValueError("pass '{}' requires '{}' to run before".format(name, req))
+            seen.add(name)
+        for name in fixpoint:
+            if name not in seen:
+                raise ValueError("fixpoint pass '{}' is not scheduled".format(name))
+        self.schedule = tuple(schedule)
+        self.fixpoint = set(fixpoint)
+        self.max_iterations = max_iterations
+        self.options = options if options is not None else {}
+        self.log = []
+
+    @classmethod
+    def from_level(cls, level: int=1, *, simplify: bool=True, plates: bool=False):
+        if not simplify:
+            schedule, fixpoint = _UNSIMPLIFIED
+        elif level in OPTIMIZATION_LEVELS:
+            schedule, fixpoint = OPTIMIZATION_LEVELS[level]
+        else:
+            raise ValueError("invalid optimization level: '{}'".format(level))
+        return cls(schedule, fixpoint=fixpoint, options={'plates': plates})
+
+    def run(self, ast, *, namespace: Optional[dict]=None, hash_cons=None, profiler=None):
+        """
+        Runs the schedule on the given AST and returns the transformed AST.
+
+        If a `HashConsTable` is given in `hash_cons`, the tree is interned before the simplifier runs, and once
+        more at the end.
+        """
+        if namespace is None:
+            namespace = {}
+        self.log = []
+        instances = {}
+        run_counts = {}
+        last_version = {}
+        version = 0
+        for name in self.schedule:
+            p = _passes[name]
+            if (p.idempotent and last_version.get(name, None) == version) or \
+                    (p.precondition is not None and not p.precondition(ast)):
+                self.log.append((name, 'skipped'))
+                continue
+            if name == 'simplifier' and hash_cons is not None:
+                ast = self._run(profiler, 'hash_consing', hash_cons.intern_tree, ast)
+            iterations = self.max_iterations if name in self.fixpoint else 1
+            for _ in range(iterations):
+                if p.reuse_instance and name in instances:
+                    visitor = instances[name]
+                else:
+                    options = { key: self.options[key] for key in p.options if key in self.options }
+                    visitor = p.factory(namespace, **options)
+                    instances[name] = visitor
+                run_counts[name] = run_counts.get(name, 0) + 1
+                label = name if run_counts[name] == 1 else "{}_{}".format(name, run_counts[name])
+                result = self._run(profiler, label, visitor.visit, ast, visitor=visitor)
+                changed = result is not ast
+                ast = result
+                if changed:
+                    version += 1
+                last_version[name] = version
+                self.log.append((name, 'changed' if changed else 'unchanged'))
+                if not changed:
+                    break
+        if hash_cons is not None and ast is not None:
+            ast = self._run(profiler, 'hash_consing_2', hash_cons.intern_tree, ast)
+        return ast
+
+    def _run(self, profiler, name: str, function, ast, visitor=None):
+        if profiler is None:
+            return function(ast)
+        elif visitor is not None:
+            return profiler.run_pass(name, visitor, ast)
+        else:
+            return profiler.run_function(name, function, ast)
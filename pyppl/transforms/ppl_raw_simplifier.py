@@ -5,6 +5,7 @@
 #
 # 09. Mar 2018, Tobias Kohn
 # 23. Mar 2018, Tobias Kohn
+# 16. Oct 2026
 #
 from ast import copy_location as _cl
 from ..ppl_ast import *
@@ -78,7 +79,11 @@ class RawSimplifier(ScopedVisitor):
                     items = items[:i+1]
             i -= 1
 
-        return _cl(makeBody(items), node)
+        result = makeBody(items)
+        if isinstance(result, AstBody) and len(result.items) == len(node.items) and \
+                all([a is b for a, b in zip(result.items, node.items)]):
+            return node
+        return _cl(result, node)
 
     def visit_call(self, node: AstCall):
         if node.arg_count > 0:
@@ -89,6 +94,8 @@ class RawSimplifier(ScopedVisitor):
                 p, a = self._visit_expr(arg)
                 prefix += p
                 args.append(a)
+            if len(prefix) == 0 and function is node.function and all([a is b for a, b in zip(args, node.args)]):
+                return node
             return makeBody(prefix, node.clone(function=function, args=args))
         else:
             function = self.visit(node.function)
@@ -296,6 +303,11 @@ class RawSimplifier(ScopedVisitor):
             prefix.append(AstUnary(node.op, item))
             return _cl(makeBody(prefix), node)
 
+    def visit_value_vector(self, node: AstValueVector):
+        # The items are plain values: there is nothing to simplify, and walking them for each use of, say, a vector
+        # of data inside a loop, would make the simplifier quadratic in the size of the data
+        return node
+
     def visit_vector(self, node: AstVector):
         original_name = getattr(node, 'original_name', None)
         if original_name is not None:
@@ -310,7 +322,10 @@ class RawSimplifier(ScopedVisitor):
             p, i = self._visit_expr(item)
             prefix += p
             items.append(i)
-        return _cl(makeBody(prefix, makeVector(items)), node)
+        result = makeVector(items)
+        if len(prefix) == 0 and isinstance(result, AstVector) and all([a is b for a, b in zip(items, node.items)]):
+            return node
+        return _cl(makeBody(prefix, result), node)
 
     def visit_while(self, node: AstWhile):
         return self.visit_node(node)
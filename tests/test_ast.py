@@ -0,0 +1,52 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import unittest
+from pyppl.ppl_ast import *
+from pyppl.ppl_hash_consing import HashConsTable
+from pyppl.types import ppl_types
+
+
+class TestAst(unittest.TestCase):
+
+    def test_clone(self):
+        node = AstBinary(AstSymbol('x'), '+', AstValue(1))
+        node.lineno = 3
+        result = node.clone(right=AstValue(2))
+        self.assertIs(node.left, result.left)
+        self.assertEqual(2, result.right.value)
+        self.assertEqual(3, result.lineno)
+        with self.assertRaises(TypeError):
+            node.clone(rigth=AstValue(2))
+
+    def test_type(self):
+        node = AstValue(1)
+        self.assertIsNone(node.get_type())
+        node.set_type(ppl_types.Integer)
+        self.assertIs(ppl_types.Integer, node.get_type())
+
+    def test_hash_consing(self):
+        table = HashConsTable()
+        a = table.intern_tree(AstBinary(AstSymbol('x'), '+', AstValue(1)))
+        b = table.intern_tree(AstBinary(AstSymbol('x'), '+', AstValue(1)))
+        c = table.intern_tree(AstBinary(AstSymbol('x'), '+', AstValue(1.0)))
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+        self.assertEqual(a.get_structural_hash(), hash(a))
+        self.assertEqual(a, AstBinary(AstSymbol('x'), '+', AstValue(1)))
+
+    def test_hash_mutable_nodes(self):
+        # Nodes that have not been interned are hashed by identity, so that changing them keeps sets consistent
+        node = AstBinary(AstSymbol('x'), '+', AstValue(1))
+        nodes = { node }
+        node.right = AstValue(2)
+        self.assertIn(node, nodes)
+        self.assertEqual(node.get_structural_hash(), AstBinary(AstSymbol('x'), '+', AstValue(2)).get_structural_hash())
+
+
+if __name__ == '__main__':
+    unittest.main()
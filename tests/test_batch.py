@@ -0,0 +1,114 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import os.path
+import unittest
+import pyppl
+
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+IMPORTS = 'import pyppl.backend.ppl_numpy_distributions as dist'
+EXAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'examples')
+
+DATA_SOURCE = """
+(let [z (sample (categorical (vector 0.1 0.2 0.3 0.4)))
+      y (sample (normal z 1))]
+  (observe (normal y 1) 2.5)
+  y)
+"""
+
+PLATE_SOURCE = """
+(let [xs (vector 1.0 2.0 3.0 4.0 5.0 6.0)
+      ys (vector 2.9 5.2 7.1 8.8 11.3 13.0)
+      slope (sample (normal 0 10))
+      bias (sample (normal 0 10))]
+  (doseq [i (range 6)]
+    (observe (normal (+ (* slope (get xs i)) bias) 1) (get ys i)))
+  [slope bias])
+"""
+
+
+def _split(model, batch):
+    names = [v.name for v in model.vertices if v.is_sampled]
+    size = batch['__batch_size__']
+    return [{key: (batch[key][i] if key in names else batch[key]) for key in batch if key != '__batch_size__'}
+            for i in range(size)]
+
+
+@unittest.skipIf(np is None, "requires NumPy")
+class TestBatch(unittest.TestCase):
+
+    def test_data_ancestors(self):
+        # The probabilities of the categorical distribution are a data node
+        model = pyppl.compile_model(DATA_SOURCE, language='clj', imports=IMPORTS, extra_methods='batch')
+        self.assertTrue(any(["data" in v.get_code() for v in model.vertices]))
+        batch = model.gen_prior_samples_batch(7)
+        for v in model.vertices:
+            if v.is_sampled:
+                self.assertEqual((7,), np.shape(batch[v.name]))
+        log_pdf = model.gen_log_pdf_batch(batch)
+        expected = [model.gen_log_pdf(state) for state in _split(model, batch)]
+        self.assertTrue(np.allclose(expected, log_pdf))
+
+    def assertSameLogPdf(self, model, batch):
+        log_pdf = model.gen_log_pdf_batch(batch)
+        expected = [model.gen_log_pdf(state) for state in _split(model, batch)]
+        self.assertTrue(np.allclose(expected, log_pdf))
+
+    def test_mixture(self):
+        # The means are picked from a list by a sampled index, and the probabilities are a vector-valued sample
+        model = pyppl.compile_model_from_file(os.path.join(EXAMPLES, 'gmm_model_b.clj'), imports=IMPORTS,
+                                              extra_methods='batch')
+        batch = model.gen_prior_samples_batch(4)
+        self.assertIs(dict, type(batch))
+        for v in model.vertices:
+            if v.is_sampled:
+                self.assertEqual(4, len(batch[v.name]))
+        self.assertSameLogPdf(model, batch)
+
+    def test_conditionals(self):
+        # The branches are not taken per particle, but the log-pdf of a vertex is masked by its conditions
+        for name in ('if_model.clj', 'nested_if.clj', 'nested_if_2.clj'):
+            model = pyppl.compile_model_from_file(os.path.join(EXAMPLES, name), imports=IMPORTS, extra_methods='batch')
+            batch = model.gen_prior_samples_batch(50)
+            for cond in model.conditionals:
+                self.assertEqual((50,), np.shape(batch[cond.name]))
+            self.assertSameLogPdf(model, batch)
+
+    def test_plate(self):
+        for options in ({}, dict(vectorize=True)):
+            model = pyppl.compile_model(PLATE_SOURCE, language='clj', imports=IMPORTS, plates=True,
+                                        extra_methods='batch', **options)
+            self.assertTrue(any([v.plate is not None for v in model.vertices]))
+            self.assertSameLogPdf(model, model.gen_prior_samples_batch(5))
+
+    def test_no_samples(self):
+        model = pyppl.compile_model("(observe (normal 0 1) 0.5)", language='clj', imports=IMPORTS,
+                                    extra_methods='batch')
+        log_pdf = model.gen_log_pdf_batch(model.gen_prior_samples_batch(3))
+        self.assertEqual((3,), np.shape(log_pdf))
+        self.assertTrue(np.allclose(model.gen_log_pdf(model.gen_prior_samples()), log_pdf))
+
+    def test_unbatchable(self):
+        # The rows of the data have different lengths, so that there is no array to index per particle
+        source = """
+        (let [d [[1.0 2.0] [3.0] [4.0 5.0] [6.0]]
+              k (sample (categorical [0.1 0.2 0.3 0.4]))]
+          (observe (normal (get (get d k) 0) 1) 0.5)
+          k)
+        """
+        model = pyppl.compile_model(source, language='clj', imports=IMPORTS, extra_methods='batch')
+        with self.assertRaises(NotImplementedError):
+            model.gen_prior_samples_batch(3)
+        with self.assertRaises(NotImplementedError):
+            model.gen_log_pdf_batch({})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import unittest
+import pyppl
+from pyppl.ppl_compile_cache import CompileCache
+
+
+SOURCE = """
+(let [x (sample (normal 0 1))]
+  (observe (normal x 1) 0.5)
+  x)
+"""
+
+
+class TestCompileCache(unittest.TestCase):
+
+    def setUp(self):
+        pyppl.compile_cache.clear()
+
+    def test_cache_is_off_by_default(self):
+        pyppl.compile_model(SOURCE, language='clj')
+        self.assertEqual(0, len(pyppl.compile_cache))
+
+    def test_models_do_not_share_sets(self):
+        first = pyppl.compile_model(SOURCE, language='clj', use_cache=True)
+        count = len(first.vertices)
+        first.vertices.clear()
+        first.arcs.clear()
+        second = pyppl.compile_model(SOURCE, language='clj', use_cache=True)
+        self.assertEqual(1, pyppl.compile_cache.hits)
+        self.assertEqual(count, len(second.vertices))
+        self.assertIsNot(first.vertices, second.vertices)
+
+    def test_namespace_key(self):
+        value = object()
+        key_a = CompileCache.make_key(SOURCE, namespace={'f': value, 'g': 'dist.Normal'})
+        key_b = CompileCache.make_key(SOURCE, namespace={'g': 'dist.Normal', 'f': value})
+        key_c = CompileCache.make_key(SOURCE, namespace={'f': object(), 'g': 'dist.Normal'})
+        self.assertEqual(key_a, key_b)
+        self.assertEqual(hash(key_a), hash(key_b))
+        self.assertNotEqual(key_a, key_c)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import os
+import unittest
+import pyppl
+
+try:
+    import numpy as np
+    from pyppl.backend import ppl_numpy_distributions
+except ModuleNotFoundError:
+    np = None
+
+IMPORTS = 'import pyppl.backend.ppl_numpy_distributions as dist'
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+
+OPTIONS = [
+    {},
+    dict(lazy_branches=True),
+    dict(local_variables=True, lazy_branches=True),
+    dict(local_variables=True, lazy_branches=True, vectorize=True),
+]
+
+
+@unittest.skipIf(np is None, "requires NumPy")
+class TestDelta(unittest.TestCase):
+
+    def assertDelta(self, name: str, changes: list):
+        # Each change sets a vertex to a new value, taking different branches; the delta must always agree with
+        # the log-pdf computed from scratch
+        for options in OPTIONS:
+            model = pyppl.compile_model_from_file(os.path.join(EXAMPLES, name), imports=IMPORTS, extra_methods='delta',
+                                                  **options)
+            ppl_numpy_distributions.seed(0)
+            state = model.gen_prior_samples()
+            self.assertAlmostEqual(model.gen_log_pdf(dict(state)), model.gen_log_pdf_delta(state, []))
+            for vertex, value in changes:
+                state[vertex] = value
+                log_pdf = model.gen_log_pdf_delta(state, [vertex])
+                self.assertAlmostEqual(model.gen_log_pdf(dict(state)), log_pdf, msg=repr(options))
+
+    def test_if_model(self):
+        self.assertDelta('if_model.clj', [('x30001', v) for v in (-1.5, 0.5, -0.2, 2.0)])
+
+    def test_nested_if(self):
+        self.assertDelta('nested_if.clj', [('x30001', -1.5), ('x30002', 0), ('x30001', 0.5), ('x30002', 2),
+                                           ('x30001', -0.2)])
+
+    def test_nested_if_2(self):
+        self.assertDelta('nested_if_2.clj', [('x30001', -1.5), ('x30001', 0.5), ('x30002', 6.0), ('x30001', -0.5),
+                                             ('x30001', 2.0), ('x30002', 1.0), ('x30001', -0.5)])
+
+    def test_reject(self):
+        # A proposal is evaluated on a copy of the state, and rejected by keeping the original state, which shares
+        # the cached factors with the copy
+        for options in OPTIONS:
+            model = pyppl.compile_model_from_file(os.path.join(EXAMPLES, 'nested_if.clj'), imports=IMPORTS,
+                                                  extra_methods='delta', **options)
+            ppl_numpy_distributions.seed(0)
+            state = model.gen_prior_samples()
+            log_pdf = model.gen_log_pdf_delta(state, [])
+            factors = dict(state['__factors__'])
+            for value in (-1.5, 0.5):
+                proposal = dict(state)
+                proposal['x30001'] = value
+                self.assertAlmostEqual(model.gen_log_pdf(dict(proposal)), model.gen_log_pdf_delta(proposal, ['x30001']))
+                self.assertEqual(factors, state['__factors__'])
+                self.assertEqual(log_pdf, state['__log_pdf__'])
+            self.assertEqual(log_pdf, model.gen_log_pdf_delta(state, []))
+            state['x30002'] = 2
+            self.assertAlmostEqual(model.gen_log_pdf(dict(state)), model.gen_log_pdf_delta(state, ['x30002']))
+
+
+if __name__ == '__main__':
+    unittest.main()
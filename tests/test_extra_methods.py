@@ -0,0 +1,58 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import unittest
+import pyppl
+from pyppl.backend.ppl_graph_codegen import GraphCodeGenerator
+
+
+SOURCE = """
+(let [x (sample (normal 0 1))]
+  (observe (normal x 1) 0.5)
+  x)
+"""
+
+
+class TestExtraMethods(unittest.TestCase):
+
+    def setUp(self):
+        pyppl.compile_cache.clear()
+
+    def test_basic_model(self):
+        model = pyppl.compile_model(SOURCE, language='clj')
+        for methods in GraphCodeGenerator.EXTRA_METHODS.values():
+            for name in methods:
+                self.assertFalse(hasattr(model, name), name)
+        self.assertNotIn('_grad', model.code)
+        self.assertNotIn('_MarkovBlanketIndex', model.code)
+        self.assertNotIn('_factor_', model.code)
+        self.assertTrue(hasattr(model, 'gen_log_pdf'))
+
+    def test_groups(self):
+        model = pyppl.compile_model(SOURCE, language='clj', extra_methods=('grad', 'delta'))
+        self.assertTrue(hasattr(model, 'gen_log_pdf_grad'))
+        self.assertTrue(hasattr(model, 'gen_log_pdf_delta'))
+        self.assertIn('_factor_', model.code)
+        self.assertFalse(hasattr(model, 'pack'))
+        model = pyppl.compile_model(SOURCE, language='clj', extra_methods='all')
+        for methods in GraphCodeGenerator.EXTRA_METHODS.values():
+            for name in methods:
+                self.assertTrue(hasattr(model, name), name)
+        self.assertEqual(('x30001',), model.get_markov_blanket('y30002'))
+        with self.assertRaises(ValueError):
+            pyppl.compile_model(SOURCE, language='clj', extra_methods=('gradient',))
+
+    def test_cache_key(self):
+        pyppl.compile_model(SOURCE, language='clj', extra_methods='grad', use_cache=True)
+        model = pyppl.compile_model(SOURCE, language='clj', extra_methods='flat', use_cache=True)
+        self.assertEqual(0, pyppl.compile_cache.hits)
+        self.assertTrue(hasattr(model, 'pack'))
+        self.assertFalse(hasattr(model, 'gen_log_pdf_grad'))
+
+
+if __name__ == '__main__':
+    unittest.main()
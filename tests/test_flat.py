@@ -0,0 +1,54 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import unittest
+import pyppl
+
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+IMPORTS = 'import pyppl.backend.ppl_numpy_distributions as dist'
+
+SOURCE = """
+(let [pi (sample (dirichlet [1.0 2.0 3.0]))
+      z (sample (categorical pi))
+      mu (sample (mvn [0.0 0.0] [[1.0 0.0] [0.0 1.0]]))
+      x (sample (normal 0 1))]
+  (observe (normal (+ x (get mu 0)) 1) 0.5)
+  (observe (normal (get [-1.0 0.0 1.0] z) 1) 0.2)
+  [pi z mu x])
+"""
+
+
+@unittest.skipIf(np is None, "requires NumPy")
+class TestFlat(unittest.TestCase):
+
+    def setUp(self):
+        self.model = pyppl.compile_model(SOURCE, language='clj', imports=IMPORTS, extra_methods='flat')
+
+    def test_layout(self):
+        index = self.model.get_flat_index()
+        sizes = sorted([s.stop - s.start for s in index.values()])
+        self.assertEqual([1, 1, 2, 3], sizes)
+        self.assertEqual(slice(0, 6), self.model.get_flat_cont_slice())
+        self.assertEqual(slice(6, 7), self.model.get_flat_disc_slice())
+
+    def test_round_trip(self):
+        state = self.model.gen_prior_samples()
+        theta = self.model.pack(state)
+        self.assertEqual((7,), theta.shape)
+        values = self.model.unpack(theta)
+        for name, value in values.items():
+            self.assertTrue(np.allclose(state[name], value))
+        self.assertTrue(np.allclose(theta, self.model.pack(values)))
+        self.assertAlmostEqual(self.model.gen_log_pdf(state), self.model.gen_log_pdf_flat(theta))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import os
+import unittest
+import pyppl
+
+try:
+    import numpy as np
+    from pyppl.backend import ppl_numpy_distributions
+except ModuleNotFoundError:
+    np = None
+
+IMPORTS = 'import pyppl.backend.ppl_numpy_distributions as dist'
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+
+STACKED_SOURCE = """
+(let [mu (sample (normal 0 1))
+      s (sample (gamma 2 2))
+      xs (vector (sample (normal mu 1)) (sample (normal mu 1)) (sample (normal mu 1)) (sample (normal mu 1)))
+      ys (vector (sample (normal 1 s)) (sample (normal 2 s)) (sample (normal mu 2)) (sample (normal s 3)))]
+  (observe (normal (+ (nth xs 1) (nth ys 2)) 1) 0.3)
+  (observe (normal (* (nth xs 3) (nth ys 0)) 1) 0.1)
+  xs)
+"""
+
+
+@unittest.skipIf(np is None, "requires NumPy")
+class TestGradient(unittest.TestCase):
+
+    def assertGradient(self, model):
+        # Compares the gradient against central differences of `gen_log_pdf`, relative to the size of the gradient
+        ppl_numpy_distributions.seed(1)
+        state = model.gen_prior_samples()
+        grad = model.gen_log_pdf_grad(dict(state))
+        self.assertEqual(set(model.gen_cont_vars()), set(grad))
+        for name, g in grad.items():
+            x = np.array(state[name], dtype=float)
+            for i in np.ndindex(*x.shape):
+                e = np.zeros(x.shape)
+                e[i] = 1e-6
+                upper = dict(state, **{name: x + e if x.ndim > 0 else float(x + e)})
+                lower = dict(state, **{name: x - e if x.ndim > 0 else float(x - e)})
+                expected = (model.gen_log_pdf(upper) - model.gen_log_pdf(lower)) / 2e-6
+                self.assertTrue(np.isclose(expected, np.asarray(g)[i], rtol=1e-5, atol=1e-4),
+                                "{}{}: {} != {}".format(name, list(i), expected, np.asarray(g)[i]))
+
+    def test_dirichlet(self):
+        for name in ('gmm_model_b.clj', 'gmm_model_c.clj'):
+            model = pyppl.compile_model_from_file(os.path.join(EXAMPLES, name), imports=IMPORTS, extra_methods='grad')
+            self.assertGradient(model)
+
+    def test_stacked_vertices(self):
+        model = pyppl.compile_model(STACKED_SOURCE, language='clj', imports=IMPORTS, vectorize=True,
+                                    extra_methods='grad')
+        self.assertTrue(any([v.elements is not None for v in model.vertices]))
+        self.assertGradient(model)
+
+
+if __name__ == '__main__':
+    unittest.main()
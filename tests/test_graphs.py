@@ -0,0 +1,110 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import os
+import unittest
+import pyppl
+from pyppl.graphs import ConditionNode, DataNode, Vertex, MarkovBlanketIndex, ReachabilityIndex
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+
+
+def _vertex(name: str, *ancestors):
+    return Vertex(name, ancestors=set(ancestors), distribution_code='dist.Normal(0, 1)', distribution_name='Normal')
+
+
+class TestReachability(unittest.TestCase):
+
+    def setUp(self):
+        self.a = _vertex('a')
+        self.b = _vertex('b', self.a)
+        self.c = ConditionNode('c', ancestors={self.b}, condition="state['b'] > 0")
+        self.d = _vertex('d', self.b)
+        self.e = _vertex('e')
+        self.nodes = [self.a, self.b, self.c, self.d, self.e]
+
+    def test_descendants_without_index(self):
+        self.assertEqual({self.b, self.c, self.d}, self.a.get_all_descendants)
+        self.assertEqual(set(), self.e.get_all_descendants)
+
+    def test_descendants_follow_new_ancestors(self):
+        self.d.ancestors = {self.e}
+        self.assertEqual({self.b, self.c}, self.a.get_all_descendants)
+        self.assertEqual({self.d}, self.e.get_all_descendants)
+
+    def test_index(self):
+        index = ReachabilityIndex(self.nodes).attach()
+        for node in self.nodes:
+            if isinstance(node, Vertex):
+                self.assertEqual(index.get_descendants(node), node.get_all_descendants)
+        self.assertEqual({self.a, self.b}, self.d.get_all_ancestors)
+        self.assertEqual({self.c}, index.get_dependent_conditions(self.a))
+        self.assertTrue(index.is_ancestor(self.a, self.d))
+        self.assertFalse(index.is_ancestor(self.e, self.d))
+
+    def test_duplicate_nodes(self):
+        index = ReachabilityIndex(self.nodes + [self.c, self.b])
+        self.assertEqual(len(self.nodes), len(index))
+        self.assertEqual({self.c}, index.get_dependent_conditions(self.a))
+        # The variable `y` is substituted twice, so that the generator visits the same condition twice
+        source = """
+        (let [x (sample (normal 0 1))
+              y (if (> x 0) (sample (normal 1 1)) (sample (gamma 2 2)))]
+          (observe (normal y 1) 0.5)
+          y)
+        """
+        model = pyppl.compile_model(source, language='clj')
+        self.assertEqual(1, len(model.conditionals))
+
+
+class TestMarkovBlanket(unittest.TestCase):
+
+    def setUp(self):
+        # `f` is only evaluated if the condition `c` on `b` holds, and `g` only depends on data
+        self.a = _vertex('a')
+        self.b = _vertex('b', self.a)
+        self.c = ConditionNode('c', ancestors={self.b}, condition="state['b'] > 0")
+        self.d = _vertex('d', self.b)
+        self.e = _vertex('e')
+        self.data = DataNode('data', data='[1, 2, 3]')
+        self.f = Vertex('f', ancestors={self.e}, conditions={(self.c, True)},
+                        distribution_code='dist.Normal(0, 1)', distribution_name='Normal')
+        self.g = _vertex('g', self.data)
+        self.index = MarkovBlanketIndex([self.a, self.b, self.d, self.e, self.f, self.g])
+
+    def test_relations(self):
+        index = self.index
+        self.assertEqual(('b',), index.get_parents('d'))
+        self.assertEqual(('b', 'e'), index.get_parents(self.f))
+        self.assertEqual(('d', 'f'), index.get_children('b'))
+        self.assertEqual(('e',), index.get_co_parents('b'))
+        self.assertEqual(('b',), index.get_co_parents('e'))
+        self.assertEqual(('a', 'd', 'e', 'f'), index.get_markov_blanket('b'))
+        self.assertEqual(('b', 'f'), index.get_markov_blanket('e'))
+
+    def test_data_and_conditions_are_skipped(self):
+        self.assertEqual((), self.index.get_markov_blanket('g'))
+        self.assertNotIn('c', self.index)
+        self.assertNotIn('data', self.index)
+        self.assertEqual(6, len(self.index))
+
+    def test_model(self):
+        model = pyppl.compile_model_from_file(os.path.join(EXAMPLES, 'if_model.clj'), extra_methods='markov_blanket')
+        # Both observations depend on `x30001` through the condition, and `y30004` also on `x30002`
+        self.assertEqual(('x30002', 'y30004', 'y30005'), model.get_markov_blanket('x30001'))
+        self.assertEqual(('x30001', 'y30004'), model.get_markov_blanket('x30002'))
+        model = pyppl.compile_model_from_file(os.path.join(EXAMPLES, 'gmm_model_b.clj'), extra_methods='markov_blanket')
+        names = [v.name for v in model.vertices]
+        for x in names:
+            blanket = model.get_markov_blanket(x)
+            self.assertNotIn(x, blanket)
+            for y in names:
+                self.assertEqual(y in blanket, x in model.get_markov_blanket(y))
+
+
+if __name__ == '__main__':
+    unittest.main()
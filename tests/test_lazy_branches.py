@@ -0,0 +1,76 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import unittest
+import pyppl
+
+try:
+    import numpy as np
+    from pyppl.backend import ppl_numpy_distributions
+except ModuleNotFoundError:
+    np = None
+
+IMPORTS = 'import pyppl.backend.ppl_numpy_distributions as dist'
+
+# The observed values depend on `x`, so that the observations on the branch not taken have no value
+SOURCE = """
+(let [x (sample (normal 0 1))
+      z (sample (normal 0 1))]
+  (if (> x 0)
+    (observe (normal z 1) x)
+    (observe (normal z 2) (* 2 x)))
+  (observe (normal z 1) 0.5)
+  x)
+"""
+
+OPTIONS = [
+    {},
+    dict(local_variables=True),
+    dict(local_variables=True, vectorize=True),
+]
+
+
+@unittest.skipIf(np is None, "requires NumPy")
+class TestLazyBranches(unittest.TestCase):
+
+    def test_prior_samples(self):
+        for options in OPTIONS:
+            model = pyppl.compile_model(SOURCE, language='clj', imports=IMPORTS, lazy_branches=True, **options)
+            eager_model = pyppl.compile_model(SOURCE, language='clj', imports=IMPORTS, **options)
+            for seed in range(10):
+                ppl_numpy_distributions.seed(seed)
+                state = model.gen_prior_samples()
+                ppl_numpy_distributions.seed(seed)
+                eager_state = eager_model.gen_prior_samples()
+                self.assertEqual(state['x30001'] > 0, state['cond_30003'])
+                if state['cond_30003']:
+                    self.assertEqual(state['x30001'], state['y30004'])
+                    self.assertIsNone(state['y30005'])
+                else:
+                    self.assertIsNone(state['y30004'])
+                    self.assertEqual(2 * state['x30001'], state['y30005'])
+                self.assertEqual(0.5, state['y30006'])
+                self.assertIsNotNone(eager_state['y30004'])
+                self.assertIsNotNone(eager_state['y30005'])
+                self.assertAlmostEqual(eager_model.gen_log_pdf(eager_state), model.gen_log_pdf(state),
+                                       msg=repr(options))
+
+    def test_log_pdf(self):
+        # The log-pdf never looks at the value on the branch not taken, even if the state was not sampled lazily
+        for options in OPTIONS:
+            model = pyppl.compile_model(SOURCE, language='clj', imports=IMPORTS, lazy_branches=True, **options)
+            eager_model = pyppl.compile_model(SOURCE, language='clj', imports=IMPORTS, **options)
+            for x in (-0.7, 1.3):
+                state = { 'x30001': x, 'x30002': 0.2, 'y30004': x, 'y30005': 2 * x, 'y30006': 0.5 }
+                expected = eager_model.gen_log_pdf(dict(state))
+                state['y30005' if x > 0 else 'y30004'] = None
+                self.assertAlmostEqual(expected, model.gen_log_pdf(dict(state)), msg=repr(options))
+                self.assertAlmostEqual(expected, model.gen_log_pdf_transformed(dict(state)), msg=repr(options))
+
+
+if __name__ == '__main__':
+    unittest.main()
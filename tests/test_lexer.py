@@ -0,0 +1,54 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import os
+import unittest
+from pyppl import lexer
+from pyppl.fe_clojure.ppl_clojure_lexer import ClojureLexer
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+
+SOURCE = """
+(defn f [x] ; a comment
+  (+ x 0x1F -2 3.5e2 1. "a\\"b" #"re" :key %1 ~@y #'z `(q) & nil true))
+"""
+
+
+class TestLexer(unittest.TestCase):
+
+    def test_line_from_pos(self):
+        # The line-offset index must agree with counting the newlines in front of the position
+        for source in ('', 'x', '\n', '(+ 1 2)\n\n(* 3\n 4)', '\n\nabc\n'):
+            stream = lexer.CharacterStream(source)
+            for pos in range(len(source) + 1):
+                self.assertEqual(source.count('\n', 0, pos), stream.get_line_from_pos(pos))
+
+    def assertSameTokens(self, source: str):
+        tokens = list(ClojureLexer(source).lexer)
+        self.assertEqual(tokens, list(ClojureLexer(source, tokenizer='regex').lexer))
+
+    def test_regex_tokenizer(self):
+        # The regex-driven tokenizer must produce exactly the same tokens as the default lexer
+        self.assertSameTokens(SOURCE)
+        for name in sorted(os.listdir(EXAMPLES)):
+            if name.endswith('.clj'):
+                with open(os.path.join(EXAMPLES, name)) as f:
+                    self.assertSameTokens(f.read())
+
+    def test_regex_tokenizer_forms(self):
+        with open(os.path.join(EXAMPLES, 'gmm_model_b.clj')) as f:
+            source = f.read()
+        forms = [repr(form) for form in ClojureLexer(source)]
+        self.assertEqual(forms, [repr(form) for form in ClojureLexer(source, tokenizer='regex')])
+        with self.assertRaises(SyntaxError):
+            list(ClojureLexer('(+ 1 |)', tokenizer='regex'))
+        with self.assertRaises(ValueError):
+            ClojureLexer(SOURCE, tokenizer='unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
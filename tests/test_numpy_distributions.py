@@ -0,0 +1,88 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import os
+import unittest
+import pyppl
+
+try:
+    import numpy as np
+    from pyppl.backend import ppl_numpy_distributions as dist
+except ModuleNotFoundError:
+    np = None
+
+IMPORTS = 'import pyppl.backend.ppl_numpy_distributions as dist'
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+
+DATA_SOURCE = """
+(let [data [1.0 2.0 3.5 4.0 5.0 6.0]
+      mu (sample (normal 0 1))
+      k (sample (categorical [0.2 0.3 0.5]))]
+  (observe (normal (+ mu (nth data k)) 1) 2.0)
+  mu)
+"""
+
+
+@unittest.skipIf(np is None, "requires NumPy")
+class TestNumpyDistributions(unittest.TestCase):
+
+    def test_scalar_log_pdf(self):
+        # The fast paths for Python's numbers must agree with the paths for arrays, and return NumPy-floats as well
+        cases = [
+            (dist.Bernoulli(0.3), [0, 1]),
+            (dist.Categorical([1.0, 2.0, 3.0]), [0, 2]),
+            (dist.Exponential(2.0), [0.5, -1.0]),
+            (dist.Gamma(2.0, 3.0), [0.5, 2.0]),
+            (dist.Normal(1.0, 2.0), [0.5, -3.0]),
+            (dist.Poisson(3.0), [0, 4, -1]),
+            (dist.Uniform(0.0, 1.0), [0.5, 2.0]),
+        ]
+        for distribution, values in cases:
+            for value in values:
+                result = distribution.log_pdf(value)
+                self.assertIsInstance(result, np.floating)
+                self.assertAlmostEqual(float(distribution.log_pdf(np.array([value]))[0]), float(result))
+
+    def test_outside_support(self):
+        # Categories must be in range, and counts must be non-negative integers, on the fast paths as well as for
+        # (batched) arrays
+        cases = [
+            (dist.Categorical([1.0, 2.0, 3.0]), [-1, 3, 1.5]),
+            (dist.Poisson(3.0), [-1, -0.5, 2.5]),
+        ]
+        for distribution, values in cases:
+            for value in values:
+                self.assertEqual(-np.inf, distribution.log_pdf(value))
+            result = distribution.log_pdf(np.array(values + [1]))
+            self.assertTrue(np.all(np.isneginf(result[:-1])))
+            self.assertAlmostEqual(float(distribution.log_pdf(1)), float(result[-1]))
+        batched = dist.Categorical(np.array([[1.0, 1.0], [1.0, 3.0]]))
+        self.assertTrue(np.allclose([-np.inf, np.log(0.75)], batched.log_pdf(np.array([2, 1]))))
+
+    def test_gen_log_pdf_transformed(self):
+        # None of these models has a distribution with a bounded support, so that the transformation does nothing
+        for name in ('onegauss.clj', 'if_model.clj', 'if_model2.foppl.py', 'nested_if.clj',
+                     'neural_net_model_3.clj'):
+            model = pyppl.compile_model_from_file(os.path.join(EXAMPLES, name), imports=IMPORTS)
+            state = model.gen_prior_samples()
+            self.assertAlmostEqual(model.gen_log_pdf(dict(state)), model.gen_log_pdf_transformed(dict(state)))
+
+    def test_data_constants(self):
+        # Numeric data is shared by all states as read-only arrays
+        model = pyppl.compile_model(DATA_SOURCE, language='clj', imports=IMPORTS)
+        self.assertEqual(1, len(model.constants))
+        for value in model.constants.values():
+            self.assertIsInstance(value, np.ndarray)
+            with self.assertRaises(ValueError):
+                value[0] = 0
+        state = model.gen_prior_samples()
+        self.assertTrue(np.isfinite(model.gen_log_pdf(state)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import os
+import unittest
+from pyppl import parser
+from pyppl.ppl_ast import *
+from pyppl.transforms.ppl_pass_manager import PassManager, get_pass
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+
+NAMES = ('onegauss.clj', 'if_model.clj', 'nested_if_2.clj', 'gmm_model_b.clj', 'if_model2.foppl.py')
+
+
+class TestPassManager(unittest.TestCase):
+
+    def test_unchanged_tree(self):
+        # Running the simplifying passes once more on their result must return the very same tree
+        for name in NAMES:
+            ast = parser.parse_from_file(os.path.join(EXAMPLES, name))
+            for p in ('raw_simplifier', 'simplifier', 'symbol_simplifier'):
+                self.assertIs(ast, get_pass(p).factory({}).visit(ast), msg="{}: {}".format(name, p))
+
+    def test_fixpoint(self):
+        # The fixpoint iteration stops as soon as the simplifier does not change the tree anymore
+        for name in NAMES:
+            pass_manager = PassManager.from_level(2)
+            parser.parse_from_file(os.path.join(EXAMPLES, name), pass_manager=pass_manager)
+            runs = [status for p, status in pass_manager.log if p == 'simplifier']
+            self.assertEqual(['changed', 'unchanged'], runs, msg=name)
+
+    def test_changed_tree(self):
+        # The raw simplifier only runs again if another pass has changed the tree in between
+        ast = makeBody([AstDef('x', AstValue(1)), AstBinary(AstSymbol('x'), '+', AstValue(2))])
+        pass_manager = PassManager(('raw_simplifier', 'symbol_simplifier', 'raw_simplifier'))
+        self.assertIs(ast, pass_manager.run(ast))
+        self.assertEqual([('raw_simplifier', 'unchanged'), ('symbol_simplifier', 'unchanged'),
+                          ('raw_simplifier', 'skipped')], pass_manager.log)
+        ast = parser.parse('(let [x (sample (normal 0 1))] (+ x 1))', simplify=False)
+        pass_manager = PassManager(('raw_simplifier', 'functions_inliner', 'raw_simplifier'))
+        pass_manager.run(ast)
+        self.assertEqual([('raw_simplifier', 'unchanged'), ('functions_inliner', 'changed'),
+                          ('raw_simplifier', 'unchanged')], pass_manager.log)
+
+    def test_symbol_equality(self):
+        self.assertEqual(AstSymbol('x'), AstSymbol('x'))
+        self.assertNotEqual(AstSymbol('sqrt', import_source='math'), AstSymbol('sqrt', import_source='numpy'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import unittest
+import pyppl
+
+try:
+    import numpy as np
+    from pyppl.backend import ppl_numpy_distributions
+except ModuleNotFoundError:
+    np = None
+
+IMPORTS = 'import pyppl.backend.ppl_numpy_distributions as dist'
+
+PLATE_SOURCE = """
+(let [xs (vector 1.0 2.0 3.0 4.0 5.0 6.0)
+      ys (vector 2.9 5.2 7.1 8.8 11.3 13.0)
+      slope (sample (normal 0 10))
+      bias (sample (normal 0 10))]
+  (doseq [i (range 6)]
+    (observe (normal (+ (* slope (get xs i)) bias) 1) (get ys i)))
+  [slope bias])
+"""
+
+# The scale of each observation is picked from a short list (which is not a data node) by the data
+LIST_SOURCE = """
+(let [xs (vector 1.0 2.0 3.0 4.0 5.0)
+      ks (vector 0 1 0 1 1)
+      ys (vector 2.9 5.2 7.1 8.8 11.3)
+      slope (sample (normal 0 10))
+      bias (sample (normal 0 10))]
+  (doseq [i (range 5)]
+    (observe (normal (+ (* slope (get xs i)) bias) (get [1.0 2.0] (get ks i))) (get ys i)))
+  [slope bias])
+"""
+
+# The plate is only part of the model on one of the branches
+BRANCH_SOURCE = """
+(let [xs (vector 1.0 2.0 3.0 4.0 5.0 6.0)
+      ys (vector 2.9 5.2 7.1 8.8 11.3 13.0)
+      slope (sample (normal 0 10))
+      bias (sample (normal 0 10))]
+  (if (> bias 0)
+    (doseq [i (range 6)]
+      (observe (normal (+ (* slope (get xs i)) bias) 1) (get ys i)))
+    (observe (normal bias 1) 0.5))
+  [slope bias])
+"""
+
+# The probabilities are a vector, which would not broadcast against the iterations, so that the loop remains
+VECTOR_SOURCE = """
+(let [ks (vector 0 2 1 2 2 0)
+      p (sample (dirichlet [1.0 1.0 1.0]))]
+  (doseq [i (range 6)]
+    (observe (categorical p) (get ks i)))
+  p)
+"""
+
+OPTIONS = [
+    {},
+    dict(vectorize=True),
+    dict(vectorize=True, local_variables=True),
+    dict(vectorize=True, local_variables=True, lazy_branches=True),
+]
+
+
+@unittest.skipIf(np is None, "requires NumPy")
+class TestPlates(unittest.TestCase):
+
+    def setUp(self):
+        pyppl.compile_cache.clear()
+
+    def test_off_by_default(self):
+        model = pyppl.compile_model(PLATE_SOURCE, language='clj', imports=IMPORTS)
+        self.assertEqual(8, len(model.vertices))
+        self.assertTrue(all([v.plate is None for v in model.vertices]))
+        model = pyppl.compile_model(PLATE_SOURCE, language='clj', imports=IMPORTS, plates=True)
+        self.assertEqual(3, len(model.vertices))
+
+    def assertSameLogPdf(self, source: str):
+        # A plate has the same log-pdf as the unrolled loop, with or without arrays
+        unrolled = pyppl.compile_model(source, language='clj', imports=IMPORTS)
+        for options in OPTIONS:
+            model = pyppl.compile_model(source, language='clj', imports=IMPORTS, plates=True,
+                                        extra_methods=('terms', 'delta', 'flat'), **options)
+            for seed in range(4):
+                ppl_numpy_distributions.seed(seed)
+                expected = unrolled.gen_log_pdf(unrolled.gen_prior_samples())
+                ppl_numpy_distributions.seed(seed)
+                state = model.gen_prior_samples()
+                self.assertAlmostEqual(expected, model.gen_log_pdf(dict(state)), msg=repr(options))
+                self.assertAlmostEqual(expected, model.gen_log_pdf_transformed(dict(state)), msg=repr(options))
+                self.assertAlmostEqual(expected, sum(model.gen_log_pdf_terms(dict(state))), msg=repr(options))
+                self.assertAlmostEqual(expected, model.gen_log_pdf_delta(dict(state), []), msg=repr(options))
+                self.assertAlmostEqual(expected, model.gen_log_pdf_flat(model.pack(state)), msg=repr(options))
+        return model
+
+    def test_log_pdf(self):
+        model = self.assertSameLogPdf(PLATE_SOURCE)
+        # All iterations are evaluated at once, and the value of the plate is an array
+        self.assertNotIn(' in range(', model.code)
+        state = model.gen_prior_samples()
+        values = [state[v.name] for v in model.vertices if v.plate is not None]
+        self.assertEqual([(6,)], [np.shape(value) for value in values])
+
+    def test_list_index(self):
+        model = self.assertSameLogPdf(LIST_SOURCE)
+        self.assertEqual(3, len(model.vertices))
+        self.assertNotIn(' in range(', model.code)
+
+    def test_branch(self):
+        model = self.assertSameLogPdf(BRANCH_SOURCE)
+        self.assertEqual(4, len(model.vertices))
+
+    def test_vector_parameters(self):
+        model = self.assertSameLogPdf(VECTOR_SOURCE)
+        self.assertEqual(2, len(model.vertices))
+        self.assertIn(' in range(6)', model.code)
+
+    def test_cache_key(self):
+        pyppl.compile_model(PLATE_SOURCE, language='clj', imports=IMPORTS, use_cache=True)
+        model = pyppl.compile_model(PLATE_SOURCE, language='clj', imports=IMPORTS, plates=True, use_cache=True)
+        self.assertEqual(0, pyppl.compile_cache.hits)
+        self.assertEqual(3, len(model.vertices))
+
+
+if __name__ == '__main__':
+    unittest.main()
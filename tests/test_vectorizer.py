@@ -0,0 +1,39 @@
+#
+# This file is part of PyFOPPL, an implementation of a First Order Probabilistic Programming Language in Python.
+#
+# License: MIT (see LICENSE.txt)
+#
+# 16. Oct 2026
+#
+import os
+import unittest
+import pyppl
+
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+IMPORTS = 'import pyppl.backend.ppl_numpy_distributions as dist'
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+
+
+@unittest.skipIf(np is None, "requires NumPy")
+class TestVectorizer(unittest.TestCase):
+
+    def test_mixture(self):
+        # The observations select their component by a sampled index, which differs for each member of the family
+        for name in ('gmm_model_b.clj', 'gmm_model_c.clj'):
+            filename = os.path.join(EXAMPLES, name)
+            model = pyppl.compile_model_from_file(filename, imports=IMPORTS)
+            vectorized = pyppl.compile_model_from_file(filename, imports=IMPORTS, vectorize=True)
+            self.assertIn('family_0', vectorized.code)
+            np.random.seed(0)
+            for _ in range(5):
+                state = model.gen_prior_samples()
+                self.assertAlmostEqual(model.gen_log_pdf(dict(state)), vectorized.gen_log_pdf(dict(state)))
+
+
+if __name__ == '__main__':
+    unittest.main()